@@ -0,0 +1,93 @@
+"""
+Measures recall@k and query latency of the IVF index against exact search in `MmapVectorStore`.
+
+The corpus is drawn around random topic centers, which mimics the clustered structure of real chunk embeddings
+(uniformly random vectors have no neighbourhood structure for any ANN index to exploit). Queries are perturbed
+corpus vectors. For each `nprobe`, and each share of the lists probed (`--probe-percent`, which includes the app's
+default), recall is the fraction of the exact top-k that the IVF search returns.
+
+Usage:
+    python -m benchmarks.ann_recall --size 200000 --dim 384 --nprobe 1 4 8 16 32 --probe-percent 10 20 40
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from utils.ann import DEFAULT_PROBE_FRACTION
+from utils.vector_store import MmapVectorStore, normalize_rows
+
+
+def clustered_vectors(rng, size: int, dim: int, topics: int, noise: float):
+    centers = rng.standard_normal((topics, dim), dtype=np.float32)
+    labels = rng.integers(0, topics, size)
+    return normalize_rows(
+        centers[labels] + noise * rng.standard_normal((size, dim), dtype=np.float32)
+    )
+
+
+def run(store, queries, top_k: int, **kwargs):
+    results = []
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        result = store.query(
+            VectorStoreQuery(query_embedding=query, similarity_top_k=top_k), **kwargs
+        )
+        timings.append(time.perf_counter() - start)
+        results.append(set(result.ids))
+    return results, np.percentile(timings, 50) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=2.0)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--probe-percent", type=float, nargs="+", default=[DEFAULT_PROBE_FRACTION * 100, 20, 40])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    matrix = clustered_vectors(rng, args.size, args.dim, args.topics, args.noise)
+    perturbation = rng.standard_normal((args.queries, args.dim), dtype=np.float32) / np.sqrt(args.dim)
+    queries = normalize_rows(
+        matrix[rng.choice(args.size, args.queries, replace=False)] + 0.3 * perturbation
+    ).tolist()
+
+    store = MmapVectorStore(
+        matrix=matrix,
+        ids=[f"node-{i}" for i in range(args.size)],
+        ref_doc_ids=["None"] * args.size,
+    )
+
+    start = time.perf_counter()
+    store.configure_ann("ivf", args.nlist)
+    store._ensure_ann()
+    build_s = time.perf_counter() - start
+
+    exact, exact_ms = run(store, queries, args.top_k)
+    print(f"{args.size:,} vectors, dim {args.dim}, IVF build {build_s:.1f}s")
+    print(f"{'search':>12} {'recall@' + str(args.top_k):>10} {'p50 ms':>9}")
+    print(f"{'exact':>12} {1.0:>10.3f} {exact_ms:>9.2f}")
+
+    runs = [(f"nprobe={nprobe}", {"nprobe": nprobe}) for nprobe in args.nprobe]
+    runs += [
+        (f"{percent:g}%={store._ann.probes(percent / 100)}", {"probe_fraction": percent / 100})
+        for percent in args.probe_percent
+    ]
+    for name, kwargs in runs:
+        approximate, ms = run(store, queries, args.top_k, **kwargs)
+        recall = np.mean([len(a & e) / len(e) for a, e in zip(approximate, exact)])
+        print(f"{name:>12} {recall:>10.3f} {ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compares chunk count, splitting time and retrieval quality of the node splitters across chunk settings.
+
+The corpus mixes Japanese documents (no spaces between words) and English ones. Each document contains facts, one
+sentence each, that a question asks for; a question is answered if the best chunk for it, ranked by BM25, contains
+its fact sentence intact, and the share of that chunk taken up by the fact shows how much of the context passed to
+the model is relevant. The number of embedded tokens (including overlap) is what embedding costs scale with.
+
+Usage:
+    python -m benchmarks.chunking --documents 300 --sizes 256 512 1024
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from llama_index.core import Document
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.utils import get_tokenizer
+
+from utils.keyword_index import KeywordIndex
+from utils.text_splitter import LanguageAwareSplitter
+
+JA_FILLER = [
+    "本システムは社内の問い合わせ対応を効率化するために導入されました。",
+    "運用チームは毎週月曜日に稼働状況を確認しています。",
+    "障害が発生した場合は、まず影響範囲を特定してください。",
+    "詳細な手順は運用マニュアルの付録を参照してください。",
+    "設定の変更は必ずレビューを受けてから本番環境に反映します。",
+]
+EN_FILLER = [
+    "The service was introduced to streamline internal support requests.",
+    "The operations team reviews the system status every Monday morning.",
+    "When an incident occurs, first determine the scope of the impact.",
+    "Refer to the appendix of the operations manual for detailed steps.",
+    "Configuration changes are always reviewed before they reach production.",
+]
+CAUSES = ["タイムアウト", "メモリ不足", "証明書の期限切れ", "ディスク容量不足"]
+
+
+def build_corpus(documents: int, facts_per_document: int, rng: np.random.Generator):
+    """
+    Returns the documents and `(question, fact sentence)` pairs.
+    """
+    corpus, questions = [], []
+    for d in range(documents):
+        japanese = d % 2 == 0
+        filler = JA_FILLER if japanese else EN_FILLER
+        paragraphs = []
+        for f in range(facts_per_document):
+            code = f"ERR-{d:04d}{f:02d}"
+            if japanese:
+                fact = f"エラーコード {code} は{CAUSES[(d + f) % len(CAUSES)]}が原因で発生し、設定の見直しで解決しました。"
+                question = f"{code} の原因は何ですか"
+            else:
+                fact = f"Error code {code} was caused by a misconfigured retry policy and fixed by lowering the limit."
+                question = f"What caused error {code}?"
+            sentences = list(rng.choice(filler, size=12))
+            sentences.insert(int(rng.integers(0, len(sentences))), fact)
+            paragraphs.append(("" if japanese else " ").join(sentences))
+            questions.append((question, fact))
+        corpus.append(Document(text="\n\n".join(paragraphs), metadata={"file_name": f"doc{d}.txt"}))
+    return corpus, questions
+
+
+def evaluate(splitter, corpus, questions, tokenizer):
+    """
+    Returns the number of chunks, embedded tokens, splitting seconds, the share of answered questions and the mean
+    share of the answering chunk taken up by the fact.
+    """
+    start = time.perf_counter()
+    nodes = splitter.get_nodes_from_documents(corpus)
+    seconds = time.perf_counter() - start
+
+    texts = [node.get_content() for node in nodes]
+    keywords = KeywordIndex()
+    keywords.add(texts)
+    keywords.ensure()
+
+    answered, density = 0, []
+    for question, fact in questions:
+        rows, _ = keywords.search(question, 1)
+        if len(rows) > 0 and fact in texts[rows[0]]:
+            answered += 1
+            density.append(len(fact) / len(texts[rows[0]]))
+
+    tokens = sum(len(tokenizer(text)) for text in texts)
+    return len(nodes), tokens, seconds, answered / len(questions), np.mean(density) if density else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=300)
+    parser.add_argument("--facts", type=int, default=5, help="Facts per document")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--overlap-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tokenizer = get_tokenizer()
+    corpus, questions = build_corpus(args.documents, args.facts, np.random.default_rng(args.seed))
+    total_tokens = sum(len(tokenizer(document.text)) for document in corpus)
+    print(f"{len(corpus):,} documents, {total_tokens:,} tokens, {len(questions):,} questions")
+
+    print(
+        f"{'splitter':>22} {'size':>5} {'overlap':>8} {'chunks':>7} {'embedded tokens':>16} "
+        f"{'split s':>8} {'answered':>9} {'fact share':>11}"
+    )
+    for size in args.sizes:
+        overlap = int(size * args.overlap_ratio)
+        splitters = {
+            "SentenceSplitter": SentenceSplitter(chunk_size=size, chunk_overlap=overlap),
+            "LanguageAwareSplitter": LanguageAwareSplitter(size, overlap),
+        }
+        for name, splitter in splitters.items():
+            chunks, tokens, seconds, answered, density = evaluate(splitter, corpus, questions, tokenizer)
+            print(
+                f"{name:>22} {size:>5} {overlap:>8} {chunks:>7,} {tokens:>16,} "
+                f"{seconds:>8.2f} {answered:>9.0%} {density:>11.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measures how many chunks the deduplication stage drops, what it costs and how many unique chunks it drops by mistake.
+
+The corpus is split into pages of unique text interleaved with boilerplate as it appears in real document sets: a
+page footer with a page number, a license header with a varying year, and a navigation menu with an entry more or
+less. Every unique chunk carries a marker, so a dropped unique chunk is a false positive. The index size saved is
+estimated from the embedding dimension and the precision of the vectors.
+
+Usage:
+    python -m benchmarks.dedup --pages 5000 --thresholds 1.0 0.9 0.8
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from utils.dedup import ChunkDeduplicator
+
+WORDS = (
+    "system request incident review policy network storage cache query index latency memory document model "
+    "server client report budget release deploy backup schedule owner contract invoice audit metric"
+).split()
+JA_WORDS = ["システム", "障害", "設定", "運用", "確認", "手順", "変更", "環境", "報告", "対応"]
+MENU = ["Home", "Products", "Pricing", "Docs", "Blog", "Careers", "Support", "Contact", "Status", "Legal"]
+
+
+def unique_chunk(i: int, rng: np.random.Generator):
+    if i % 4 == 0:
+        return f"記録{i}: " + "".join(rng.choice(JA_WORDS, size=60)) + "。"
+    return f"Record {i}: " + " ".join(rng.choice(WORDS, size=120)) + "."
+
+
+def boilerplate_chunk(page: int, rng: np.random.Generator):
+    kind = page % 3
+    if kind == 0:
+        return (
+            "Copyright Example Corp. All rights reserved. This document is confidential and intended only for "
+            f"the recipient named above. Do not distribute without written permission. Page {page}"
+        )
+    if kind == 1:
+        year = 2019 + int(rng.integers(0, 6))
+        return (
+            f"Licensed under the Apache License, Version 2.0. Copyright {year} The Authors. You may not use this "
+            "file except in compliance with the License. Unless required by applicable law or agreed to in "
+            "writing, software distributed under the License is distributed on an AS IS BASIS."
+        )
+    entries = MENU[: len(MENU) - int(rng.integers(0, 2))]
+    return "Navigation: " + " | ".join(entries) + " | Search | Sign in | Language: English / 日本語"
+
+
+def build_chunks(pages: int, rng: np.random.Generator):
+    """
+    Returns the chunk texts and whether each one is unique.
+    """
+    chunks, unique = [], []
+    for page in range(pages):
+        for i in range(2):
+            chunks.append(unique_chunk(page * 2 + i, rng))
+            unique.append(True)
+        chunks.append(boilerplate_chunk(page, rng))
+        unique.append(False)
+    return chunks, unique
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[1.0, 0.9, 0.8])
+    parser.add_argument("--dim", type=int, default=1024, help="Embedding dimension")
+    parser.add_argument("--bytes-per-value", type=int, default=4, help="4 for float32, 2 for float16, 1 for int8")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chunks, unique = build_chunks(args.pages, np.random.default_rng(args.seed))
+    print(f"{len(chunks):,} chunks, {sum(unique):,} unique, {len(chunks) - sum(unique):,} boilerplate")
+
+    print(
+        f"{'threshold':>9} {'kept':>7} {'exact':>7} {'near':>7} {'false drops':>12} "
+        f"{'seconds':>8} {'chunks/s':>9} {'MB saved':>9}"
+    )
+    for threshold in args.thresholds:
+        deduplicator = ChunkDeduplicator(threshold)
+        start = time.perf_counter()
+        dropped = [deduplicator.is_duplicate(text) for text in chunks]
+        seconds = time.perf_counter() - start
+
+        stats = deduplicator.stats()
+        false_drops = sum(1 for drop, is_unique in zip(dropped, unique) if drop and is_unique)
+        saved = stats["dropped"] * args.dim * args.bytes_per_value / 1e6
+        print(
+            f"{threshold:>9.2f} {len(chunks) - stats['dropped']:>7,} {stats['exact']:>7,} {stats['near']:>7,} "
+            f"{false_drops:>12,} {seconds:>8.2f} {len(chunks) / seconds:>9,.0f} {saved:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
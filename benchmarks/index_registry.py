@@ -0,0 +1,76 @@
+"""
+Measures load time and memory of opening the persisted index per session against sharing it through the registry.
+
+A synthetic index is persisted to a temporary directory; then the given number of sessions each open their own
+copy (the previous behaviour) or acquire a lease from `index_registry`, and the Python heap growth is reported.
+
+Usage:
+    python -m benchmarks.index_registry --chunks 20000 --sessions 20
+"""
+
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+from llama_index.core import Document, Settings
+from llama_index.core.embeddings import MockEmbedding
+
+import utils.llama_index as llama_index
+
+from utils.index_registry import IndexRegistry
+from utils.manifest import IngestionManifest
+
+
+def measure(open_session, sessions: int):
+    """
+    Opens `sessions` sessions; returns the time and heap growth of the first one and of each further one.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    handles = [open_session()]
+    first = (time.perf_counter() - start, tracemalloc.get_traced_memory()[0] / 1e6)
+
+    start = time.perf_counter()
+    handles.extend(open_session() for _ in range(sessions - 1))
+    further = (
+        (time.perf_counter() - start) / max(sessions - 1, 1),
+        (tracemalloc.get_traced_memory()[0] / 1e6 - first[1]) / max(sessions - 1, 1),
+    )
+    tracemalloc.stop()
+    return first, further, handles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    Settings.embed_model = MockEmbedding(embed_dim=args.dim)
+    persist_dir = tempfile.mkdtemp(prefix="vectordb-")
+    documents = [
+        Document(text=f"Chunk {i} about topic {i % 97}.", metadata={"file_name": f"doc{i // 50}.txt"})
+        for i in range(args.chunks)
+    ]
+    manifest = IngestionManifest.load(persist_dir)
+    llama_index.create_index(documents, persist_dir, manifest)
+
+    per_session = measure(lambda: llama_index.open_index(persist_dir), args.sessions)
+    registry = IndexRegistry()
+    shared = measure(
+        lambda: registry.acquire(
+            persist_dir, "mock", {}, lambda: llama_index.open_index(persist_dir)
+        ),
+        args.sessions,
+    )
+
+    print(f"{args.chunks:,} chunks, {args.sessions} sessions")
+    print(f"{'':>20} {'first s':>8} {'first MB':>9} {'further s':>10} {'further MB':>11}")
+    for name, (first, further, _) in (("index per session", per_session), ("shared registry", shared)):
+        print(f"{name:>20} {first[0]:>8.2f} {first[1]:>9.1f} {further[0]:>10.3f} {further[1]:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
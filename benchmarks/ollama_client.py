@@ -0,0 +1,98 @@
+"""
+Measures per-request overhead of a new Ollama client per request against the shared pooled client.
+
+A local fake Ollama server answers `/api/tags` like Ollama does, so the numbers only contain client, connection and
+HTTP overhead. The async client is measured issuing the same requests concurrently.
+
+Usage:
+    python -m benchmarks.ollama_client --requests 500 --concurrency 10
+"""
+
+import json
+import time
+import asyncio
+import argparse
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import ollama
+
+from utils.ollama import create_async_client, create_client
+
+TAGS = json.dumps(
+    {"models": [{"name": "llama3:8b", "model": "llama3:8b", "size": 4661224676}]}
+).encode("utf-8")
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like Ollama
+    wbufsize = 1 << 16  # Send headers and body in one segment instead of tripping over Nagle's algorithm
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(TAGS)))
+        self.end_headers()
+        self.wfile.write(TAGS)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def timed(call, requests: int):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000
+
+
+async def timed_async(host: str, requests: int, concurrency: int):
+    client = create_async_client(host, max_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await client.list()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    server, host = start_server()
+
+    fresh = timed(lambda: ollama.Client(host=host).list(), args.requests)
+    pooled_client = create_client(host)
+    pooled = timed(lambda: pooled_client.list(), args.requests)
+    sequential_rate = 1000 / pooled[0]
+    concurrent_rate = asyncio.run(timed_async(host, args.requests, args.concurrency))
+
+    print(f"{'client':>22} {'p50 ms':>9} {'p99 ms':>9}")
+    print(f"{'new client per call':>22} {fresh[0]:>9.2f} {fresh[1]:>9.2f}")
+    print(f"{'shared pooled client':>22} {pooled[0]:>9.2f} {pooled[1]:>9.2f}")
+    print(
+        f"throughput: {sequential_rate:,.0f} req/s sequential, "
+        f"{concurrent_rate:,.0f} req/s async with {args.concurrency} connections"
+    )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
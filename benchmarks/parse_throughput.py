@@ -0,0 +1,97 @@
+"""
+Measures document parsing throughput for increasing numbers of worker processes.
+
+Generates a synthetic folder of PDF (and, if `python-pptx` is installed, PPTX) files, then parses it with
+`utils.llama_index.parse_files` using 1, 2, 4, ... workers up to the CPU count.
+
+Usage:
+    python -m benchmarks.parse_throughput --files 64 --pages 8
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import fitz
+
+from utils.llama_index import parse_files
+
+SAMPLE_TEXT = (
+    "Local RAG ingests documents for retrieval augmented generation. "
+    "ローカルRAGは検索拡張生成のためにドキュメントを取り込みます。"
+)
+
+
+def make_pdf(path: str, pages: int):
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {page_number}\n" + SAMPLE_TEXT * 10)
+    doc.save(path)
+
+
+def make_pptx(path: str, slides: int):
+    from pptx import Presentation
+
+    presentation = Presentation()
+    for slide_number in range(slides):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        slide.shapes.title.text = f"Slide {slide_number}"
+        slide.placeholders[1].text = SAMPLE_TEXT * 5
+    presentation.save(path)
+
+
+def make_corpus(data_dir: str, files: int, pages: int):
+    try:
+        import pptx  # noqa: F401
+
+        with_pptx = True
+    except ImportError:
+        with_pptx = False
+
+    filepaths = []
+    for i in range(files):
+        if with_pptx and i % 2:
+            path = os.path.join(data_dir, f"deck-{i:04d}.pptx")
+            make_pptx(path, pages)
+        else:
+            path = os.path.join(data_dir, f"report-{i:04d}.pdf")
+            make_pdf(path, pages)
+        filepaths.append(path)
+    return filepaths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--timeout", type=int, default=600)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="parse-bench-")
+    try:
+        filepaths = make_corpus(data_dir, args.files, args.pages)
+
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= (os.cpu_count() or 1):
+            worker_counts.append(worker_counts[-1] * 2)
+
+        baseline = None
+        print(f"{'workers':>8} {'seconds':>9} {'files/s':>9} {'speedup':>8}")
+        for workers in worker_counts:
+            start = time.perf_counter()
+            documents, failed = parse_files(filepaths, workers=workers, timeout=args.timeout)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"{workers:>8} {elapsed:>9.2f} {len(filepaths) / elapsed:>9.1f} {baseline / elapsed:>7.2f}x"
+                + (f"  ({len(failed)} failed)" if failed else "")
+            )
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Measures cold vs warm first-response latency of an Ollama chat model (and optionally an embedding model).
+
+Requires a running Ollama server with the model pulled. For each round, the model is unloaded (`keep_alive=0`), a
+one-token request measures the cold first response, then the same request measures the warm one, i.e. what the
+first question costs without and with pre-warming.
+
+Usage:
+    python -m benchmarks.prewarm_latency --model llama3:8b --rounds 3 [--embedding-model BAAI/bge-large-en-v1.5]
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from utils.ollama import create_client
+
+
+def first_response(client, model: str, keep_alive=None):
+    start = time.perf_counter()
+    client.generate(model=model, prompt="Hi", options={"num_predict": 1}, keep_alive=keep_alive)
+    return time.perf_counter() - start
+
+
+def embedding_latency(model: str):
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    start = time.perf_counter()
+    embed_model = HuggingFaceEmbedding(model_name=model)
+    embed_model.get_query_embedding("warm up")
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embed_model.get_query_embedding("What does the report say about revenue?")
+    warm = time.perf_counter() - start
+    return cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="http://localhost:11434")
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--embedding-model")
+    args = parser.parse_args()
+
+    client = create_client(args.host)
+    cold, warm = [], []
+    for _ in range(args.rounds):
+        client.generate(model=args.model, prompt="", keep_alive=0)  # Unload
+        cold.append(first_response(client, args.model, keep_alive="5m"))
+        warm.append(first_response(client, args.model, keep_alive="5m"))
+
+    print(f"{'model':>30} {'cold s':>8} {'warm s':>8}")
+    print(f"{args.model:>30} {np.median(cold):>8.2f} {np.median(warm):>8.2f}")
+
+    if args.embedding_model:
+        cold_embedding, warm_embedding = embedding_latency(args.embedding_model)
+        print(f"{args.embedding_model:>30} {cold_embedding:>8.2f} {warm_embedding:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measures memory, recall@k and query latency of float16 and int8 vector storage against float32.
+
+The corpus is drawn around random topic centers like in `benchmarks.ann_recall`. For each precision, with and
+without full-precision rescoring, the size of the matrix scored per query is reported together with the fraction
+of the float32 top-k that is returned.
+
+Usage:
+    python -m benchmarks.quantization --size 100000 --dim 1024
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from utils.vector_store import MmapVectorStore, normalize_rows
+from benchmarks.ann_recall import clustered_vectors
+
+
+def run(store, queries, top_k: int):
+    results = []
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        result = store.query(VectorStoreQuery(query_embedding=query, similarity_top_k=top_k))
+        timings.append(time.perf_counter() - start)
+        results.append(set(result.ids))
+    return results, np.percentile(timings, 50) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--topics", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=2.0)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    matrix = clustered_vectors(rng, args.size, args.dim, args.topics, args.noise)
+    perturbation = rng.standard_normal((args.queries, args.dim), dtype=np.float32) / np.sqrt(args.dim)
+    queries = normalize_rows(
+        matrix[rng.choice(args.size, args.queries, replace=False)] + 0.3 * perturbation
+    ).tolist()
+
+    store = MmapVectorStore(
+        matrix=matrix,
+        ids=[f"node-{i}" for i in range(args.size)],
+        ref_doc_ids=["None"] * args.size,
+    )
+    exact, exact_ms = run(store, queries, args.top_k)
+
+    print(f"{args.size:,} vectors, dim {args.dim}")
+    print(f"{'precision':>9} {'rescore':>8} {'scored MB':>10} {'recall@' + str(args.top_k):>10} {'p50 ms':>9}")
+    print(f"{'float32':>9} {'-':>8} {matrix.nbytes / 2**20:>10.1f} {1.0:>10.3f} {exact_ms:>9.2f}")
+
+    for precision in ("float16", "int8"):
+        for rescore in (False, True):
+            store.configure_precision(precision, rescore)
+            store._ensure_quantized()
+            scored_bytes = store._quantized.nbytes
+            if store._scales is not None:
+                scored_bytes += store._scales.nbytes
+
+            results, ms = run(store, queries, args.top_k)
+            recall = np.mean([len(r & e) / len(e) for r, e in zip(results, exact)])
+            print(
+                f"{precision:>9} {'yes' if rescore else 'no':>8} {scored_bytes / 2**20:>10.1f} "
+                f"{recall:>10.3f} {ms:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Measures time to first token and throughput of the HTTP query server under concurrent clients.
+
+A local fake Ollama streams a fixed answer with a delay per token, and the index holds synthetic chunks with mock
+embeddings, so no model is needed. If generations blocked each other, the total time would grow with the number of
+clients; served concurrently, it stays close to the time of a single answer.
+
+Usage:
+    python -m benchmarks.query_server --clients 1 8 32 --tokens 50 --token-delay 0.02
+"""
+
+import json
+import time
+import argparse
+import threading
+import http.client
+
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from llama_index.core import Document, Settings, StorageContext, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.llms.ollama import Ollama
+
+from utils.ollama import create_client
+from utils.query_server import QueryServer, QueryService
+from utils.vector_store import MmapVectorStore
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """
+    Answers `/api/chat` like Ollama: newline-delimited JSON chunks, one token each, after a prompt evaluation delay
+    proportional to the length of the prompt. `/api/show` reports the context window.
+    """
+
+    protocol_version = "HTTP/1.1"
+    tokens = 50
+    token_delay = 0.02
+    prompt_delay = 0.0  # Seconds per prompt character
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/api/show":
+            data = json.dumps({"model_info": {"llama.context_length": 8192}}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        if self.prompt_delay:
+            messages = json.loads(body).get("messages", [])
+            time.sleep(self.prompt_delay * sum(len(message.get("content", "")) for message in messages))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            created_at = datetime.now(timezone.utc).isoformat()
+            for i in range(self.tokens + 1):
+                done = i == self.tokens
+                if not done:
+                    time.sleep(self.token_delay)
+                chunk = {
+                    "model": "fake",
+                    "created_at": created_at,
+                    "message": {"role": "assistant", "content": "" if done else f"token{i} "},
+                    "done": done,
+                }
+                if done:
+                    chunk.update({"done_reason": "stop", "eval_count": self.tokens})
+                data = (json.dumps(chunk) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The query server cancelled the generation
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+def build_index(chunks: int):
+    Settings.embed_model = MockEmbedding(embed_dim=64)
+    documents = [
+        Document(text=f"Chunk {i} about topic {i % 17}.", metadata={"file_name": f"doc{i % 10}.txt"})
+        for i in range(chunks)
+    ]
+    return VectorStoreIndex.from_documents(
+        documents, storage_context=StorageContext.from_defaults(vector_store=MmapVectorStore())
+    )
+
+
+def ask(port: int, query: str):
+    """
+    Sends one streamed question; returns (time to first token, total time, number of tokens).
+    """
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    connection.request(
+        "POST",
+        "/query",
+        body=json.dumps({"query": query, "top_k": 2}),
+        headers={"Content-Type": "application/json"},
+    )
+    response = connection.getresponse()
+    if response.status != 200:
+        raise RuntimeError(response.read().decode("utf-8"))
+    first_token = None
+    tokens = 0
+    for line in response:
+        if line.startswith(b"event: token"):
+            tokens += 1
+            if first_token is None:
+                first_token = time.perf_counter() - start
+        elif line.startswith(b"event: error"):
+            raise RuntimeError(response.readline().decode("utf-8"))
+    connection.close()
+    return first_token, time.perf_counter() - start, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--chunks", type=int, default=1000)
+    args = parser.parse_args()
+
+    FakeOllamaHandler.tokens = args.tokens
+    FakeOllamaHandler.token_delay = args.token_delay
+    ollama_server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    host = f"http://127.0.0.1:{start(ollama_server)}"
+
+    max_clients = max(args.clients)
+    llm = Ollama(
+        model="fake",
+        base_url=host,
+        client=create_client(host, max_connections=max_clients),
+    )
+    service = QueryService(build_index(args.chunks), llm, max_concurrency=max_clients)
+    query_server = QueryServer(("127.0.0.1", 0), service)
+    port = start(query_server)
+
+    print(f"one answer: {args.tokens} tokens at {args.token_delay * 1000:.0f} ms/token")
+    print(f"{'clients':>8} {'ttft p50 ms':>12} {'ttft p99 ms':>12} {'wall s':>8} {'tokens/s':>10}")
+    for clients in args.clients:
+        results = [None] * clients
+
+        def run(i):
+            results[i] = ask(port, f"What is topic {i}?")
+
+        begin = time.perf_counter()
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - begin
+
+        ttft = [result[0] * 1000 for result in results]
+        tokens = sum(result[2] for result in results)
+        print(
+            f"{clients:>8} {np.percentile(ttft, 50):>12.1f} {np.percentile(ttft, 99):>12.1f} "
+            f"{wall:>8.2f} {tokens / wall:>10,.0f}"
+        )
+
+    query_server.shutdown()
+    ollama_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
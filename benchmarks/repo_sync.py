@@ -0,0 +1,137 @@
+"""
+Compares a full clone and parse of a repository with shallow, filtered and incremental repository syncs.
+
+A local bare repository stands in for the remote. It holds source and documentation files with some history,
+plus a vendored `node_modules` tree and binary files. Three runs are timed: a full-history clone where every file
+is parsed (how repositories used to be ingested), the first shallow sync with the default filters, and a refresh
+after a commit that changes a few files. Embedding is left out; it scales with the number of files parsed.
+
+Usage:
+    python -m benchmarks.repo_sync --files 2000 --vendored 2000 --commits 20 --changed 5
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import utils.git_repo as git_repo
+import utils.llama_index as llama_index
+
+from utils.git_repo import git
+from utils.manifest import IngestionManifest
+
+
+def write_files(root: str, files: int, vendored: int, revision: int):
+    for i in range(files):
+        folder = os.path.join(root, "src" if i % 4 else "docs", f"pkg{i % 20}")
+        os.makedirs(folder, exist_ok=True)
+        name = f"module_{i}.py" if i % 4 else f"guide_{i}.md"
+        with open(os.path.join(folder, name), "w") as f:
+            f.write(f"# Revision {revision}\n" + f"def handler_{i}(request):\n    return {i}\n" * 20)
+    for i in range(vendored):
+        folder = os.path.join(root, "node_modules", f"lib{i % 50}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"index_{i}.js"), "w") as f:
+            f.write(f"module.exports = function f{i}() {{ return {revision}; }};\n" * 20)
+    os.makedirs(os.path.join(root, "assets"), exist_ok=True)
+    for i in range(20):
+        with open(os.path.join(root, "assets", f"image_{i}.png"), "wb") as f:
+            f.write(os.urandom(200_000))
+
+
+def commit(work: str, message: str):
+    git("add", "-A", cwd=work)
+    git("-c", "user.name=bench", "-c", "user.email=bench@example.com", "commit", "-q", "-m", message, cwd=work)
+    git("push", "-q", "origin", "HEAD:main", cwd=work)
+
+
+def build_remote(tmp: str, files: int, vendored: int, commits: int):
+    remote = os.path.join(tmp, "remote.git")
+    work = os.path.join(tmp, "work")
+    git("init", "-q", "--bare", "-b", "main", remote)
+    git("clone", "-q", remote, work)
+    for revision in range(commits):
+        write_files(work, files, vendored, revision)
+        commit(work, f"Revision {revision}")
+    return remote, work
+
+
+def directory_size(path: str):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def parse_all(root: str):
+    """
+    Parses every file of a checkout, as the app did before repositories were filtered.
+    """
+    filepaths = []
+    for folder, dirs, names in os.walk(root):
+        dirs[:] = [d for d in dirs if d != ".git"]
+        filepaths.extend(os.path.join(folder, name) for name in names)
+    parsed = sum(1 for _, documents in llama_index.iter_parsed_files(filepaths) if documents is not None)
+    return len(filepaths), parsed
+
+
+def sync_and_parse(remote: str, repos_dir: str, manifest: IngestionManifest):
+    """
+    Syncs the repository and parses the files to (re-)index, recording them as an ingestion would.
+    """
+    sync = git_repo.sync_repo(remote, repos_dir, allow_local=True)
+    stats = {"files": 0, "skipped": 0, "failed": 0, "bytes": 0}
+    for document in git_repo.iter_repo_documents(sync, manifest, stats):
+        manifest.record(document.metadata["file_name"], [], [])
+    for source in manifest.removed:
+        manifest.release(source)
+        manifest.sources.pop(source, None)
+    manifest.removed.clear()
+    git_repo.mark_indexed(sync)
+    return sync, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000, help="Source and documentation files")
+    parser.add_argument("--vendored", type=int, default=2000, help="Files under node_modules")
+    parser.add_argument("--commits", type=int, default=20)
+    parser.add_argument("--changed", type=int, default=5, help="Files changed before the refresh")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        remote, work = build_remote(tmp, args.files, args.vendored, args.commits)
+        print(f"Built a remote with {args.commits} commits in {time.perf_counter() - start:.1f}s")
+        print(f"{'run':>18} {'seconds':>8} {'files parsed':>13} {'clone MB':>9}")
+
+        start = time.perf_counter()
+        full = os.path.join(tmp, "full")
+        git("clone", "-q", git_repo.repo_url(remote, allow_local=True), full)
+        _, parsed = parse_all(full)
+        seconds = time.perf_counter() - start
+        print(f"{'full clone':>18} {seconds:>8.2f} {parsed:>13,} {directory_size(full) / 1e6:>9.1f}")
+
+        repos_dir = os.path.join(tmp, "repos")
+        manifest = IngestionManifest(tmp)
+        start = time.perf_counter()
+        sync, stats = sync_and_parse(remote, repos_dir, manifest)
+        seconds = time.perf_counter() - start
+        print(f"{'shallow, filtered':>18} {seconds:>8.2f} {stats['files']:>13,} {directory_size(sync.path) / 1e6:>9.1f}")
+
+        for i in range(args.changed):
+            path = os.path.join(work, "src", f"pkg{(4 * i + 1) % 20}", f"module_{4 * i + 1}.py")
+            with open(path, "a") as f:
+                f.write("# changed\n")
+        commit(work, "Change a few files")
+
+        start = time.perf_counter()
+        sync, stats = sync_and_parse(remote, repos_dir, manifest)
+        seconds = time.perf_counter() - start
+        print(f"{'refresh':>18} {seconds:>8.2f} {stats['files']:>13,} {directory_size(sync.path) / 1e6:>9.1f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
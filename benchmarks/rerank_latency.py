@@ -0,0 +1,136 @@
+"""
+Measures end-to-end question latency with and without cross-encoder reranking.
+
+A local fake Ollama spends a fixed time per prompt character before streaming its answer, like prompt evaluation on a
+CPU, so every chunk passed to the model adds latency. Without reranking, recall can only be raised by passing more
+chunks; with reranking, more candidates are retrieved and rescored on the CPU, and only the best `--top-k` reach the
+prompt. The cross-encoder is simulated with a fixed time per pair unless `--model` names a real one.
+
+Usage:
+    python -m benchmarks.rerank_latency --questions 20 --candidates 20 --top-k 3 --baseline-top-k 10
+"""
+
+import time
+import argparse
+
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+
+from llama_index.core import Document, Settings, StorageContext, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.llms.ollama import Ollama
+
+import utils.llama_index as llama_index
+
+from benchmarks.query_server import FakeOllamaHandler, start
+from utils.reranker import CrossEncoderReranker, create_reranker
+from utils.vector_store import MmapVectorStore
+
+
+def simulated_scorer(pair_ms: float):
+    """
+    Scores pairs by the number of query words in the text, taking `pair_ms` per pair like a CPU cross-encoder.
+    """
+
+    def score(pairs):
+        time.sleep(pair_ms * len(pairs) / 1000)
+        return np.asarray(
+            [len(set(query.split()) & set(text.split())) for query, text in pairs], dtype=np.float32
+        )
+
+    return score
+
+
+def build_index(chunks: int, chunk_chars: int):
+    Settings.embed_model = MockEmbedding(embed_dim=64)
+    filler = "This paragraph describes the maintenance procedure in detail. " * (chunk_chars // 64 + 1)
+    documents = [
+        Document(
+            text=f"Topic {i % 50} note {i}. {filler[:chunk_chars]}",
+            metadata={"file_name": f"doc{i % 10}.txt"},
+        )
+        for i in range(chunks)
+    ]
+    return VectorStoreIndex.from_documents(
+        documents, storage_context=StorageContext.from_defaults(vector_store=MmapVectorStore())
+    )
+
+
+def run(query_engine, questions):
+    """
+    Asks each question; returns the p50 time to first token and p50 total time in ms, and the mean context length.
+    """
+    ttft, total, context = [], [], []
+    for question in questions:
+        begin = time.perf_counter()
+        response = query_engine.query(question)
+        first = None
+        for _ in response.response_gen:
+            if first is None:
+                first = time.perf_counter() - begin
+        total.append((time.perf_counter() - begin) * 1000)
+        ttft.append(first * 1000)
+        context.append(sum(len(node.node.get_content()) for node in response.source_nodes))
+    return np.percentile(ttft, 50), np.percentile(total, 50), np.mean(context)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--baseline-top-k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=1000.0)
+    parser.add_argument("--model", help="A real cross-encoder, e.g. cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+    parser.add_argument("--pair-ms", type=float, default=15.0, help="Simulated cross-encoder time per pair")
+    parser.add_argument("--prompt-ms-per-1k-chars", type=float, default=200.0)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    FakeOllamaHandler.tokens = args.tokens
+    FakeOllamaHandler.token_delay = args.token_delay
+    FakeOllamaHandler.prompt_delay = args.prompt_ms_per_1k_chars / 1000 / 1000
+    ollama_server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    host = f"http://127.0.0.1:{start(ollama_server)}"
+    llm = Ollama(model="fake", base_url=host, request_timeout=120)
+
+    index = build_index(args.chunks, args.chunk_chars)
+    questions = [f"What is the procedure for topic {i % 50} note {i}?" for i in range(args.questions)]
+
+    if args.model:
+        reranker = create_reranker(args.model, args.top_k, args.budget_ms)
+    else:
+        reranker = CrossEncoderReranker(
+            simulated_scorer(args.pair_ms), "simulated", top_n=args.top_k, budget_ms=args.budget_ms
+        )
+
+    configurations = [
+        (f"top_k={args.baseline_top_k}", args.baseline_top_k, None),
+        (f"top_k={args.top_k}", args.top_k, None),
+        (f"rerank {args.candidates}->{args.top_k}", args.top_k, reranker),
+        (f"rerank {args.candidates}->{args.top_k} (cached)", args.top_k, reranker),
+    ]
+
+    print(f"prompt evaluation {args.prompt_ms_per_1k_chars:.0f} ms per 1,000 characters, {args.tokens} tokens")
+    print(f"{'':>26} {'context chars':>14} {'ttft p50 ms':>12} {'total p50 ms':>13}")
+    for name, top_k, stage in configurations:
+        query_engine = llama_index.build_query_engine(
+            index,
+            top_k,
+            "compact",
+            llm=llm,
+            reranker=stage,
+            rerank_candidates=args.candidates,
+        )
+        ttft, total, context = run(query_engine, questions)
+        print(f"{name:>26} {context:>14,.0f} {ttft:>12.0f} {total:>13.0f}")
+
+    ollama_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
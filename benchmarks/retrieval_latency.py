@@ -0,0 +1,60 @@
+"""
+Measures top-k query latency of the JSON `SimpleVectorStore` against the vectorized `MmapVectorStore`.
+
+For each corpus size, both stores are filled with the same random vectors and queried with the same random
+queries; p50 and p99 latencies are reported per store.
+
+Usage:
+    python -m benchmarks.retrieval_latency --sizes 1000 10000 100000 --dim 1024 --queries 50
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from utils.vector_store import MmapVectorStore
+
+
+def make_nodes(matrix: np.ndarray):
+    return [
+        TextNode(id_=f"node-{i}", text="", embedding=row.tolist())
+        for i, row in enumerate(matrix)
+    ]
+
+
+def latencies(store, queries, top_k: int):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        store.query(VectorStoreQuery(query_embedding=query, similarity_top_k=top_k))
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32).tolist()
+
+    print(f"{'vectors':>9} {'store':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for size in args.sizes:
+        nodes = make_nodes(rng.standard_normal((size, args.dim), dtype=np.float32))
+        for name, store in (("simple", SimpleVectorStore()), ("numpy", MmapVectorStore())):
+            store.add(nodes)
+            p50, p99 = latencies(store, queries, args.top_k)
+            print(f"{size:>9,} {name:>7} {p50:>9.2f} {p99:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
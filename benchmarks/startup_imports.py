@@ -0,0 +1,98 @@
+"""
+Measures the import time of the Streamlit app, i.e. the cold-start cost before the first page renders.
+
+The app modules are imported in a fresh interpreter with `-X importtime`; the report lists the total and the slowest
+top-level imports. With `--check`, the run fails if any of the heavy, feature-specific dependencies (torch, PDF and
+metadata tools, the web crawler's HTTP client, the translator) are imported at startup instead of on first use.
+
+Usage:
+    python -m benchmarks.startup_imports --runs 5 --top 15 [--check]
+"""
+
+import sys
+import argparse
+import subprocess
+
+import numpy as np
+
+APP_MODULES = (
+    "components.page_state",
+    "components.page_config",
+    "components.header",
+    "components.chatbox",
+    "components.sidebar",
+)
+
+# Dependencies only needed by specific features, which must be imported lazily
+LAZY_MODULES = (
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "llama_index.embeddings.huggingface",
+    "aiohttp",
+    "fitz",
+    "exiftool",
+    "unstructured",
+    "deep_translator",
+)
+
+
+def import_times():
+    """
+    Imports the app modules in a fresh interpreter and returns the cumulative import time of each module in seconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(APP_MODULES)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        name = name.rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        times[name.strip()] = (int(cumulative) / 1e6, depth)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.runs)]
+    totals = [sum(seconds for seconds, depth in times.values() if depth == 0) for times in runs]
+
+    # Each package is reported with the cumulative time of its first import, wherever in the import tree that was
+    packages = {}
+    for times in runs:
+        for name, (seconds, depth) in times.items():
+            if "." not in name and not name.startswith("_"):
+                packages.setdefault(name, []).append(seconds)
+
+    print(f"app import: {np.median(totals):.2f}s median of {args.runs} runs")
+    print(f"{'package':>30} {'cumulative s':>13}")
+    slowest = sorted(packages.items(), key=lambda item: -np.median(item[1]))
+    for name, seconds in slowest[: args.top]:
+        print(f"{name:>30} {np.median(seconds):>13.3f}")
+
+    eager = sorted(
+        name
+        for name in runs[0]
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    )
+    if eager:
+        print(f"imported at startup: {', '.join(eager)}")
+    if args.check and eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compares load time and memory of the JSON `SimpleVectorStore` against the memory-mapped `MmapVectorStore`.
+
+A synthetic store of random vectors is persisted in both formats, then each format is loaded in a fresh
+subprocess so that the reported peak RSS only covers that load.
+
+Usage:
+    python -m benchmarks.vector_store_load --vectors 50000 --dim 1024
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+# (import, load) statements; only the load is timed
+LOADERS = {
+    "json": (
+        "from llama_index.core.vector_stores import SimpleVectorStore",
+        "store = SimpleVectorStore.from_persist_dir(persist_dir)",
+    ),
+    "mmap": (
+        "from utils.vector_store import MmapVectorStore",
+        "store = MmapVectorStore.from_persist_dir(persist_dir)",
+    ),
+}
+
+
+def make_store(persist_dir: str, vectors: int, dim: int):
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((vectors, dim), dtype=np.float32)
+    ids = [f"node-{i}" for i in range(vectors)]
+
+    with open(os.path.join(persist_dir, "default__vector_store.json"), "w") as f:
+        json.dump(
+            {
+                "embedding_dict": {node_id: row.tolist() for node_id, row in zip(ids, matrix)},
+                "text_id_to_ref_doc_id": {node_id: "doc" for node_id in ids},
+                "metadata_dict": {node_id: {} for node_id in ids},
+            },
+            f,
+        )
+
+    np.save(os.path.join(persist_dir, "default__vectors.npy"), matrix)
+    with open(os.path.join(persist_dir, "default__vector_ids.json"), "w") as f:
+        json.dump({"ids": ids, "ref_doc_ids": ["doc"] * vectors, "metadata": [{}] * vectors}, f)
+
+
+def measure(fmt: str, persist_dir: str):
+    import_statement, load_statement = LOADERS[fmt]
+    script = (
+        "import time, json, resource\n"
+        f"{import_statement}\n"
+        f"persist_dir = {persist_dir!r}\n"
+        "baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+        "start = time.perf_counter()\n"
+        f"{load_statement}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+        "print(json.dumps({'seconds': elapsed, 'rss_kb': peak - baseline}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    args = parser.parse_args()
+
+    persist_dir = tempfile.mkdtemp(prefix="vector-store-bench-")
+    try:
+        make_store(persist_dir, args.vectors, args.dim)
+        sizes = {
+            "json": os.path.getsize(os.path.join(persist_dir, "default__vector_store.json")),
+            "mmap": os.path.getsize(os.path.join(persist_dir, "default__vectors.npy"))
+            + os.path.getsize(os.path.join(persist_dir, "default__vector_ids.json")),
+        }
+
+        print(f"{args.vectors:,} vectors x {args.dim} dims")
+        print(f"{'format':>8} {'disk MB':>9} {'load ms':>9} {'peak RSS MB':>12}")
+        for fmt in LOADERS:
+            result = measure(fmt, persist_dir)
+            print(
+                f"{fmt:>8} {sizes[fmt] / 2**20:>9.1f} {result['seconds'] * 1000:>9.1f} {result['rss_kb'] / 1024:>12.1f}"
+            )
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
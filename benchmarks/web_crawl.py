@@ -0,0 +1,137 @@
+"""
+Compares sequential page fetching with the concurrent crawler, cold and with its conditional GET cache.
+
+A local HTTP server stands in for a website: its pages form a tree, each linking home and to three more pages.
+Responses are delayed by a fixed latency, and pages carry an `ETag`, answering `304 Not Modified` when it matches
+`If-None-Match`. Three runs fetch the same pages: one at a time without a cache (how websites used to be loaded),
+with the crawler and an empty cache, and with the crawler again after a few pages changed.
+
+Usage:
+    python -m benchmarks.web_crawl --pages 200 --latency-ms 50 --concurrency 8 --changed 5
+"""
+
+import os
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import urllib.request
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.web_crawler import HttpCache, crawl_websites
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """
+    Serves `/page/<n>` pages linking home and to pages `3n + 1` to `3n + 3`; `server.revisions` holds the revision
+    of changed pages.
+    """
+
+    def do_GET(self):
+        site = self.server
+        time.sleep(site.latency)
+        try:
+            number = int(self.path.rsplit("/", 1)[1])
+        except ValueError:
+            number = -1
+        if not 0 <= number < site.pages:
+            self.send_error(404)
+            return
+
+        children = range(3 * number + 1, min(3 * number + 4, site.pages))
+        links = '<li><a href="/page/0">Home</a></li>' + "".join(
+            f'<li><a href="/page/{n}#top">Page {n}</a></li>' for n in children
+        )
+        paragraph = f"<p>Page {number}, revision {site.revisions.get(number, 0)}. " + "Lorem ipsum dolor sit amet. " * 100
+        body = f"<html><head><title>Page {number}</title></head><body>{paragraph}</p><ul>{links}</ul></body></html>"
+        data = body.encode("utf-8")
+        etag = '"' + hashlib.sha256(data).hexdigest()[:16] + '"'
+
+        site.requests += 1
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        site.bytes += len(data)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_site(pages: int, latency: float):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+    server.daemon_threads = True
+    server.pages = pages
+    server.latency = latency
+    server.revisions = {}
+    server.requests = 0
+    server.bytes = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--per-host", type=int, default=8, help="Connections to the site")
+    parser.add_argument("--rate", type=float, default=0, help="Requests per second to the site; 0 for no limit")
+    parser.add_argument("--changed", type=int, default=5, help="Pages changed before the last run")
+    args = parser.parse_args()
+
+    server = start_site(args.pages, args.latency_ms / 1000)
+    root = f"http://127.0.0.1:{server.server_port}"
+    urls = [f"{root}/page/{n}" for n in range(args.pages)]
+    tmp = tempfile.mkdtemp()
+    try:
+        print(f"{'run':>22} {'seconds':>8} {'pages':>6} {'downloaded':>11} {'not modified':>13} {'MB':>6}")
+
+        server.bytes = 0
+        start = time.perf_counter()
+        fetched = 0
+        for url in urls:
+            with urllib.request.urlopen(url, timeout=20) as response:
+                response.read()
+                fetched += 1
+        seconds = time.perf_counter() - start
+        print(f"{'sequential':>22} {seconds:>8.2f} {fetched:>6,} {fetched:>11,} {0:>13,} {server.bytes / 1e6:>6.2f}")
+
+        cache = HttpCache(os.path.join(tmp, "http.sqlite3"))
+        options = dict(
+            max_depth=args.pages,
+            max_pages=args.pages,
+            concurrency=args.concurrency,
+            per_host=args.per_host,
+            rate=args.rate,
+            cache=cache,
+        )
+        for name in ("crawler, cold cache", "crawler, warm cache"):
+            if name.endswith("warm cache"):
+                for n in range(args.changed):
+                    server.revisions[n * (args.pages // max(args.changed, 1))] = 1
+            server.bytes = 0
+            start = time.perf_counter()
+            documents, stats = crawl_websites([urls[0]], **options)
+            seconds = time.perf_counter() - start
+            print(
+                f"{name:>22} {seconds:>8.2f} {stats['pages']:>6,} {stats['downloaded']:>11,} "
+                f"{stats['not_modified']:>13,} {server.bytes / 1e6:>6.2f}"
+            )
+    finally:
+        server.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,9 @@
 import streamlit as st
 
+from utils.llama_index import session_query_engine
 from utils.ollama import chat, context_chat
-
-from deep_translator import GoogleTranslator
-
-translator = GoogleTranslator(source='auto', target='ja')
+from utils.stream_metrics import StreamMetrics
+from utils.translation import translate_prompt
 
 def custom_tooltip(text, tooltip_text, position="top"):
     return f"""
@@ -60,8 +59,16 @@ def custom_tooltip(text, tooltip_text, position="top"):
     """
 
 def chatbox():
+    if st.session_state["answer_cache"]:
+        st.toggle(
+            "Skip answer cache",
+            key="skip_answer_cache",
+            help="Generate a fresh answer instead of replaying a cached one.",
+        )
+
     if prompt := st.chat_input("How can I help?"):
-        translated = translator.translate(prompt)
+        metrics = StreamMetrics()
+        translated = translate_prompt(prompt)
         if (not st.session_state["query_engine"]) and (not st.session_state["use_uploaded_vectordb"]):
             st.warning("Please confirm settings and upload files before proceeding.")
             st.stop()
@@ -72,10 +79,23 @@ def chatbox():
 
         with st.chat_message("assistant"):
             with st.spinner("Processing..."):
-                response, source = context_chat(
-                        prompt=translated, query_engine=st.session_state["query_engine"]
+                result = context_chat(
+                        prompt=translated,
+                        query_engine=session_query_engine(),
+                        use_answer_cache=not st.session_state.get("skip_answer_cache", False),
                     )
-                st.write(response)
+            if result is None:
+                st.error("Unable to generate a response. Please check the logs for details.")
+                st.stop()
+
+            response, source = result
+            # Tokens are rendered as Ollama emits them; the full text is returned once the stream ends
+            content = st.write_stream(metrics.track(response))
+            metrics.log()
+            st.caption(metrics.summary())
+            if source:
                 st.markdown(custom_tooltip("1", f"{source[0].node.text}"), unsafe_allow_html=True)
 
-        st.session_state["messages"].append({"role": "assistant", "content": "".join(response)})
+        st.session_state["messages"].append(
+            {"role": "assistant", "content": content, "metrics": metrics.as_dict()}
+        )
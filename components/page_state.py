@@ -1,8 +1,16 @@
+import os
+
 import streamlit as st
 
 import utils.logs as logs
 
+from utils.ann import DEFAULT_PROBE_FRACTION
+from utils.dedup import DEFAULT_DEDUP_THRESHOLD
+from utils.git_repo import DEFAULT_EXCLUDE, DEFAULT_INCLUDE, DEFAULT_MAX_FILE_KB
 from utils.ollama import get_models
+from utils.prewarm import prewarm_selected_models
+from utils.reranker import DEFAULT_RERANK_MODEL
+from utils.web_crawler import DEFAULT_CONCURRENCY, DEFAULT_MAX_PAGES, DEFAULT_RATE
 
 
 def set_initial_state():
@@ -20,6 +28,21 @@ def set_initial_state():
     if "embedding_model" not in st.session_state:
         st.session_state["embedding_model"] = "Default (bge-large-en-v1.5)"
 
+    if "ollama_max_connections" not in st.session_state:
+        st.session_state["ollama_max_connections"] = 10
+
+    if "ollama_connect_timeout" not in st.session_state:
+        st.session_state["ollama_connect_timeout"] = 5.0
+
+    if "ollama_request_timeout" not in st.session_state:
+        st.session_state["ollama_request_timeout"] = 1000.0
+
+    if "ollama_keep_alive" not in st.session_state:
+        st.session_state["ollama_keep_alive"] = "30m"
+
+    if "prewarm_models" not in st.session_state:
+        st.session_state["prewarm_models"] = True
+
     if "ollama_models" not in st.session_state:
         try:
             models = get_models()
@@ -64,9 +87,30 @@ def set_initial_state():
     if "github_repo" not in st.session_state:
         st.session_state["github_repo"] = None
 
+    if "github_include" not in st.session_state:
+        st.session_state["github_include"] = " ".join(DEFAULT_INCLUDE)
+
+    if "github_exclude" not in st.session_state:
+        st.session_state["github_exclude"] = " ".join(DEFAULT_EXCLUDE)
+
+    if "github_max_file_kb" not in st.session_state:
+        st.session_state["github_max_file_kb"] = DEFAULT_MAX_FILE_KB
+
     if "websites" not in st.session_state:
         st.session_state["websites"] = []
 
+    if "crawl_depth" not in st.session_state:
+        st.session_state["crawl_depth"] = 0
+
+    if "crawl_max_pages" not in st.session_state:
+        st.session_state["crawl_max_pages"] = DEFAULT_MAX_PAGES
+
+    if "crawl_concurrency" not in st.session_state:
+        st.session_state["crawl_concurrency"] = DEFAULT_CONCURRENCY
+
+    if "crawl_rate" not in st.session_state:
+        st.session_state["crawl_rate"] = DEFAULT_RATE
+
     ###############
     # Llama-Index #
     ###############
@@ -77,12 +121,33 @@ def set_initial_state():
     if "documents" not in st.session_state:
         st.session_state["documents"] = None
 
+    if "ingested_uploads" not in st.session_state:
+        st.session_state["ingested_uploads"] = None
+
     if "query_engine" not in st.session_state:
         st.session_state["query_engine"] = None
 
     if "chat_mode" not in st.session_state:
         st.session_state["chat_mode"] = "compact"
 
+    if "translation_backend" not in st.session_state:
+        st.session_state["translation_backend"] = "google"
+
+    if "translation_target" not in st.session_state:
+        st.session_state["translation_target"] = "ja"
+
+    if "translation_timeout" not in st.session_state:
+        st.session_state["translation_timeout"] = 3.0
+
+    if "answer_cache" not in st.session_state:
+        st.session_state["answer_cache"] = False
+
+    if "answer_cache_threshold" not in st.session_state:
+        st.session_state["answer_cache_threshold"] = 0.95
+
+    if "answer_cache_size" not in st.session_state:
+        st.session_state["answer_cache_size"] = 1000
+
     #####################
     # Advanced Settings #
     #####################
@@ -98,6 +163,18 @@ def set_initial_state():
     if "top_k" not in st.session_state:
         st.session_state["top_k"] = 3
 
+    if "rerank" not in st.session_state:
+        st.session_state["rerank"] = False
+
+    if "rerank_model" not in st.session_state:
+        st.session_state["rerank_model"] = DEFAULT_RERANK_MODEL
+
+    if "rerank_candidates" not in st.session_state:
+        st.session_state["rerank_candidates"] = 20
+
+    if "rerank_budget_ms" not in st.session_state:
+        st.session_state["rerank_budget_ms"] = 1000
+
     if "embedding_model" not in st.session_state:
         st.session_state["embedding_model"] = None
 
@@ -109,3 +186,50 @@ def set_initial_state():
 
     if "chunk_overlap" not in st.session_state:
         st.session_state["chunk_overlap"] = 200
+
+    if "dedup_chunks" not in st.session_state:
+        st.session_state["dedup_chunks"] = True
+
+    if "dedup_threshold" not in st.session_state:
+        st.session_state["dedup_threshold"] = DEFAULT_DEDUP_THRESHOLD
+
+    if "parse_workers" not in st.session_state:
+        st.session_state["parse_workers"] = min(4, os.cpu_count() or 1)
+
+    if "parse_timeout" not in st.session_state:
+        st.session_state["parse_timeout"] = 600
+
+    if "ingest_batch_size" not in st.session_state:
+        st.session_state["ingest_batch_size"] = 256
+
+    if "embedding_cache" not in st.session_state:
+        st.session_state["embedding_cache"] = True
+
+    if "embedding_cache_size" not in st.session_state:
+        st.session_state["embedding_cache_size"] = 100_000
+
+    if "search_index" not in st.session_state:
+        st.session_state["search_index"] = "exact"
+
+    if "ivf_nlist" not in st.session_state:
+        st.session_state["ivf_nlist"] = 0
+
+    if "ivf_probe_percent" not in st.session_state:
+        st.session_state["ivf_probe_percent"] = round(DEFAULT_PROBE_FRACTION * 100)
+
+    if "vector_precision" not in st.session_state:
+        st.session_state["vector_precision"] = "float32"
+
+    if "vector_rescore" not in st.session_state:
+        st.session_state["vector_rescore"] = True
+
+    if "retrieval_mode" not in st.session_state:
+        st.session_state["retrieval_mode"] = "dense"
+
+    ###############
+    # Pre-warming #
+    ###############
+
+    if "prewarmed" not in st.session_state:
+        st.session_state["prewarmed"] = True
+        prewarm_selected_models()
@@ -1,6 +1,5 @@
 import streamlit as st
 
-import utils.helpers as func
 import utils.rag_pipeline as rag
 import utils.logs as logs
 
@@ -12,21 +11,38 @@ def github_repo():
         st.text_input(
             "Select a GitHub.com repo",
             placeholder="jonfairbanks/local-rag",
+            help="`owner/name` on GitHub.com, or the `https://` or `ssh://` URL of a repository on another git server.",
             key="github_repo",
         )
+        if st.session_state["advanced"] == True:
+            st.text_input(
+                "Include",
+                help="Space-separated glob patterns of the files to index. Patterns without `/` match file and directory names (`*.py`), others the path in the repo (`docs/*`).",
+                key="github_include",
+            )
+            st.text_input(
+                "Exclude",
+                help="Space-separated glob patterns of files and directories to leave out, such as vendored dependencies and build output.",
+                key="github_exclude",
+            )
+            st.number_input(
+                "Max File Size (KB)",
+                min_value=1,
+                help="Larger files, typically generated or data files, are not indexed. Binary files are always skipped.",
+                key="github_max_file_kb",
+            )
 
         repo_processed = None
         repo_processed = st.button(
             "Process",
-            on_click=func.clone_github_repo,
-            args=(st.session_state["github_repo"],),
             key="process_github",
+            disabled=not st.session_state["github_repo"],
         )
 
         with st.spinner("Processing..."):
             if repo_processed is True:
-                # Initiate the RAG pipeline, providing documents to be saved on disk if necessary
-                error = rag.rag_pipeline()
+                # Sync the repo and index the files changed since it was last processed
+                error = rag.rag_pipeline(github_repo=st.session_state["github_repo"])
                 
                 if error is not None:
                     st.exception(error)
@@ -4,6 +4,9 @@ import streamlit as st
 
 import utils.ollama as ollama
 
+from utils.prewarm import prewarm_selected_models
+from utils.translation import TRANSLATION_BACKENDS
+
 from datetime import datetime
 
 import os, shutil
@@ -26,14 +29,46 @@ def settings():
             "Model",
             st.session_state["ollama_models"],
             key="selected_model",
+            on_change=prewarm_selected_models,
             disabled= len(st.session_state["ollama_models"])==0,
             placeholder= "Select Model" if len(st.session_state["ollama_models"])>0 else "No Models Available",
         )
         st.button(
             "Refresh",
             on_click=ollama.get_models,
+            kwargs={"refresh": True},
         )
         if st.session_state["advanced"] == True:
+            st.toggle(
+                "Pre-warm Models",
+                help="Load the selected chat and embedding models in the background as soon as they are selected, so the first question does not wait for them to load.",
+                key="prewarm_models",
+            )
+            st.text_input(
+                "Keep Alive",
+                help="How long Ollama keeps the chat model loaded after the last request, e.g. `30m`, `2h`, or `-1` to keep it loaded indefinitely.",
+                key="ollama_keep_alive",
+            )
+            st.number_input(
+                "Max Connections",
+                min_value=1,
+                help="Maximum number of HTTP connections kept open to Ollama and shared by all sessions.",
+                key="ollama_max_connections",
+            )
+            st.number_input(
+                "Connect Timeout (s)",
+                min_value=0.5,
+                step=0.5,
+                help="Seconds to wait for a connection to Ollama before giving up.",
+                key="ollama_connect_timeout",
+            )
+            st.number_input(
+                "Request Timeout (s)",
+                min_value=1.0,
+                step=10.0,
+                help="Seconds to wait for Ollama to respond, including model loading and generation.",
+                key="ollama_request_timeout",
+            )
             st.select_slider(
                 "Top K",
                 options=[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
@@ -41,6 +76,33 @@ def settings():
                 value=st.session_state["top_k"],
                 key="top_k",
             )
+            st.toggle(
+                "Rerank",
+                help="Retrieve more candidates and rescore them with a local cross-encoder on the CPU; only the `Top K` best are passed to the model. Improves the chunks the model sees without making the prompt longer.",
+                key="rerank",
+            )
+            st.text_input(
+                "Rerank Model",
+                help="Hugging Face name of the cross-encoder used for reranking.",
+                key="rerank_model",
+                disabled=not st.session_state["rerank"],
+            )
+            st.number_input(
+                "Rerank Candidates",
+                min_value=1,
+                max_value=100,
+                help="Number of chunks retrieved and rescored per question.",
+                key="rerank_candidates",
+                disabled=not st.session_state["rerank"],
+            )
+            st.number_input(
+                "Rerank Budget (ms)",
+                min_value=50,
+                step=50,
+                help="Maximum time spent reranking a question. Candidates that could not be rescored in time keep their retrieval order.",
+                key="rerank_budget_ms",
+                disabled=not st.session_state["rerank"],
+            )
             # st.text_area(
             #     "System Prompt",
             #     value=st.session_state["system_prompt"],
@@ -60,6 +122,49 @@ def settings():
                 key="chat_mode",
                 disabled=True,
             )
+            st.selectbox(
+                "Prompt Translation",
+                TRANSLATION_BACKENDS,
+                format_func=lambda backend: {"google": "Google Translate", "ollama": "Ollama (offline)", "none": "None"}[backend],
+                help="How prompts are translated into the language of your documents before retrieval. `Ollama` uses the selected model and works without internet access. Prompts already in the target language are never translated.",
+                key="translation_backend",
+            )
+            st.text_input(
+                "Translation Language",
+                help="ISO 639-1 code of the language prompts are translated into, e.g. `ja`.",
+                key="translation_target",
+                disabled=st.session_state["translation_backend"] == "none",
+            )
+            st.number_input(
+                "Translation Timeout (s)",
+                min_value=0.5,
+                step=0.5,
+                help="If translation takes longer than this, the original prompt is used.",
+                key="translation_timeout",
+                disabled=st.session_state["translation_backend"] == "none",
+            )
+            st.toggle(
+                "Answer Cache",
+                help="Replay the stored answer to a previous, nearly identical question about the same documents instead of generating a new one.",
+                key="answer_cache",
+            )
+            st.slider(
+                "Answer Cache Similarity",
+                min_value=0.80,
+                max_value=1.00,
+                step=0.01,
+                help="Minimum similarity between a new question and a cached one for the cached answer to be used.",
+                key="answer_cache_threshold",
+                disabled=not st.session_state["answer_cache"],
+            )
+            st.number_input(
+                "Answer Cache Size",
+                min_value=10,
+                step=100,
+                help="Maximum number of cached answers. The least recently used answers are evicted first.",
+                key="answer_cache_size",
+                disabled=not st.session_state["answer_cache"],
+            )
             st.write("")
 
     st.subheader(
@@ -77,12 +182,14 @@ def settings():
                 "Other",
             ],
             key="embedding_model",
+            on_change=prewarm_selected_models,
         )
         if embedding_model == "Other":
             st.text_input(
                 "HuggingFace Model",
                 key="other_embedding_model",
                 placeholder="Salesforce/SFR-Embedding-Mistral",
+                on_change=prewarm_selected_models,
             )
         if st.session_state["advanced"] == True:
             st.caption(
@@ -102,6 +209,52 @@ def settings():
                 placeholder="200",
                 value=st.session_state["chunk_overlap"],
             )
+            st.toggle(
+                "Deduplicate Chunks",
+                help="Drop chunks that repeat an earlier chunk, such as page footers, license headers or navigation menus, before they are embedded. Saves embedding time and index space, and keeps repeated boilerplate out of the retrieved context.",
+                key="dedup_chunks",
+            )
+            st.slider(
+                "Duplicate Similarity",
+                min_value=0.5,
+                max_value=1.0,
+                step=0.05,
+                help="How similar (estimated Jaccard similarity of 5-character shingles) a chunk must be to an earlier one to be dropped. `1.0` only drops exact duplicates; lower values also drop chunks that differ by a page number or a few words, at the risk of dropping distinct content.",
+                key="dedup_threshold",
+                disabled=not st.session_state["dedup_chunks"],
+            )
+            st.number_input(
+                "Parsing Workers",
+                min_value=1,
+                max_value=os.cpu_count() or 1,
+                help="Number of processes used to parse uploaded files in parallel. Each worker loads its own parsing models, so higher values use more memory.",
+                key="parse_workers",
+            )
+            st.number_input(
+                "Parsing Timeout (s)",
+                min_value=1,
+                help="Files that take longer than this to parse are skipped so a single problematic file cannot stall the upload.",
+                key="parse_timeout",
+            )
+            st.number_input(
+                "Ingestion Batch Size",
+                min_value=1,
+                help="Number of chunks embedded and inserted into the index at a time. Bounds memory use while ingesting large document sets.",
+                key="ingest_batch_size",
+            )
+            st.toggle(
+                "Embedding Cache",
+                help="Reuse embeddings of chunks that were already embedded with the same model, even across uploads and restarts.",
+                key="embedding_cache",
+            )
+            st.number_input(
+                "Embedding Cache Size",
+                min_value=1000,
+                step=1000,
+                help="Maximum number of cached embeddings. The least recently used entries are evicted first.",
+                key="embedding_cache_size",
+                disabled=not st.session_state["embedding_cache"],
+            )
     st.session_state["use_uploaded_vectordb"] = False
     st.subheader("Vector Databases", help="Vector databases store and manage embeddings, enabling efficient similarity searches and retrieval of relevant data based on semantic meaning.")
     vectorstore_settings = st.container(border=True)
@@ -140,6 +293,50 @@ def settings():
         # Hiển thị path đang được dùng
         current_path = st.session_state.get("vectorstore_path", default_path)
         st.info(f"Using vectorstore from: `{current_path}`")
+
+        if st.session_state["advanced"] == True:
+            st.selectbox(
+                "Search Index",
+                ["exact", "ivf"],
+                format_func=lambda kind: {"exact": "Exact", "ivf": "IVF (approximate)"}[kind],
+                help="`Exact` scores every chunk for each query. `IVF` clusters the chunks and only scans the closest clusters, which is much faster on large corpora at a small cost in recall. Applies the next time documents are processed.",
+                key="search_index",
+            )
+            st.number_input(
+                "IVF Lists",
+                min_value=0,
+                help="Number of clusters the chunks are partitioned into. `0` picks about 4·√n for n chunks.",
+                key="ivf_nlist",
+                disabled=st.session_state["search_index"] != "ivf",
+            )
+            st.number_input(
+                "IVF Probes (%)",
+                min_value=1,
+                max_value=100,
+                help="Share of the clusters scanned per query. Lower values are faster but miss more relevant chunks. At the default of 10%, search is about 2.5 times faster than exact on 100,000 chunks and keeps 0.99 of the exact top 10 when the chunks form clear topics, but only 0.68 on a weakly clustered benchmark. Above 25%, every chunk is scored, i.e. search is exact.",
+                key="ivf_probe_percent",
+                disabled=st.session_state["search_index"] != "ivf",
+            )
+            st.selectbox(
+                "Vector Precision",
+                ["float32", "float16", "int8"],
+                format_func=lambda precision: {"float32": "Float32 (full)", "float16": "Float16", "int8": "Int8"}[precision],
+                help="Precision of the vectors scored by exact search. `Float16` halves and `Int8` quarters the memory used while searching, at a small cost in ranking quality. Applies the next time documents are processed.",
+                key="vector_precision",
+            )
+            st.toggle(
+                "Rescore with Full Precision",
+                help="Re-rank the best candidates of a Float16/Int8 search with the original Float32 vectors, recovering most of the ranking quality.",
+                key="vector_rescore",
+                disabled=st.session_state["vector_precision"] == "float32",
+            )
+            st.selectbox(
+                "Retrieval Mode",
+                ["dense", "hybrid", "keyword"],
+                format_func=lambda mode: {"dense": "Dense (embeddings)", "hybrid": "Hybrid (embeddings + BM25)", "keyword": "Keyword (BM25)"}[mode],
+                help="`Dense` retrieves chunks by embedding similarity. `Keyword` ranks them by BM25 over their words, which finds exact terms such as error codes, product names and identifiers. `Hybrid` combines both rankings. Applies to the next question.",
+                key="retrieval_mode",
+            )
         
     st.subheader("Export Data")
     export_data_settings = st.container(border=True)
@@ -2,7 +2,6 @@ import streamlit as st
 
 import utils.rag_pipeline as rag
 
-from llama_index.readers.web import SimpleWebPageReader
 from urllib.parse import urlparse
 
 
@@ -34,11 +33,51 @@ def website():
             st.caption(f"- {site}")
         st.write("")
 
+        if st.session_state["advanced"] == True:
+            st.number_input(
+                "Crawl Depth",
+                min_value=0,
+                help="How many links away from the listed pages to follow, on the same site. `0` only fetches the listed pages.",
+                key="crawl_depth",
+            )
+            st.number_input(
+                "Max Pages",
+                min_value=1,
+                help="Maximum number of pages fetched in total.",
+                key="crawl_max_pages",
+            )
+            st.number_input(
+                "Concurrent Requests",
+                min_value=1,
+                max_value=64,
+                help="Maximum number of pages fetched at the same time. At most four connections are opened to each site.",
+                key="crawl_concurrency",
+            )
+            st.number_input(
+                "Requests per Second per Site",
+                min_value=0.0,
+                step=1.0,
+                help="Limits how fast each site is crawled, to stay polite to its servers. `0` disables the limit.",
+                key="crawl_rate",
+            )
+
         process_button = st.button("Process", key="process_website")
 
         if process_button:
-            documents = SimpleWebPageReader(html_to_text=True).load_data(
-                st.session_state["websites"]
+            from utils.web_crawler import crawl_websites, load_http_cache
+
+            with st.spinner("Fetching..."):
+                documents, stats = crawl_websites(
+                    st.session_state["websites"],
+                    max_depth=int(st.session_state["crawl_depth"]),
+                    max_pages=int(st.session_state["crawl_max_pages"]),
+                    concurrency=int(st.session_state["crawl_concurrency"]),
+                    rate=float(st.session_state["crawl_rate"]),
+                    cache=load_http_cache(),
+                )
+            st.caption(
+                f"✔️ Fetched {stats['pages']:,} page(s): {stats['downloaded']:,} downloaded, "
+                f"{stats['not_modified']:,} unchanged, {stats['failed']:,} failed"
             )
 
             if len(documents) > 0:
@@ -0,0 +1,33 @@
+import os
+
+from utils.batch_index import collect_files, iter_file_documents
+from utils.manifest import IngestionManifest
+
+
+def write(root, path: str, text: str):
+    filepath = os.path.join(root, path)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "w") as f:
+        f.write(text)
+    return filepath
+
+
+def test_files_with_the_same_name_in_different_directories_are_indexed(tmp_path):
+    docs = str(tmp_path / "docs")
+    write(docs, "guide/README.md", "# Guide\n")
+    write(docs, "api/README.md", "# API\n")
+    write(docs, ".git/config", "[core]\n")
+    single = write(str(tmp_path), "notes/README.md", "# Notes\n")
+
+    sources = collect_files([docs, single])
+    assert [source for _, source in sources] == ["api/README.md", "guide/README.md", "README.md"]
+
+    manifest = IngestionManifest(str(tmp_path / "vectordb"))
+    stats = {"files": 0, "skipped": 0, "failed": 0, "bytes": 0}
+    documents = list(iter_file_documents(sources, manifest, stats))
+    assert {document.metadata["file_name"]: document.text for document in documents} == {
+        "api/README.md": "# API\n",
+        "guide/README.md": "# Guide\n",
+        "README.md": "# Notes\n",
+    }
+    assert stats["files"] == 3
@@ -0,0 +1,27 @@
+from utils.embedding_cache import EmbeddingCache
+
+
+def test_entries_count_each_key_once(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+
+    cache.put_many("model", ["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+    cache.put_many("model", ["a"], [[0.5, 0.5]])
+    cache.put_many("model", ["c", "c"], [[1.0, 1.0], [2.0, 2.0]])
+
+    assert cache.stats()["entries"] == 3
+    assert cache.get_many(["a", "c"]) == [[0.5, 0.5], [2.0, 2.0]]
+    assert EmbeddingCache(str(tmp_path / "embeddings.sqlite3")).stats()["entries"] == 3
+
+
+def test_rewriting_keys_does_not_evict(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), max_entries=2)
+
+    cache.put_many("model", ["a", "b"], [[1.0], [2.0]])
+    for _ in range(3):
+        cache.put_many("model", ["a", "b"], [[1.0], [2.0]])
+    assert cache.get_many(["a", "b"]) == [[1.0], [2.0]]
+
+    # A new key beyond the limit evicts the least recently used one
+    cache.put_many("model", ["c"], [[3.0]])
+    assert cache.stats()["entries"] == 2
+    assert cache.get_many(["a", "b", "c"]).count(None) == 1
@@ -0,0 +1,130 @@
+import os
+
+import pytest
+
+import utils.git_repo as git_repo
+
+from benchmarks.repo_sync import commit
+from utils.git_repo import git
+from utils.manifest import IngestionManifest
+
+
+def write(work: str, path: str, text: str):
+    filepath = os.path.join(work, path)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "w") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """
+    A local bare repository standing in for the remote, and a working copy to push commits from.
+    """
+    remote = str(tmp_path / "remote.git")
+    work = str(tmp_path / "work")
+    git("init", "-q", "--bare", "-b", "main", remote)
+    git("clone", "-q", remote, work)
+    write(work, "docs/guide.md", "# Guide\n")
+    write(work, "docs/faq.md", "# FAQ\n")
+    write(work, "src/app.py", "print('app')\n")
+    write(work, "node_modules/lib/index.js", "module.exports = 1;\n")
+    commit(work, "Initial commit")
+    return remote, work
+
+
+def sync(remote: str, tmp_path, manifest: IngestionManifest, include: list = None, persist: bool = True):
+    """
+    Syncs the repository and records its documents as an ingestion would; returns the paths of the parsed files.
+    """
+    repo_sync = git_repo.sync_repo(remote, str(tmp_path / "repos"), allow_local=True)
+    stats = {"files": 0, "skipped": 0, "failed": 0, "bytes": 0}
+    sources = [
+        document.metadata["file_name"]
+        for document in git_repo.iter_repo_documents(repo_sync, manifest, stats, include=include)
+    ]
+    parsed = sorted(source.split("/", 2)[2] for source in sources)
+    if not persist:
+        # The ingestion failed: neither the manifest nor the indexed commit are updated
+        manifest.pending.clear()
+        manifest.removed.clear()
+        return parsed
+    for source in sources:
+        manifest.record(source, [], [])
+    for source in manifest.removed:
+        manifest.sources.pop(source, None)
+    manifest.removed.clear()
+    git_repo.mark_indexed(repo_sync)
+    return parsed
+
+
+def indexed(manifest: IngestionManifest):
+    return sorted(source.split("/", 2)[2] for source in manifest.sources)
+
+
+def test_incremental_sync_with_a_rename_and_a_delete(remote, tmp_path):
+    remote, work = remote
+    manifest = IngestionManifest(str(tmp_path))
+    assert sync(remote, tmp_path, manifest) == ["docs/faq.md", "docs/guide.md", "src/app.py"]
+
+    git("mv", "docs/guide.md", "docs/manual.md", cwd=work)
+    os.remove(os.path.join(work, "docs/faq.md"))
+    write(work, "src/app.py", "print('changed')\n")
+    commit(work, "Rename, delete and change")
+
+    assert sync(remote, tmp_path, manifest) == ["docs/manual.md", "src/app.py"]
+    assert indexed(manifest) == ["docs/manual.md", "src/app.py"]
+
+    # Nothing changed upstream: nothing is parsed
+    assert sync(remote, tmp_path, manifest) == []
+    assert indexed(manifest) == ["docs/manual.md", "src/app.py"]
+
+
+def test_filter_change_scans_all_files(remote, tmp_path):
+    remote, work = remote
+    manifest = IngestionManifest(str(tmp_path))
+    assert sync(remote, tmp_path, manifest, include=["*.md"]) == ["docs/faq.md", "docs/guide.md"]
+
+    # Files the new filters include are indexed although they did not change; unchanged files are skipped
+    assert sync(remote, tmp_path, manifest, include=["*.py"]) == ["src/app.py"]
+    assert indexed(manifest) == ["src/app.py"]
+
+
+def test_filter_change_is_retried_after_a_failed_ingestion(remote, tmp_path):
+    remote, work = remote
+    manifest = IngestionManifest(str(tmp_path))
+    sync(remote, tmp_path, manifest, include=["*.md"])
+
+    assert sync(remote, tmp_path, manifest, include=["*.md", "*.py"], persist=False) == ["src/app.py"]
+    assert sync(remote, tmp_path, manifest, include=["*.md", "*.py"]) == ["src/app.py"]
+    assert indexed(manifest) == ["docs/faq.md", "docs/guide.md", "src/app.py"]
+
+
+def test_only_the_command_line_reads_local_repositories(remote, tmp_path):
+    remote, work = remote
+
+    with pytest.raises(ValueError):
+        git_repo.sync_repo(remote, str(tmp_path / "repos"))
+    assert not os.path.exists(tmp_path / "repos")
+    assert git_repo.repo_url(remote, allow_local=True) == "file://" + os.path.abspath(remote)
+
+
+@pytest.mark.parametrize(
+    "repo, url",
+    [
+        ("jonfairbanks/local-rag", "https://github.com/jonfairbanks/local-rag.git"),
+        ("https://gitlab.com/group/project.git", "https://gitlab.com/group/project.git"),
+        ("ssh://git@example.com:2222/team/repo.git", "ssh://git@example.com:2222/team/repo.git"),
+        ("git@github.com:jonfairbanks/local-rag.git", "git@github.com:jonfairbanks/local-rag.git"),
+        ("file:///etc", None),
+        ("/etc", None),
+        ("ext::sh -c touch% /tmp/pwned", None),
+        ("--upload-pack=touch /tmp/pwned", None),
+    ],
+)
+def test_repo_url(repo, url):
+    if url is None:
+        with pytest.raises(ValueError):
+            git_repo.repo_url(repo)
+    else:
+        assert git_repo.repo_url(repo) == url
@@ -0,0 +1,106 @@
+import pytest
+
+from llama_index.core import Document, Settings, StorageContext, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+
+from utils.dedup import ChunkDeduplicator
+from utils.ingestion import ingest_documents
+from utils.manifest import IngestionManifest
+from utils.text_splitter import LanguageAwareSplitter
+from utils.vector_store import MmapVectorStore
+
+FOOTER = "Copyright Example Corp. All rights reserved. Do not distribute without written permission."
+
+
+@pytest.fixture
+def index():
+    Settings.embed_model = MockEmbedding(embed_dim=8)
+    return VectorStoreIndex([], storage_context=StorageContext.from_defaults(vector_store=MmapVectorStore()))
+
+
+def ingest(index, manifest, files: dict):
+    documents = [Document(text=text, metadata={"file_name": name}) for name, text in files.items()]
+    return ingest_documents(
+        documents,
+        index,
+        manifest,
+        node_parser=LanguageAwareSplitter(chunk_size=64, chunk_overlap=0),
+        deduplicator=ChunkDeduplicator(),
+    )
+
+
+def indexed_texts(index):
+    node_ids = [node.node_id for node in index.vector_store.get_nodes()]
+    return sorted(index.docstore.get_node(node_id).get_content() for node_id in node_ids)
+
+
+def test_duplicate_chunks_are_embedded_once(index, tmp_path):
+    manifest = IngestionManifest(str(tmp_path))
+    stats = ingest(index, manifest, {"a.txt": FOOTER, "b.txt": FOOTER})
+
+    assert stats["duplicates"] == 1
+    assert indexed_texts(index) == [FOOTER]
+    assert manifest.node_ids("a.txt") == manifest.node_ids("b.txt")
+
+
+def test_changing_the_source_of_a_kept_chunk_keeps_it_for_its_duplicates(index, tmp_path):
+    manifest = IngestionManifest(str(tmp_path))
+    ingest(index, manifest, {"a.txt": FOOTER, "b.txt": FOOTER})
+
+    ingest(index, manifest, {"a.txt": "Edited.", "b.txt": FOOTER})
+
+    assert indexed_texts(index) == sorted(["Edited.", FOOTER])
+    assert manifest.node_ids("a.txt") != manifest.node_ids("b.txt")
+
+
+def test_removing_the_source_of_a_kept_chunk_keeps_it_for_its_duplicates(index, tmp_path):
+    manifest = IngestionManifest(str(tmp_path))
+    ingest(index, manifest, {"a.txt": FOOTER, "b.txt": FOOTER})
+
+    manifest.remove("a.txt")
+    ingest(index, manifest, {"b.txt": FOOTER})
+    assert indexed_texts(index) == [FOOTER]
+
+    # Once no source refers to the chunk any more, it is deleted
+    manifest.remove("b.txt")
+    ingest(index, manifest, {})
+    assert indexed_texts(index) == []
+    assert manifest.references() == {}
+
+
+def test_near_duplicates_refer_to_the_kept_chunk(index, tmp_path):
+    manifest = IngestionManifest(str(tmp_path))
+    ingest(index, manifest, {"a.txt": FOOTER + " Page 1", "b.txt": FOOTER + " Page 2"})
+    assert indexed_texts(index) == [FOOTER + " Page 1"]
+
+    ingest(index, manifest, {"a.txt": "Edited.", "b.txt": FOOTER + " Page 2"})
+
+    assert indexed_texts(index) == sorted(["Edited.", FOOTER + " Page 1"])
+
+
+def test_manifest_reference_counts_survive_a_reload(index, tmp_path):
+    manifest = IngestionManifest(str(tmp_path))
+    ingest(index, manifest, {"a.txt": FOOTER, "b.txt": FOOTER})
+    manifest.save()
+
+    manifest = IngestionManifest.load(str(tmp_path))
+    shared = manifest.node_ids("a.txt")
+    assert manifest.release("a.txt") == []
+    assert manifest.release("b.txt") == shared
+
+
+def test_exact_copies_of_a_near_duplicate_refer_to_the_kept_chunk(index, tmp_path):
+    manifest = IngestionManifest(str(tmp_path))
+    ingest(index, manifest, {"a.txt": FOOTER + " Page 1", "b.txt": FOOTER + " Page 2", "c.txt": FOOTER + " Page 2"})
+    assert indexed_texts(index) == [FOOTER + " Page 1"]
+    assert manifest.node_ids("c.txt") == manifest.node_ids("a.txt")
+
+    manifest.remove("c.txt")
+    ingest(index, manifest, {"a.txt": FOOTER + " Page 1", "b.txt": FOOTER + " Page 2"})
+    assert indexed_texts(index) == [FOOTER + " Page 1"]
+
+    manifest.remove("b.txt")
+    manifest.remove("a.txt")
+    ingest(index, manifest, {})
+    assert indexed_texts(index) == []
+    assert manifest.references() == {}
@@ -0,0 +1,163 @@
+import json
+import time
+import threading
+import http.client
+
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from llama_index.llms.ollama import Ollama
+
+from benchmarks.query_server import FakeOllamaHandler, ask, build_index, start
+from utils.ollama import create_client
+from utils.query_server import QueryServer, QueryService
+
+
+@pytest.fixture(scope="module")
+def index():
+    return build_index(200)
+
+
+@pytest.fixture
+def serve(index):
+    """
+    Starts a fake Ollama and a query server over `index`; returns the port of the query server.
+    """
+    servers = []
+
+    def serve(tokens: int = 5, token_delay: float = 0.0, **service_options):
+        handler = type("Handler", (FakeOllamaHandler,), {"tokens": tokens, "token_delay": token_delay})
+        ollama_server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        host = f"http://127.0.0.1:{start(ollama_server)}"
+        llm = Ollama(model="fake", base_url=host, client=create_client(host, max_connections=32))
+        query_server = QueryServer(("127.0.0.1", 0), QueryService(index, llm, **service_options))
+        servers.extend([ollama_server, query_server])
+        return start(query_server)
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def post(port: int, body: dict):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    connection.request("POST", "/query", body=json.dumps(body), headers={"Content-Type": "application/json"})
+    return connection, connection.getresponse()
+
+
+def read_events(response):
+    """
+    Parses a server-sent event stream into `(event, data)` pairs.
+    """
+    events = []
+    event = None
+    for line in response:
+        line = line.decode("utf-8").rstrip("\n")
+        if line.startswith("event: "):
+            event = line[len("event: ") :]
+        elif line.startswith("data: "):
+            events.append((event, json.loads(line[len("data: ") :])))
+    return events
+
+
+def test_health(serve):
+    port = serve()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    connection.request("GET", "/health")
+    response = connection.getresponse()
+
+    assert response.status == 200
+    assert json.loads(response.read()) == {"status": "ok", "vectors": 200}
+
+
+def test_streams_tokens_as_server_sent_events(serve):
+    port = serve(tokens=5)
+    connection, response = post(port, {"query": "What is topic 3?", "top_k": 2})
+
+    assert response.status == 200
+    assert response.getheader("Content-Type").startswith("text/event-stream")
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    events = read_events(response)
+    connection.close()
+
+    assert [event for event, _ in events] == ["token"] * 5 + ["done"]
+    assert "".join(data["text"] for _, data in events[:-1]) == "token0 token1 token2 token3 token4 "
+    done = events[-1][1]
+    assert len(done["sources"]) == 2
+    assert done["metrics"]["tokens"] == 5
+
+
+def test_tokens_are_sent_as_they_are_generated(serve):
+    port = serve(tokens=10, token_delay=0.1)
+
+    first_token, total, tokens = ask(port, "What is topic 3?")
+
+    assert tokens == 10
+    assert first_token < total / 2
+
+
+def test_answers_without_streaming(serve):
+    port = serve(tokens=3)
+    connection, response = post(port, {"query": "What is topic 3?", "top_k": 1, "stream": False})
+    body = json.loads(response.read())
+    connection.close()
+
+    assert response.status == 200
+    assert body["answer"] == "token0 token1 token2 "
+    assert len(body["sources"]) == 1
+
+
+def test_concurrent_requests_are_served_in_parallel(serve):
+    # One answer takes about 1 second; served one after the other, 8 would take 8
+    port = serve(tokens=10, token_delay=0.1, max_concurrency=8)
+    results = [None] * 8
+
+    def run(i):
+        results[i] = ask(port, f"What is topic {i}?")
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start_time
+
+    assert [result[2] for result in results] == [10] * 8
+    assert wall < 4
+
+
+def test_busy_server_answers_503(serve):
+    port = serve(tokens=10, token_delay=0.1, max_concurrency=1, queue_timeout=0.1)
+    first = threading.Thread(target=ask, args=(port, "What is topic 1?"))
+    first.start()
+    time.sleep(0.3)
+
+    connection, response = post(port, {"query": "What is topic 2?"})
+    response.read()
+    connection.close()
+    first.join()
+
+    assert response.status == 503
+    assert response.getheader("Retry-After") == "1"
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {},
+        {"query": "  "},
+        {"query": "What is topic 1?", "top_k": 0},
+        {"query": "What is topic 1?", "chat_mode": "unknown"},
+        {"query": "What is topic 1?", "retrieval_mode": "unknown"},
+    ],
+)
+def test_invalid_requests_answer_400(serve, body):
+    port = serve()
+    connection, response = post(port, body)
+    response.read()
+    connection.close()
+
+    assert response.status == 400
@@ -0,0 +1,38 @@
+import pytest
+
+from llama_index.core.utils import get_tokenizer
+
+from utils.text_splitter import LanguageAwareSplitter
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        " ".join(["retrieval", "embedding", "index", "chunk"] * 500),  # No sentence punctuation: cut at whitespace
+        ", ".join(["retrieval augmented generation"] * 500),  # Cut at clause boundaries
+    ],
+)
+def test_chunks_are_filled_up_to_the_chunk_size(text):
+    tokenizer = get_tokenizer()
+    chunks = LanguageAwareSplitter(chunk_size=64, chunk_overlap=0).split_text(text)
+    tokens = [len(tokenizer(chunk)) for chunk in chunks]
+
+    # Separators between words are counted once, not with every word
+    assert min(tokens[:-1]) > 56
+    assert max(tokens) <= 66
+    assert len(chunks) <= len(tokenizer(text)) / 56 + 1
+
+
+@pytest.mark.parametrize(
+    "text, sentences",
+    [
+        ("Use a splitter, e.g. this one. Then index it.", ["Use a splitter, e.g. this one.", "Then index it."]),
+        ("Ask Dr. Smith about it; he knows. Done.", ["Ask Dr. Smith about it; he knows.", "Done."]),
+        ("It is fast; Indexing is not. 索引。検索", ["It is fast;", "Indexing is not.", "索引。", "検索"]),
+    ],
+)
+def test_sentence_boundaries(text, sentences):
+    splitter = LanguageAwareSplitter(chunk_size=1024, chunk_overlap=0)
+    units = [text[start:end].strip() for start, end, _ in splitter._units(text, 1024)]
+
+    assert units == sentences
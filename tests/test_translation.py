@@ -0,0 +1,172 @@
+import json
+import socket
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.translation import OllamaBackend, TranslationStage, script_language, script_languages
+
+
+class RecordingBackend:
+    """
+    A local stand-in for a translation service that records the texts it is asked to translate.
+    """
+
+    name = "recording"
+
+    def __init__(self, delay: float = 0.0, error: Exception = None):
+        self.calls = []
+        self.delay = delay
+        self.error = error
+
+    def translate(self, text: str, target: str):
+        self.calls.append((text, target))
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return f"[{target}] {text}"
+
+
+class GenerateHandler(BaseHTTPRequestHandler):
+    """
+    Answers `/api/generate` like Ollama, echoing the text to translate.
+    """
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self.server.prompts.append(body["prompt"])
+        data = json.dumps(
+            {"model": body["model"], "response": " 翻訳 \n", "done": True, "created_at": "2024-01-01T00:00:00Z"}
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_ollama():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GenerateHandler)
+    server.prompts = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def unused_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.mark.parametrize(
+    "text, language",
+    [
+        ("東京大学の研究について教えて", "ja"),
+        ("カタカナ", "ja"),
+        ("会議室予約方法", None),  # Kanji only: Japanese or Chinese
+        ("東京大学研究所", None),
+        ("我们的产品价格是多少", "zh"),
+        ("你們的產品", "zh"),
+        ("What is retrieval-augmented generation?", None),  # Latin script: any of many languages
+        ("Tài liệu này nói gì về doanh thu?", None),
+        ("안녕하세요", "ko"),
+        ("Привет", None),
+        ("12345 !?", None),
+    ],
+)
+def test_script_language(text, language):
+    assert script_language(text) == language
+
+
+@pytest.mark.parametrize(
+    "text, languages",
+    [
+        ("会議室予約方法", {"ja", "zh"}),
+        ("我们的产品", {"zh"}),
+        ("Where are the meeting notes?", None),
+        ("12345 !?", set()),
+    ],
+)
+def test_script_languages(text, languages):
+    assert script_languages(text) == languages
+
+
+@pytest.mark.parametrize("target", ["en", "vi"])
+def test_latin_script_prompts_are_left_to_the_backend(target):
+    # Vietnamese is written in Latin script like English, so only the backend can tell whether it needs translating
+    backend = RecordingBackend()
+    stage = TranslationStage(backend, target=target)
+
+    assert stage.translate("Tài liệu này nói gì về doanh thu?") == f"[{target}] Tài liệu này nói gì về doanh thu?"
+    assert backend.calls == [("Tài liệu này nói gì về doanh thu?", target)]
+
+
+def test_kanji_only_prompts_are_translated_into_other_languages():
+    backend = RecordingBackend()
+    stage = TranslationStage(backend, target="en")
+
+    assert stage.translate("会議室予約方法") == "[en] 会議室予約方法"
+
+
+def test_prompts_in_the_target_language_are_not_translated():
+    backend = RecordingBackend()
+    stage = TranslationStage(backend, target="ja")
+
+    assert stage.translate("会議の議事録はどこですか") == "会議の議事録はどこですか"
+    assert stage.translate("会議室予約方法") == "会議室予約方法"
+    assert backend.calls == []
+
+
+def test_translations_are_cached():
+    backend = RecordingBackend()
+    stage = TranslationStage(backend, target="ja")
+
+    assert stage.translate("Where are the meeting notes?") == "[ja] Where are the meeting notes?"
+    assert stage.translate("Where are the meeting notes?") == "[ja] Where are the meeting notes?"
+    assert stage.translate("Who wrote them?") == "[ja] Who wrote them?"
+
+    assert backend.calls == [("Where are the meeting notes?", "ja"), ("Who wrote them?", "ja")]
+
+
+def test_failing_backend_falls_back_to_the_prompt():
+    backend = RecordingBackend(error=ConnectionError("network is unreachable"))
+    stage = TranslationStage(backend, target="ja")
+
+    assert stage.translate("Where are the meeting notes?") == "Where are the meeting notes?"
+    # Failures are not cached, so the backend is asked again once it is reachable
+    backend.error = None
+    assert stage.translate("Where are the meeting notes?") == "[ja] Where are the meeting notes?"
+    assert len(backend.calls) == 2
+
+
+def test_slow_backend_falls_back_after_the_timeout():
+    stage = TranslationStage(RecordingBackend(delay=2.0), target="ja", timeout=0.2)
+
+    start = time.perf_counter()
+    assert stage.translate("Where are the meeting notes?") == "Where are the meeting notes?"
+    assert time.perf_counter() - start < 1.0
+
+
+def test_ollama_backend_translates_offline(fake_ollama):
+    host = f"http://127.0.0.1:{fake_ollama.server_port}"
+    stage = TranslationStage(OllamaBackend("fake", host), target="ja")
+
+    assert stage.translate("Where are the meeting notes?") == "翻訳"
+    assert stage.translate("Where are the meeting notes?") == "翻訳"
+    assert len(fake_ollama.prompts) == 1
+    assert "'ja'" in fake_ollama.prompts[0]
+
+
+def test_unreachable_ollama_falls_back_to_the_prompt():
+    stage = TranslationStage(OllamaBackend("fake", f"http://127.0.0.1:{unused_port()}"), target="ja")
+
+    assert stage.translate("Where are the meeting notes?") == "Where are the meeting notes?"
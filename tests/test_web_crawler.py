@@ -0,0 +1,104 @@
+import time
+import asyncio
+
+import pytest
+
+from benchmarks.web_crawl import SiteHandler, start_site
+from utils.web_crawler import HostRateLimiter, HttpCache, crawl_websites
+
+
+class RecordingSiteHandler(SiteHandler):
+    """
+    Serves the benchmark's site, recording when each request arrives.
+    """
+
+    def do_GET(self):
+        self.server.times.append(time.monotonic())
+        super().do_GET()
+
+
+@pytest.fixture
+def site():
+    server = start_site(pages=13, latency=0.0)
+    server.RequestHandlerClass = RecordingSiteHandler
+    server.times = []
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def urls(site, *pages):
+    return [f"http://127.0.0.1:{site.server_port}/page/{n}" for n in pages]
+
+
+def test_crawl_follows_links_once(site):
+    documents, stats = crawl_websites(urls(site, 0), max_depth=5, max_pages=100, rate=0)
+
+    # Every page links home and to its children with a fragment; each page is fetched once
+    pages = {document.metadata["url"]: document for document in documents}
+    assert sorted(pages) == sorted(urls(site, *range(13)))
+    assert stats["pages"] == stats["downloaded"] == site.requests == 13
+    assert pages[urls(site, 4)[0]].metadata["title"] == "Page 4"
+
+
+def test_crawl_stops_at_max_depth_and_max_pages(site):
+    documents, _ = crawl_websites(urls(site, 0), max_depth=1, max_pages=100, rate=0)
+    assert len(documents) == 4
+
+    documents, _ = crawl_websites(urls(site, 0), max_depth=5, max_pages=6, rate=0)
+    assert len(documents) == 6
+
+
+def test_missing_pages_are_counted_as_failed(site):
+    documents, stats = crawl_websites(urls(site, 1, 99), rate=0)
+
+    assert len(documents) == 1
+    assert stats["failed"] == 1
+
+
+def test_warm_cache_revalidates_with_304(site, tmp_path):
+    cache = HttpCache(str(tmp_path / "http.sqlite3"))
+    options = dict(max_depth=5, max_pages=100, rate=0, cache=cache)
+    crawl_websites(urls(site, 0), **options)
+    cold_bytes = site.bytes
+
+    site.revisions[4] = 1
+    site.bytes = 0
+    documents, stats = crawl_websites(urls(site, 0), **options)
+    pages = {document.metadata["url"]: document.text for document in documents}
+
+    assert stats["downloaded"] == 1
+    assert stats["not_modified"] == 12
+    assert "revision 1" in pages[urls(site, 4)[0]]
+    # Unchanged pages are served from the cache, and their cached links are followed, without downloading them
+    assert stats["pages"] == 13
+    assert "revision 0" in pages[urls(site, 12)[0]]
+    assert 0 < site.bytes < cold_bytes / 10
+
+
+def test_requests_to_a_host_are_rate_limited(site):
+    start = time.monotonic()
+    crawl_websites(urls(site, *range(6)), rate=20, concurrency=6, per_host=6)
+
+    gaps = [later - earlier for earlier, later in zip(site.times, site.times[1:])]
+    assert len(site.times) == 6
+    assert min(gaps) > 0.04
+    assert time.monotonic() - start > 0.24
+
+
+def test_rate_limit_is_per_host():
+    limiter = HostRateLimiter(rate=10)
+
+    async def wait(host: str):
+        await limiter.wait(host)
+        return time.monotonic()
+
+    async def main():
+        start = time.monotonic()
+        times = await asyncio.gather(wait("a.example"), wait("a.example"), wait("a.example"), wait("b.example"))
+        return [t - start for t in times]
+
+    a1, a2, a3, b = asyncio.run(main())
+    assert a1 < 0.05 and b < 0.05
+    assert 0.09 < a2 < 0.15
+    assert 0.19 < a3 < 0.25
@@ -0,0 +1,171 @@
+import math
+
+import numpy as np
+
+import utils.logs as logs
+
+# Share of the lists scanned per query by default, well below `EXACT_SCAN_SHARE` so that searches do skip rows.
+# Recall depends on how strongly the embeddings are clustered: sentence embeddings keep nearly all of the exact top k,
+# while weakly clustered corpora lose relevant rows and need a larger share (see `benchmarks/ann_recall.py`)
+DEFAULT_PROBE_FRACTION = 0.1
+# Gathering the scattered rows of the probed lists costs about four times as much per row as scoring the contiguous
+# matrix, so a search that would scan more than this share of the rows scores all of them instead
+EXACT_SCAN_SHARE = 0.25
+
+###################################
+#
+# Inverted File (IVF) Index
+#
+###################################
+
+
+class IVFIndex:
+    """
+    An inverted file index for approximate nearest neighbour search over unit-normalized vectors.
+
+    The vectors are clustered with spherical k-means into `nlist` lists. A query is scored against the centroids
+    first, and only the rows of the `nprobe` closest lists are scored exactly. `nprobe` trades recall for latency:
+    probing every list is equivalent to exhaustive search. It is best chosen as a share of `nlist` (see `probes()`),
+    as the recall of a fixed number of probes falls as the corpus, and with it the number of lists, grows.
+
+    The index only stores the centroids and, for each list, the rows of the vector matrix it contains; the vectors
+    themselves stay in the (memory-mapped) matrix of the vector store.
+    """
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+
+    @property
+    def size(self):
+        return len(self.order)
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def probes(self, fraction: float):
+        """
+        Returns the number of lists to scan to cover `fraction` of the lists, at least one.
+        """
+        return max(1, min(self.nlist, math.ceil(self.nlist * fraction)))
+
+    @staticmethod
+    def default_nlist(rows: int):
+        """
+        Returns the number of lists used when none is configured: about `4 * sqrt(rows)`.
+        """
+        return max(1, min(rows, int(4 * math.sqrt(rows))))
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        nlist: int = 0,
+        iterations: int = 10,
+        sample_size: int = 256,
+        seed: int = 0,
+    ):
+        """
+        Clusters the rows of `matrix` with spherical k-means.
+
+        Args:
+            matrix (np.ndarray): An `(n, dim)` matrix of unit-normalized vectors.
+            nlist (int, optional): Number of lists. `0` picks `default_nlist(n)`. Defaults to 0.
+            iterations (int, optional): k-means iterations. Defaults to 10.
+            sample_size (int, optional): Training rows per list; k-means is trained on at most `nlist * sample_size` rows. Defaults to 256.
+            seed (int, optional): Random seed. Defaults to 0.
+
+        Returns:
+            IVFIndex: The built index.
+        """
+        rows = len(matrix)
+        nlist = min(nlist or cls.default_nlist(rows), rows)
+        rng = np.random.default_rng(seed)
+
+        sample = matrix
+        if rows > nlist * sample_size:
+            sample = matrix[np.sort(rng.choice(rows, nlist * sample_size, replace=False))]
+        sample = np.asarray(sample, dtype=np.float32)
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Re-seed empty lists with random rows so that every list stays in use
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        assignments = cls._assign(matrix, centroids)
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[order], np.arange(nlist + 1))
+
+        logs.log.info(f"Built IVF index with {nlist:,} lists over {rows:,} vectors")
+
+        return cls(centroids.astype(np.float32), order.astype(np.int64), offsets.astype(np.int64))
+
+    @staticmethod
+    def _assign(matrix: np.ndarray, centroids: np.ndarray, block: int = 65536):
+        assignments = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), block):
+            chunk = np.asarray(matrix[start : start + block], dtype=np.float32)
+            assignments[start : start + block] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int, nprobe: int):
+        """
+        Returns the approximate top-k rows for a unit-normalized query.
+
+        Args:
+            matrix (np.ndarray): The vector matrix the index was built over.
+            query (np.ndarray): The unit-normalized query vector.
+            k (int): Number of results.
+            nprobe (int): Number of lists to scan.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The rows and their similarities, best first.
+
+        Notes:
+            If the probed lists hold more than `EXACT_SCAN_SHARE` of the rows, all rows are scored, which is faster
+            and exact.
+        """
+        nprobe = max(1, min(nprobe, self.nlist))
+        centroid_scores = self.centroids @ query
+        probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        sizes = self.offsets[probed + 1] - self.offsets[probed]
+        if sizes.sum() > EXACT_SCAN_SHARE * len(matrix):
+            rows = np.arange(len(matrix))
+            similarities = matrix @ query
+        else:
+            rows = np.concatenate(
+                [self.order[self.offsets[c] : self.offsets[c + 1]] for c in probed]
+            )
+            if len(rows) == 0:
+                return rows, np.empty(0, dtype=np.float32)
+
+            rows.sort()  # Sequential access is much faster on a memory-mapped matrix
+            similarities = matrix[rows] @ query
+
+        if k < len(similarities):
+            top = np.argpartition(-similarities, k - 1)[:k]
+        else:
+            top = np.arange(len(similarities))
+        top = top[np.argsort(-similarities[top])]
+
+        return rows[top], similarities[top]
+
+    def save(self, file):
+        """
+        Writes the index to a path or binary file object in NumPy's `.npz` format.
+        """
+        np.savez(file, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls(data["centroids"], data["order"], data["offsets"])
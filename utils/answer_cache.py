@@ -0,0 +1,212 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+import streamlit as st
+
+import utils.logs as logs
+
+DEFAULT_ANSWER_CACHE_PATH = os.path.join(os.getcwd(), ".cache", "answers.sqlite3")
+
+
+###################################
+#
+# Answer Cache Scope
+#
+###################################
+
+
+def answer_scope(index_revision: str, model: str, chat_mode: str, retrieval: Sequence = ()):
+    """
+    Returns the key under which answers are cached: only answers generated from the same index content, with the
+    same model, chat mode and retrieval settings, can be served for a new question.
+
+    Args:
+        index_revision (str): The `revision` of the index's vector store.
+        model (str): The Ollama model that generated the answer.
+        chat_mode (str): The query engine response mode.
+        retrieval (Sequence, optional): The settings the context was retrieved with, e.g. `top_k`, the retrieval mode
+            and reranking. Defaults to ().
+
+    Returns:
+        str: The scope key.
+    """
+    return hashlib.sha256(
+        "\0".join(
+            [index_revision, model or "", chat_mode or "", json.dumps(list(retrieval), default=str)]
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def stream_text(text: str):
+    """
+    Replays a cached answer word by word, like the token stream of a live response.
+    """
+    for token in re.findall(r"\S+\s*|\s+", text):
+        yield token
+
+
+###################################
+#
+# Semantic Answer Cache
+#
+###################################
+
+
+class AnswerCache:
+    """
+    A size-bounded, persistent cache of generated answers, looked up by query-embedding similarity.
+
+    Each entry stores the (unit-normalized) embedding of the question, the final answer and the IDs and scores of the
+    source nodes it was generated from, under an `answer_scope()`. A new question is answered from the cache if the
+    most similar cached question of the same scope reaches the similarity threshold. Entries are evicted least
+    recently used first once the cache holds more than `max_entries` answers.
+    """
+
+    def __init__(self, path: str = DEFAULT_ANSWER_CACHE_PATH, max_entries: int = 1000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "id INTEGER PRIMARY KEY, scope TEXT NOT NULL, embedding BLOB NOT NULL, answer TEXT NOT NULL, "
+            "node_ids TEXT NOT NULL, scores TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope)")
+        self._conn.commit()
+
+    def lookup(self, scope: str, embedding: List[float], threshold: float):
+        """
+        Finds the cached answer of the most similar question.
+
+        Args:
+            scope (str): The `answer_scope()` of the current index, model and chat mode.
+            embedding (list[float]): The embedding of the new question.
+            threshold (float): Minimum cosine similarity between the new and the cached question.
+
+        Returns:
+            Optional[dict]: `answer`, `node_ids`, `scores` and `similarity` of the hit, or None.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= max(np.linalg.norm(query), 1e-12)
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, embedding FROM answers WHERE scope = ?", (scope,)
+            ).fetchall()
+
+            best = None
+            if rows:
+                matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                similarities = matrix @ query
+                row = int(np.argmax(similarities))
+                if similarities[row] >= threshold:
+                    best = (rows[row][0], float(similarities[row]))
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            entry_id, similarity = best
+            answer, node_ids, scores = self._conn.execute(
+                "SELECT answer, node_ids, scores FROM answers WHERE id = ?", (entry_id,)
+            ).fetchone()
+            self._conn.execute(
+                "UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), entry_id)
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return {
+            "answer": answer,
+            "node_ids": json.loads(node_ids),
+            "scores": json.loads(scores),
+            "similarity": similarity,
+        }
+
+    def store(
+        self,
+        scope: str,
+        embedding: List[float],
+        answer: str,
+        node_ids: List[str],
+        scores: List[Optional[float]],
+    ):
+        """
+        Stores a generated answer, evicting the least recently used answers if the cache is full.
+
+        Args:
+            scope (str): The `answer_scope()` the answer was generated in.
+            embedding (list[float]): The embedding of the question.
+            answer (str): The final answer text.
+            node_ids (list[str]): IDs of the source nodes.
+            scores (list[Optional[float]]): Retrieval scores of the source nodes.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= max(np.linalg.norm(vector), 1e-12)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (scope, embedding, answer, node_ids, scores, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (scope, vector.tobytes(), answer, json.dumps(node_ids), json.dumps(scores), time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM answers WHERE id IN "
+                "(SELECT id FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def recording(self, response_gen, scope: str, embedding: List[float], source_nodes):
+        """
+        Passes a live token stream through and stores the full answer once the stream is exhausted.
+
+        Args:
+            response_gen (Iterable[str]): The token stream of the live response.
+            scope (str): The `answer_scope()` of the response.
+            embedding (list[float]): The embedding of the question.
+            source_nodes (list[NodeWithScore]): The source nodes of the response.
+
+        Yields:
+            str: The tokens of the live response.
+        """
+        tokens = []
+        for token in response_gen:
+            tokens.append(token)
+            yield token
+
+        answer = "".join(tokens)
+        if answer.strip():
+            self.store(
+                scope,
+                embedding,
+                answer,
+                [node.node.node_id for node in source_nodes],
+                [node.score for node in source_nodes],
+            )
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@st.cache_resource(show_spinner=False)
+def load_answer_cache(max_entries: int = 1000):
+    """
+    Opens the answer cache shared by all sessions of the app.
+    """
+    logs.log.info(f"Answer cache opened with up to {max_entries:,} entries")
+    return AnswerCache(max_entries=max_entries)
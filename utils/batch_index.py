@@ -0,0 +1,383 @@
+import os
+import sys
+import time
+import argparse
+
+from itertools import chain
+
+import utils.logs as logs
+import utils.git_repo as git_repo
+import utils.llama_index as llama_index
+
+from utils.dedup import DEFAULT_DEDUP_THRESHOLD
+from utils.embedding_cache import CachedEmbedding, EmbeddingCache
+from utils.manifest import IngestionManifest, hash_file
+
+from llama_index.core import Settings
+
+###################################
+#
+# Collect Files
+#
+###################################
+
+
+def collect_files(paths: list):
+    """
+    Expands files and directories (recursively) into the list of files to index.
+
+    Args:
+        paths (list[str]): Files and directories.
+
+    Returns:
+        List[Tuple[str, str]]: The files and their source keys, sorted within each directory. Hidden files and
+        directories are skipped.
+
+    Notes:
+        Files in a directory are keyed by their path relative to it (e.g. `guide/README.md`), so files with the same
+        name in different subdirectories are kept apart; files given directly are keyed by file name, like uploads in
+        the app. If the same key occurs more than once, only the first file is indexed and the others are skipped
+        with a warning.
+    """
+    sources = []
+    for path in paths:
+        if os.path.isfile(path):
+            sources.append((path, os.path.basename(path)))
+            continue
+        if not os.path.isdir(path):
+            logs.log.warning(f"Skipping '{path}': no such file or directory")
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if name.startswith("."):
+                    continue
+                filepath = os.path.join(root, name)
+                sources.append((filepath, os.path.relpath(filepath, path).replace(os.sep, "/")))
+
+    seen = {}
+    unique = []
+    for filepath, source in sources:
+        if source in seen:
+            logs.log.warning(f"Skipping '{filepath}': '{source}' is already indexed from '{seen[source]}'")
+            continue
+        seen[source] = filepath
+        unique.append((filepath, source))
+    return unique
+
+
+def iter_file_documents(
+    sources: list,
+    manifest: IngestionManifest,
+    stats: dict,
+    workers: int = 1,
+    timeout: int = None,
+):
+    """
+    Parses the files that changed since the last ingestion and yields their documents.
+
+    Unlike `llama_index.iter_documents`, the files are left in place.
+
+    Args:
+        sources (list[Tuple[str, str]]): The files to index and their source keys, as returned by `collect_files`.
+        manifest (IngestionManifest): The ingestion manifest of the index; unchanged files are skipped.
+        stats (dict): Updated with the `files`, `skipped`, `failed` and `bytes` counters.
+        workers (int, optional): Number of parsing processes. Defaults to 1.
+        timeout (int, optional): Per-file parsing timeout in seconds. Defaults to None.
+
+    Yields:
+        Document: The parsed documents, file by file, with `file_name` set to the source key.
+    """
+    changed = []
+    for filepath, source in sources:
+        if not manifest.has_changed(source, hash_file(filepath)):
+            stats["skipped"] += 1
+            continue
+        changed.append((filepath, source))
+
+    filepaths = [filepath for filepath, _ in changed]
+    for (_, source), (filepath, documents) in zip(changed, llama_index.iter_parsed_files(filepaths, workers, timeout)):
+        if documents is None:
+            stats["failed"] += 1
+            continue
+        stats["files"] += 1
+        stats["bytes"] += os.path.getsize(filepath)
+        for document in documents:
+            document.metadata["file_name"] = source
+        yield from documents
+
+
+###################################
+#
+# Parallel Embedding
+#
+###################################
+
+def setup_batch_embedding(
+    model: str, workers: int, use_cache: bool, cache_size: int, batch_size: int
+):
+    """
+    Sets `Settings.embed_model` for batch indexing.
+
+    With a single worker, this is the app's embedding model (`llama_index.load_embedding_model`). With more workers,
+    chunks are embedded by a `ParallelEmbedding` pool, wrapped in the same persistent embedding cache as the app.
+
+    Returns:
+        The configured embedding model, and the `ParallelEmbedding` to close when done (or None).
+    """
+    if workers <= 1:
+        Settings.embed_model = llama_index.load_embedding_model(model, use_cache, cache_size)
+        return Settings.embed_model, None
+
+    pool = llama_index.ParallelEmbedding(model, workers, embed_batch_size=batch_size)
+    embed_model = pool
+    if use_cache:
+        embed_model = CachedEmbedding(pool, EmbeddingCache(max_entries=cache_size))
+    Settings.embed_model = embed_model
+    logs.log.info(f"Embedding with {workers} worker process(es)")
+    return embed_model, pool
+
+
+###################################
+#
+# Build Index
+#
+###################################
+
+
+def build_index(
+    paths: list,
+    persist_dir: str = "./vectordb",
+    embedding_model: str = llama_index.EMBEDDING_MODELS[None],
+    chunk_size: int = 1024,
+    chunk_overlap: int = 200,
+    dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD,
+    parse_workers: int = 1,
+    embed_workers: int = 1,
+    parse_timeout: int = 600,
+    batch_size: int = 256,
+    use_cache: bool = True,
+    cache_size: int = 100_000,
+    search_index: str = "exact",
+    ivf_nlist: int = 0,
+    vector_precision: str = "float32",
+    rebuild: bool = False,
+    progress=None,
+    repos: list = (),
+    repos_dir: str = "./repos",
+    include: list = None,
+    exclude: list = None,
+    max_file_kb: int = git_repo.DEFAULT_MAX_FILE_KB,
+):
+    """
+    Indexes files into the persisted index in `persist_dir`.
+
+    Args:
+        paths (list[str]): Files and directories to index.
+        persist_dir (str, optional): The vector store directory. Defaults to "./vectordb".
+        embedding_model (str, optional): The HuggingFace embedding model. Defaults to the app's default model.
+        chunk_size (int, optional): Chunk size in tokens. Defaults to 1024.
+        chunk_overlap (int, optional): Chunk overlap in tokens. Defaults to 200.
+        dedup_threshold (float, optional): Similarity above which chunks are dropped as duplicates; None keeps all chunks. Defaults to 0.9.
+        parse_workers (int, optional): Number of parsing processes. Defaults to 1.
+        embed_workers (int, optional): Number of embedding processes. Defaults to 1 (embed in this process).
+        parse_timeout (int, optional): Per-file parsing timeout in seconds. Defaults to 600.
+        batch_size (int, optional): Number of nodes embedded and inserted at a time. Defaults to 256.
+        use_cache (bool, optional): Use the persistent embedding cache. Defaults to True.
+        cache_size (int, optional): Maximum number of cached embeddings. Defaults to 100,000.
+        search_index (str, optional): `"exact"` or `"ivf"`. Defaults to "exact".
+        ivf_nlist (int, optional): Number of IVF lists; `0` picks one based on the corpus size. Defaults to 0.
+        vector_precision (str, optional): `"float32"`, `"float16"` or `"int8"`. Defaults to "float32".
+        rebuild (bool, optional): Discard the existing index and build it from scratch. Defaults to False.
+        progress (Callable[[dict], None], optional): Called with the running counters.
+        repos (list[str], optional): Git repositories (`owner/name`, remote URLs or local paths) to sync into `repos_dir` and index. Defaults to none.
+        repos_dir (str, optional): Directory the repositories are kept in between runs. Defaults to "./repos".
+        include (list[str], optional): Glob patterns of the repository files to index. Defaults to `git_repo.DEFAULT_INCLUDE`.
+        exclude (list[str], optional): Glob patterns of repository files to leave out. Defaults to `git_repo.DEFAULT_EXCLUDE`.
+        max_file_kb (int, optional): Repository files larger than this are left out. Defaults to 1024.
+
+    Returns:
+        dict: Counters for files (`files`, `skipped`, `failed`, `bytes`), the ingestion counters of
+        `ingestion.ingest_documents`, `cache_hits` and `seconds` elapsed.
+
+    Notes:
+        The index settings are recorded in the manifest exactly as `rag_pipeline` does, so an index built with the
+        app's settings is extended incrementally by the app and vice versa.
+
+        Repositories are synced with a shallow fetch, and only the files changed since their last indexed commit
+        are parsed (see `git_repo.iter_repo_documents`).
+    """
+    start = time.perf_counter()
+    stats = {"files": 0, "skipped": 0, "failed": 0, "bytes": 0}
+
+    sources = collect_files(paths)
+    logs.log.info(f"Batch indexing {len(sources):,} file(s) into '{persist_dir}'")
+
+    manifest = IngestionManifest.load(persist_dir)
+    index_settings = {
+        "embed_model": embedding_model,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+    }
+    if rebuild or not manifest.is_compatible(index_settings):
+        logs.log.warning("Rebuilding the index from scratch")
+        manifest.reset(index_settings)
+    elif manifest.settings is None:
+        manifest.settings = index_settings
+
+    _, pool = setup_batch_embedding(
+        embedding_model, embed_workers, use_cache, cache_size, batch_size
+    )
+
+    ingestion_stats = {}
+
+    def report(counters: dict):
+        ingestion_stats.update(counters)
+        if progress is not None:
+            progress({**stats, **counters, "seconds": time.perf_counter() - start})
+
+    syncs = [git_repo.sync_repo(repo, repos_dir, allow_local=True) for repo in repos]
+    documents = chain(
+        iter_file_documents(
+            sources, manifest, stats, workers=parse_workers, timeout=parse_timeout
+        ),
+        *(
+            git_repo.iter_repo_documents(
+                sync, manifest, stats, include, exclude, max_file_kb, parse_workers, parse_timeout
+            )
+            for sync in syncs
+        ),
+    )
+
+    try:
+        llama_index.create_index(
+            documents,
+            persist_dir,
+            manifest,
+            batch_size=batch_size,
+            progress=report,
+            search_index=search_index,
+            ivf_nlist=ivf_nlist,
+            vector_precision=vector_precision,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            dedup_threshold=dedup_threshold,
+        )
+    finally:
+        if pool is not None:
+            pool.close()
+
+    for sync in syncs:
+        git_repo.mark_indexed(sync)
+
+    cache = getattr(Settings.embed_model, "cache", None)
+    stats["cache_hits"] = cache.stats()["hits"] if cache is not None else 0
+
+    return {**stats, **ingestion_stats, "seconds": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build or update a persisted index from files and directories, without the Streamlit app."
+    )
+    parser.add_argument("paths", nargs="*", help="Files and directories to index")
+    parser.add_argument(
+        "--repo",
+        action="append",
+        default=[],
+        help="A git repository (owner/name on GitHub.com, a URL or a path) to sync and index; may be repeated",
+    )
+    parser.add_argument("--repos-dir", default="./repos")
+    parser.add_argument("--include", nargs="+", help="Glob patterns of the repository files to index")
+    parser.add_argument("--exclude", nargs="+", help="Glob patterns of repository files to leave out")
+    parser.add_argument("--max-file-kb", type=int, default=git_repo.DEFAULT_MAX_FILE_KB)
+    parser.add_argument("--persist-dir", default="./vectordb")
+    parser.add_argument("--embedding-model", default=llama_index.EMBEDDING_MODELS[None])
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=DEFAULT_DEDUP_THRESHOLD,
+        help="Similarity above which chunks are dropped as near duplicates; 1.0 only drops exact duplicates",
+    )
+    parser.add_argument("--no-dedup", action="store_true", help="Keep duplicate chunks")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--embed-workers",
+        type=int,
+        default=1,
+        help="Embedding processes, each loading its own copy of the model",
+    )
+    parser.add_argument("--parse-timeout", type=int, default=600)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--no-embedding-cache", action="store_true")
+    parser.add_argument("--embedding-cache-size", type=int, default=100_000)
+    parser.add_argument("--search-index", choices=("exact", "ivf"), default="exact")
+    parser.add_argument("--ivf-nlist", type=int, default=0)
+    parser.add_argument(
+        "--vector-precision", choices=("float32", "float16", "int8"), default="float32"
+    )
+    parser.add_argument("--rebuild", action="store_true", help="Discard the existing index")
+    args = parser.parse_args()
+    if not args.paths and not args.repo:
+        parser.error("Give files, directories or --repo to index")
+
+    last_report = [0.0]
+
+    def progress(stats: dict):
+        if stats["seconds"] - last_report[0] >= 2:
+            last_report[0] = stats["seconds"]
+            print(
+                f"\r{stats['files']:,} file(s) parsed · {stats.get('nodes', 0):,} chunk(s) · "
+                f"{stats.get('duplicates', 0):,} duplicate(s) · "
+                f"{stats.get('embedded', 0):,} embedded · {stats['seconds']:.0f}s",
+                end="",
+                file=sys.stderr,
+                flush=True,
+            )
+
+    stats = build_index(
+        args.paths,
+        persist_dir=args.persist_dir,
+        embedding_model=args.embedding_model,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        dedup_threshold=None if args.no_dedup else args.dedup_threshold,
+        parse_workers=args.parse_workers,
+        embed_workers=args.embed_workers,
+        parse_timeout=args.parse_timeout,
+        batch_size=args.batch_size,
+        use_cache=not args.no_embedding_cache,
+        cache_size=args.embedding_cache_size,
+        search_index=args.search_index,
+        ivf_nlist=args.ivf_nlist,
+        vector_precision=args.vector_precision,
+        rebuild=args.rebuild,
+        progress=progress,
+        repos=args.repo,
+        repos_dir=args.repos_dir,
+        include=args.include,
+        exclude=args.exclude,
+        max_file_kb=args.max_file_kb,
+    )
+
+    seconds = max(stats["seconds"], 1e-9)
+    print(file=sys.stderr)
+    print(
+        f"Indexed {stats['files']:,} file(s) ({stats['skipped']:,} unchanged, {stats['failed']:,} failed) "
+        f"into '{args.persist_dir}' in {seconds:.1f}s"
+    )
+    print(
+        f"{stats['files'] / seconds:,.1f} files/s · {stats['bytes'] / seconds / 1e6:,.2f} MB/s · "
+        f"{stats.get('nodes', 0):,} chunk(s) at {stats.get('nodes', 0) / seconds:,.1f} chunks/s · "
+        f"{stats['cache_hits']:,} embedding(s) served from cache"
+    )
+    if stats.get("duplicates"):
+        print(f"Dropped {stats['duplicates']:,} duplicate chunk(s) before embedding")
+    if stats.get("removed"):
+        print(f"Removed {stats['removed']:,} deleted or excluded file(s) from the index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import hashlib
+
+import numpy as np
+
+import utils.logs as logs
+
+from utils.embedding_cache import normalize_text
+
+DEFAULT_DEDUP_THRESHOLD = 0.9
+NUM_PERMUTATIONS = 128
+SHINGLE_SIZE = 5
+_SHINGLE_BASE = np.uint64(1_000_003)
+
+###################################
+#
+# MinHash Signatures
+#
+###################################
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE):
+    """
+    Hashes the overlapping character `size`-grams of the normalized, lowercased text.
+
+    Character shingles need no word boundaries, so Japanese text is handled like any other. The hashes are computed
+    for all shingles at once with a polynomial rolling hash over the code points.
+
+    Returns:
+        np.ndarray: The distinct uint64 shingle hashes.
+    """
+    codes = np.frombuffer(normalize_text(text).lower().encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    count = max(len(codes) - size + 1, 1)
+    hashes = np.zeros(count, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for offset in range(min(size, len(codes))):
+            hashes = hashes * _SHINGLE_BASE + codes[offset : offset + count]
+    return np.unique(hashes)
+
+
+def lsh_bands(num_perm: int, threshold: float):
+    """
+    Splits a signature into LSH bands so that pairs at `threshold` similarity are very likely to share a band.
+
+    Two signatures with Jaccard similarity `s` share at least one of `b` bands of `r` rows with probability
+    `1 - (1 - s^r)^b`, which rises steeply around `(1 / b)^(1 / r)`. The split whose rise is closest below
+    `threshold` is chosen; candidate pairs are verified against the full signature afterwards.
+
+    Returns:
+        Tuple[int, int]: The number of bands and of rows per band.
+    """
+    splits = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [split for split in splits if (1 / split[0]) ** (1 / split[1]) <= threshold]
+    if not below:
+        return splits[0]
+    return max(below, key=lambda split: (1 / split[0]) ** (1 / split[1]))
+
+
+###################################
+#
+# Chunk Deduplicator
+#
+###################################
+
+
+class ChunkDeduplicator:
+    """
+    Detects chunks that repeat, exactly or nearly, a chunk seen before.
+
+    Exact duplicates are found by a hash of the normalized text. Near duplicates (e.g. a footer with a different page
+    number, or a navigation menu with one more entry) are found with MinHash signatures of character shingles and
+    locality-sensitive hashing: only chunks sharing an LSH band are compared, and a chunk is a near duplicate if the
+    estimated Jaccard similarity of its shingles with an earlier chunk is at least `threshold`.
+
+    The first occurrence of a chunk is kept; later ones are dropped, and `filter()` reports the ID of the kept node
+    each dropped one repeats, so that the sources of both can refer to it.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_DEDUP_THRESHOLD,
+        num_perm: int = NUM_PERMUTATIONS,
+        shingle_size: int = SHINGLE_SIZE,
+        seed: int = 1,
+    ):
+        """
+        Args:
+            threshold (float, optional): Minimum similarity of near duplicates; `1.0` only drops exact duplicates. Defaults to 0.9.
+            num_perm (int, optional): Number of MinHash permutations. Defaults to 128.
+            shingle_size (int, optional): Characters per shingle. Defaults to 5.
+            seed (int, optional): Seed of the hash permutations. Defaults to 1.
+        """
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.chunks = 0
+        self.exact = 0
+        self.near = 0
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self._bands, self._rows = lsh_bands(num_perm, threshold)
+        self._buckets = [{} for _ in range(self._bands)]
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._kept = 0
+        self._kept_ids = []
+        self._digests = {}
+
+    def signature(self, text: str):
+        """
+        Returns the MinHash signature of a text: for each permutation, the smallest permuted shingle hash.
+        """
+        hashes = shingle_hashes(text, self.shingle_size)
+        with np.errstate(over="ignore"):
+            permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def is_duplicate(self, text: str):
+        """
+        Returns True if `text` repeats an earlier chunk; otherwise remembers it and returns False.
+        """
+        return self.match(text)[0]
+
+    def match(self, text: str, node_id: str = None):
+        """
+        Checks whether `text` repeats an earlier chunk; otherwise remembers it as the chunk of `node_id`.
+
+        Returns:
+            Tuple[bool, Optional[str]]: Whether `text` is a duplicate, and if so the node ID of the chunk it repeats.
+        """
+        self.chunks += 1
+        digest = hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).digest()
+        if digest in self._digests:
+            self.exact += 1
+            return True, self._digests[digest]
+
+        if self.threshold >= 1.0:
+            self._digests[digest] = node_id
+            return False, None
+
+        signature = self.signature(text)
+        keys = [
+            signature[band * self._rows : (band + 1) * self._rows].tobytes() for band in range(self._bands)
+        ]
+        candidates = set()
+        for bucket, key in zip(self._buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        if candidates:
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarity = (self._signatures[rows] == signature).mean(axis=1)
+            if similarity.max() >= self.threshold:
+                self.near += 1
+                # Exact copies of a dropped chunk repeat the chunk it was dropped for, which is the one indexed
+                self._digests[digest] = self._kept_ids[rows[similarity.argmax()]]
+                return True, self._digests[digest]
+
+        row = self._kept
+        if row == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        self._signatures[row] = signature
+        self._digests[digest] = node_id
+        self._kept_ids.append(node_id)
+        self._kept += 1
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, []).append(row)
+        return False, None
+
+    def filter(self, nodes: list):
+        """
+        Drops the nodes that repeat an earlier node.
+
+        Returns:
+            Tuple[list, list[str]]: The kept nodes in their original order, and the IDs of the earlier nodes that the
+            dropped ones repeat.
+        """
+        kept, repeated = [], []
+        for node in nodes:
+            duplicate, node_id = self.match(node.get_content(), node.node_id)
+            if duplicate:
+                repeated.append(node_id)
+            else:
+                kept.append(node)
+        return kept, repeated
+
+    def stats(self):
+        return {
+            "chunks": self.chunks,
+            "exact": self.exact,
+            "near": self.near,
+            "dropped": self.exact + self.near,
+        }
+
+    def log_stats(self):
+        if self.chunks:
+            logs.log.info(
+                f"Dropped {self.exact + self.near:,} of {self.chunks:,} chunk(s) as duplicates: "
+                f"{self.exact:,} exact, {self.near:,} near (similarity ≥ {self.threshold:.2f})"
+            )
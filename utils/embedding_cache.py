@@ -0,0 +1,245 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+from array import array
+from typing import List
+
+import utils.logs as logs
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+DEFAULT_CACHE_PATH = os.path.join(os.getcwd(), ".cache", "embeddings.sqlite3")
+
+
+###################################
+#
+# Normalize Chunk Text
+#
+###################################
+
+
+def normalize_text(text: str):
+    """
+    Normalizes chunk text so that cosmetic differences do not cause cache misses.
+
+    Applies Unicode NFKC normalization (full-width/half-width forms, compatibility characters) and collapses runs of whitespace.
+
+    Args:
+        text (str): The chunk text.
+
+    Returns:
+        str: The normalized text.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(model_name: str, text: str):
+    """
+    Returns the cache key of a chunk: a SHA-256 of the model name and the normalized text.
+    """
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+###################################
+#
+# SQLite Embedding Store
+#
+###################################
+
+
+class EmbeddingCache:
+    """
+    A size-bounded, persistent embedding cache backed by SQLite.
+
+    Vectors are stored as packed float32 blobs keyed by `cache_key(model, text)`. Every hit refreshes the entry's
+    last-used timestamp, and once the cache holds more than `max_entries` vectors the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[str]):
+        """
+        Looks up vectors by key.
+
+        Args:
+            keys (list[str]): The cache keys.
+
+        Returns:
+            list[Optional[list[float]]]: The cached vector for each key, or None on a miss.
+        """
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                )
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return [found.get(key) for key in keys]
+
+    def put_many(self, model_name: str, keys: List[str], vectors: List[List[float]]):
+        """
+        Stores vectors, evicting the least recently used entries if the cache is full.
+
+        Args:
+            model_name (str): The embedding model that produced the vectors.
+            keys (list[str]): The cache keys.
+            vectors (list[list[float]]): The vectors to store.
+        """
+        now = time.time()
+        # A key repeated within the batch is stored once, with its last vector
+        rows = {
+            key: (key, model_name, array("f", vector).tobytes(), now)
+            for key, vector in zip(keys, vectors)
+        }
+        with self._lock:
+            # Replacing an entry does not grow the cache, so only keys not stored yet are counted
+            existing = 0
+            unique_keys = list(rows)
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                existing += self._conn.execute(
+                    f"SELECT COUNT(*) FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchone()[0]
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                list(rows.values()),
+            )
+            self._size += len(rows) - existing
+
+            if self._size > self.max_entries:
+                self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                overflow = self._size - self.max_entries
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (overflow,),
+                    )
+                    self._size -= overflow
+                    logs.log.info(f"Evicted {overflow:,} least recently used embedding(s) from cache")
+
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: `hits`, `misses`, `hit_rate` and `entries`.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._size,
+        }
+
+
+###################################
+#
+# Cached Embedding Model
+#
+###################################
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps an embedding model so that chunk embeddings are served from an `EmbeddingCache` when possible.
+
+    Only text (chunk) embeddings are cached; query embeddings are always delegated to the wrapped model.
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache: EmbeddingCache, **kwargs):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            callback_manager=embed_model.callback_manager,
+            **kwargs,
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def cache(self):
+        return self._cache
+
+    def _get_query_embedding(self, query: str):
+        return self._embed_model.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str):
+        return await self._embed_model.aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str):
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]):
+        keys = [cache_key(self.model_name, text) for text in texts]
+        embeddings = self._cache.get_many(keys)
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = self._embed_model.get_text_embedding_batch(
+                [texts[i] for i in missing]
+            )
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+            self._cache.put_many(self.model_name, [keys[i] for i in missing], computed)
+
+        return embeddings
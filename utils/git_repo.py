@@ -0,0 +1,320 @@
+import os
+import re
+import json
+import fnmatch
+import subprocess
+
+from collections import namedtuple
+
+import utils.logs as logs
+import utils.llama_index as llama_index
+
+from utils.manifest import IngestionManifest, hash_file
+
+DEFAULT_INCLUDE = [
+    "*.md", "*.mdx", "*.rst", "*.txt", "*.ipynb", "*.pdf", "*.docx", "*.csv", "*.json", "*.yaml", "*.yml",
+    "*.toml", "*.py", "*.js", "*.jsx", "*.ts", "*.tsx", "*.go", "*.rs", "*.java", "*.kt", "*.c", "*.h", "*.cc",
+    "*.cpp", "*.hpp", "*.cs", "*.rb", "*.php", "*.swift", "*.scala", "*.sh", "*.sql",
+]
+DEFAULT_EXCLUDE = [
+    ".*", "node_modules", "vendor", "third_party", "dist", "build", "__pycache__", "venv", "site-packages",
+    "*.min.js", "*.map", "*.lock", "package-lock.json",
+]
+DEFAULT_MAX_FILE_KB = 1024
+INDEXED_REF = "refs/local-rag/indexed"
+FILTERS_KEY = "local-rag.filters"
+PENDING_FILTERS_KEY = "local-rag.pending-filters"
+GIT_TIMEOUT = 600
+
+_GITHUB_REPO = re.compile(r"^[\w.-]+/[\w.-]+$")
+# Remote repositories: `https://`, `http://`, `ssh://` and `git://` URLs, and scp-like `user@host:path`. Other
+# transports (`file://`, `ext::` helpers, ...) can read local files or run commands, so they are not accepted.
+_REMOTE_URL = re.compile(r"^(?:(?:https?|ssh|git)://[\w.@:-]+/\S+|[\w.-]+@[\w.-]+:[^\s:]\S*)$")
+
+RepoSync = namedtuple("RepoSync", ["repo", "path", "commit", "base"])
+
+###################################
+#
+# Run Git
+#
+###################################
+
+
+def git(*args, cwd: str = None):
+    """
+    Runs a git command and returns its standard output.
+
+    Arguments are passed as a list, never through a shell, so repository names and paths cannot inject commands.
+
+    Raises:
+        Exception: If git exits with an error; the message includes git's error output.
+    """
+    result = subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        timeout=GIT_TIMEOUT,
+        env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+    )
+    if result.returncode != 0:
+        raise Exception(f"git {args[0]} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def is_local(repo: str, allow_local: bool = False):
+    """
+    Checks whether `repo` is read from a local path, which only the command line may do.
+    """
+    return allow_local and os.path.exists(repo)
+
+
+def repo_url(repo: str, allow_local: bool = False):
+    """
+    Returns the clone URL of `owner/name` on GitHub.com; remote URLs are returned as they are.
+
+    With `allow_local`, local paths are accepted too and turned into `file://` URLs, as git ignores `--depth` when
+    cloning a plain path. The app does not allow them, so that a repository box cannot be used to read the server's
+    files.
+
+    Raises:
+        ValueError: If `repo` is neither `owner/name`, a remote URL nor, with `allow_local`, a local path.
+    """
+    if is_local(repo, allow_local):
+        return "file://" + os.path.abspath(repo)
+    if _GITHUB_REPO.match(repo):
+        return f"https://github.com/{repo}.git"
+    if _REMOTE_URL.match(repo):
+        return repo
+    raise ValueError(f"Not a GitHub repository (owner/name) or a remote git URL: {repo}")
+
+
+def repo_name(repo: str, allow_local: bool = False):
+    """
+    Returns the `owner/name` a repository is stored and indexed under.
+    """
+    if _GITHUB_REPO.match(repo) and not is_local(repo, allow_local):
+        return repo
+    parts = [part for part in re.split(r"[/:\\]", repo.rstrip("/\\")) if part]
+    parts[-1] = re.sub(r"\.git$", "", parts[-1])
+    return "/".join(parts[-2:])
+
+
+###################################
+#
+# Shallow Clone and Fetch
+#
+###################################
+
+
+def sync_repo(repo: str, repos_dir: str = "./repos", branch: str = None, allow_local: bool = False):
+    """
+    Brings a local copy of a repository up to date with its remote, downloading only the latest commit.
+
+    The first sync makes a shallow, single-branch clone. Later syncs fetch the new tip of the branch with
+    `--depth 1` and move the working tree to it, so only the objects of the new commit are transferred.
+
+    Args:
+        repo (str): `owner/name` on GitHub.com, or an `https://`, `ssh://`, `git://` or scp-like remote URL.
+        repos_dir (str, optional): Directory the repositories are kept in. Defaults to "./repos".
+        branch (str, optional): The branch to index. Defaults to the remote's default branch.
+        allow_local (bool, optional): Also accept a local path or bare repository. Defaults to False.
+
+    Returns:
+        RepoSync: The repository name, local path, synced commit and the commit that was indexed last (`base`, or
+        None if the repository was never indexed).
+    """
+    url = repo_url(repo, allow_local)
+    name = repo_name(repo, allow_local)
+    path = os.path.join(repos_dir, *name.split("/"))
+
+    if not os.path.isdir(os.path.join(path, ".git")):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        args = ["clone", "--depth", "1", "--single-branch", "--no-tags", "-q"]
+        if branch:
+            args += ["--branch", branch]
+        git(*args, "--", url, path)
+        logs.log.info(f"Cloned {name} (shallow) into '{path}'")
+    else:
+        branch = branch or git("rev-parse", "--abbrev-ref", "HEAD", cwd=path).strip()
+        git("fetch", "--depth", "1", "--no-tags", "-q", "origin", branch, cwd=path)
+        git("reset", "--hard", "-q", "FETCH_HEAD", cwd=path)
+        logs.log.info(f"Fetched the latest commit of {name}")
+
+    commit = git("rev-parse", "HEAD", cwd=path).strip()
+    try:
+        base = git("rev-parse", "--verify", "-q", INDEXED_REF, cwd=path).strip()
+    except Exception:
+        base = None
+    return RepoSync(name, path, commit, base)
+
+
+def mark_indexed(sync: RepoSync):
+    """
+    Records the synced commit, and the filters its files were selected with, as indexed, so the next sync only
+    re-indexes the files changed since.
+
+    Call this only once the documents of the sync have been persisted in the index.
+    """
+    git("update-ref", INDEXED_REF, sync.commit, cwd=sync.path)
+    # The ref is moved first: should this be interrupted, the filters still differ and the next sync scans all files
+    try:
+        filters = git("config", "--local", PENDING_FILTERS_KEY, cwd=sync.path).strip()
+    except Exception:
+        return
+    git("config", "--local", FILTERS_KEY, filters, cwd=sync.path)
+    git("config", "--local", "--unset", PENDING_FILTERS_KEY, cwd=sync.path)
+
+
+def changed_files(sync: RepoSync):
+    """
+    Returns the files added or modified, and the files deleted, between the indexed and the synced commit.
+
+    Renames are reported as a deletion and an addition. Both commits are present in the shallow clone, so the trees
+    are compared without any history in between.
+    """
+    fields = git("diff", "--name-status", "--no-renames", "-z", sync.base, sync.commit, cwd=sync.path).split("\0")
+    changed, deleted = [], []
+    for status, path in zip(fields[::2], fields[1::2]):
+        (deleted if status == "D" else changed).append(path)
+    return changed, deleted
+
+
+###################################
+#
+# Filter Files
+#
+###################################
+
+
+def matches(path: str, patterns: list):
+    """
+    Checks a repository-relative path against glob patterns.
+
+    A pattern containing `/` is matched against the whole path (e.g. `docs/*`); other patterns are matched against
+    each file and directory name in the path (e.g. `*.py`, `node_modules`).
+    """
+    names = path.split("/")
+    for pattern in patterns:
+        if "/" in pattern:
+            if fnmatch.fnmatch(path, pattern):
+                return True
+        elif any(fnmatch.fnmatch(name, pattern) for name in names):
+            return True
+    return False
+
+
+def is_binary(filepath: str):
+    """
+    Treats files with a NUL byte in their first 8 KB as binary.
+    """
+    with open(filepath, "rb") as f:
+        return b"\0" in f.read(8192)
+
+
+def select_file(root: str, path: str, include: list, exclude: list, max_file_kb: int):
+    """
+    Checks whether a repository file is indexed: it matches `include` but not `exclude`, is no larger than
+    `max_file_kb` and is not binary. PDFs and Word documents are binary by nature and are only checked for size.
+
+    The checks run in that order, so excluded and oversized files are never opened.
+    """
+    if not matches(path, include) or matches(path, exclude):
+        return False
+    filepath = os.path.join(root, path)
+    if not os.path.isfile(filepath) or os.path.getsize(filepath) > max_file_kb * 1024:
+        return False
+    if os.path.splitext(path)[1].lower() in (".pdf", ".docx", ".pptx", ".epub"):
+        return True
+    return not is_binary(filepath)
+
+
+###################################
+#
+# Repository Documents
+#
+###################################
+
+
+def iter_repo_documents(
+    sync: RepoSync,
+    manifest: IngestionManifest,
+    stats: dict,
+    include: list = None,
+    exclude: list = None,
+    max_file_kb: int = DEFAULT_MAX_FILE_KB,
+    workers: int = 1,
+    timeout: int = None,
+):
+    """
+    Parses the repository files that changed since the last indexed commit and yields their documents.
+
+    Args:
+        sync (RepoSync): The synced repository, as returned by `sync_repo`.
+        manifest (IngestionManifest): The ingestion manifest of the index. Files that were deleted or no longer pass
+            the filters are staged for removal from the index.
+        stats (dict): Updated with the `files`, `skipped`, `failed` and `bytes` counters.
+        include (list[str], optional): Glob patterns of the files to index. Defaults to `DEFAULT_INCLUDE`.
+        exclude (list[str], optional): Glob patterns of files and directories to leave out. Defaults to `DEFAULT_EXCLUDE`.
+        max_file_kb (int, optional): Files larger than this are left out. Defaults to 1024.
+        workers (int, optional): Number of parsing processes. Defaults to 1.
+        timeout (int, optional): Per-file parsing timeout in seconds. Defaults to None.
+
+    Yields:
+        Document: The parsed documents, file by file, with `file_name` set to the source key `owner/name/path`.
+
+    Notes:
+        Only the files in the diff between the indexed and the synced commit are considered. All files are scanned
+        instead if the repository was never indexed, the filters changed since it was last indexed, or the index
+        holds none of its files (e.g. it was rebuilt with other settings); unchanged files are still skipped by
+        their hash.
+    """
+    include = include or DEFAULT_INCLUDE
+    exclude = exclude or DEFAULT_EXCLUDE
+    prefix = sync.repo + "/"
+    indexed = {source for source in manifest.sources if source.startswith(prefix)}
+
+    filters = json.dumps([include, exclude, max_file_kb])
+    try:
+        previous_filters = git("config", "--local", FILTERS_KEY, cwd=sync.path).strip()
+    except Exception:
+        previous_filters = None
+    # The filters are recorded as indexed by `mark_indexed()`, together with the commit, once the index is persisted
+    git("config", "--local", PENDING_FILTERS_KEY, filters, cwd=sync.path)
+
+    if sync.base is not None and previous_filters == filters and indexed and not manifest.rebuild:
+        candidates, deleted = changed_files(sync)
+        logs.log.info(
+            f"{sync.repo}: {len(candidates):,} file(s) changed and {len(deleted):,} deleted since {sync.base[:7]}"
+        )
+    else:
+        candidates = [path for path in git("ls-files", "-z", cwd=sync.path).split("\0") if path]
+        deleted = [source[len(prefix) :] for source in indexed]
+        logs.log.info(f"{sync.repo}: scanning all {len(candidates):,} file(s)")
+
+    selected = [path for path in candidates if select_file(sync.path, path, include, exclude, max_file_kb)]
+    logs.log.info(f"{sync.repo}: {len(selected):,} of {len(candidates):,} file(s) pass the filters")
+
+    # Deleted files, and changed files that no longer pass the filters, are removed from the index
+    kept = set(selected)
+    for path in sorted(set(deleted) | set(candidates)):
+        if path not in kept and prefix + path in indexed:
+            manifest.remove(prefix + path)
+
+    changed = []
+    for path in selected:
+        if not manifest.has_changed(prefix + path, hash_file(os.path.join(sync.path, path))):
+            stats["skipped"] += 1
+            continue
+        changed.append(path)
+
+    filepaths = [os.path.join(sync.path, path) for path in changed]
+    for path, (filepath, documents) in zip(changed, llama_index.iter_parsed_files(filepaths, workers, timeout)):
+        if documents is None:
+            stats["failed"] += 1
+            continue
+        stats["files"] += 1
+        stats["bytes"] += os.path.getsize(filepath)
+        for document in documents:
+            document.metadata["file_name"] = prefix + path
+        yield from documents
@@ -1,12 +1,8 @@
 import os
 import json
-import requests
-import subprocess
 
 import streamlit as st
 
-from exiftool import ExifToolHelper
-
 import utils.logs as logs
 
 ###################################
@@ -61,6 +57,8 @@ def validate_github_repo(repo: str):
     Raises:
         Exception: If there is an error validating the repository.
     """
+    import requests
+
     repo_endpoint = "https://github.com/" + repo + ".git"
     resp = requests.head(repo_endpoint)
     if resp.status_code() == 200:
@@ -69,43 +67,6 @@ def validate_github_repo(repo: str):
         return False
 
 
-###################################
-#
-# Clone a GitHub Repo
-#
-###################################
-
-
-def clone_github_repo(repo: str):
-    """
-    Clones a GitHub repository.
-
-    Args:
-        repo (str): The name of the GitHub repository.
-
-    Returns:
-        True if the repository is cloned successfully, False otherwise.
-
-    Raises:
-        Exception: If there is an error cloning the repository.
-    """
-    repo_endpoint = "https://github.com/" + repo + ".git"
-    if repo_endpoint is not None:
-        save_dir = os.getcwd() + "/data"
-        clone_command = f"git clone -q {repo_endpoint} {save_dir}/{repo}"
-        try:
-            subprocess.run(clone_command, shell=True)
-            logs.log.info(f"Cloned {repo} repo")
-            return True
-        except Exception as e:
-            Exception(f"Error cloning {repo} GitHub repo: {e}")
-            return False
-
-    else:
-        Exception(f"Failed to process GitHub repo {st.session_state['github_repo']}")
-        return False
-
-
 ###################################
 #
 # Extract File Metadata
@@ -127,6 +88,8 @@ def get_file_metadata(file_path):
         Exception: If there is an error extracting the metadata.
     """
     try:
+        from exiftool import ExifToolHelper
+
         with ExifToolHelper() as et:
             for d in et.get_metadata(file_path):
                 return json.dumps(d, indent=2)
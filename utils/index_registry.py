@@ -0,0 +1,174 @@
+import os
+import time
+import threading
+import weakref
+
+import utils.logs as logs
+
+# The files rewritten whenever a persisted index changes
+INDEX_FILES = (
+    "docstore.json",
+    "index_store.json",
+    "default__vector_ids.json",
+    "default__vectors.npy",
+    "default__vector_store.json",
+)
+LOAD_ATTEMPTS = 3
+
+
+def disk_stamp(persist_dir: str):
+    """
+    Identifies the on-disk state of a persisted index by the modification time and size of its files.
+    """
+    stamp = []
+    for name in INDEX_FILES:
+        try:
+            stat = os.stat(os.path.join(persist_dir, name))
+        except FileNotFoundError:
+            continue
+        stamp.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+###################################
+#
+# Shared Index Registry
+#
+###################################
+
+
+class _Entry:
+    def __init__(self, index, stamp):
+        self.index = index
+        self.stamp = stamp
+        self.refs = 0
+
+
+class IndexLease:
+    """
+    A session's reference to a shared index.
+
+    The reference is released by `release()`, or when the lease is garbage collected with the session state of an
+    abandoned session.
+    """
+
+    def __init__(self, registry, key, entry: _Entry):
+        self.key = key
+        self.index = entry.index
+        self._entry = entry
+        self._finalizer = weakref.finalize(self, registry._release, key, entry)
+
+    def release(self):
+        self._finalizer()
+
+    @property
+    def released(self):
+        return not self._finalizer.alive
+
+
+class IndexRegistry:
+    """
+    Loads each persisted index once per process and shares it between all sessions.
+
+    Indexes are keyed by `(vectordb path, embedding model, vector store options)` and remember the disk stamp they
+    were loaded at. When the files on disk change, the next `acquire()` loads the new index and swaps it in as a
+    whole; sessions still holding the previous index keep using it until they acquire again, and it is freed once
+    the last of them has released it. A session that updated the index itself hands its copy over with `publish()`
+    instead, so it is not loaded a second time.
+    """
+
+    def __init__(self):
+        self._current = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(persist_dir: str, embed_model: str, store_options: dict):
+        return (
+            os.path.abspath(persist_dir),
+            embed_model,
+            tuple(sorted((store_options or {}).items())),
+        )
+
+    def _load(self, persist_dir: str, load):
+        # A concurrent `persist()` may rewrite the files while they are read, so loads that raced one are retried
+        for attempt in range(LOAD_ATTEMPTS):
+            stamp = disk_stamp(persist_dir)
+            start = time.perf_counter()
+            index = load()
+            if disk_stamp(persist_dir) == stamp or attempt == LOAD_ATTEMPTS - 1:
+                logs.log.info(
+                    f"Shared index '{persist_dir}' loaded in {time.perf_counter() - start:.2f}s"
+                )
+                return _Entry(index, stamp)
+            logs.log.warning(f"Index '{persist_dir}' changed while loading; retrying")
+
+    def _swap(self, key, entry: _Entry):
+        previous = self._current.get(key)
+        self._current[key] = entry
+        if previous is not None and previous.refs == 0:
+            logs.log.info(f"Freed the previous version of shared index '{key[0]}'")
+
+    def acquire(self, persist_dir: str, embed_model: str, store_options: dict, load):
+        """
+        Returns a lease on the shared index, loading it if it is not loaded yet or changed on disk.
+
+        Args:
+            persist_dir (str): The vector store directory.
+            embed_model (str): The embedding model the index is queried with.
+            store_options (dict): The vector store configuration (search index, precision, ...).
+            load (Callable[[], VectorStoreIndex]): Loads and configures the index from `persist_dir`.
+
+        Returns:
+            IndexLease: The lease; its `index` is shared with every session using the same key.
+        """
+        key = self.key(persist_dir, embed_model, store_options)
+        with self._lock:
+            entry = self._current.get(key)
+            if entry is None or entry.stamp != disk_stamp(persist_dir):
+                entry = self._load(persist_dir, load)
+                self._swap(key, entry)
+            entry.refs += 1
+            return IndexLease(self, key, entry)
+
+    def publish(self, persist_dir: str, embed_model: str, store_options: dict, index):
+        """
+        Makes an index that was just updated and persisted the shared one, and returns a lease on it.
+
+        If the files on disk did not change (nothing was ingested), the already shared index is kept and `index` is
+        discarded.
+        """
+        key = self.key(persist_dir, embed_model, store_options)
+        with self._lock:
+            stamp = disk_stamp(persist_dir)
+            entry = self._current.get(key)
+            if entry is None or entry.stamp != stamp:
+                entry = _Entry(index, stamp)
+                self._swap(key, entry)
+            entry.refs += 1
+            return IndexLease(self, key, entry)
+
+    def is_current(self, lease: IndexLease):
+        """
+        Returns False if the leased index was replaced or its files changed on disk since it was loaded.
+        """
+        entry = self._current.get(lease.key)
+        return entry is lease._entry and entry.stamp == disk_stamp(lease.key[0])
+
+    def _release(self, key, entry: _Entry):
+        with self._lock:
+            entry.refs -= 1
+            if entry.refs == 0 and self._current.get(key) is not entry:
+                logs.log.info(f"Freed the previous version of shared index '{key[0]}'")
+
+    def stats(self):
+        """
+        Returns the number of shared indexes and the number of leases on them.
+        """
+        with self._lock:
+            return {
+                "indexes": len(self._current),
+                "sessions": sum(entry.refs for entry in self._current.values()),
+            }
+
+
+index_registry = IndexRegistry()
@@ -0,0 +1,199 @@
+from itertools import groupby
+
+import utils.logs as logs
+
+from utils.manifest import IngestionManifest, hash_text
+
+from llama_index.core import Settings
+from llama_index.core.schema import MetadataMode
+
+###################################
+#
+# Group Documents by Source
+#
+###################################
+
+
+def document_source(document):
+    """
+    Returns the source key of a document: its file name, its URL for web pages, or else its document ID.
+    """
+    return document.metadata.get("file_name") or document.metadata.get("url") or document.doc_id
+
+
+def iter_sources(documents):
+    """
+    Groups a stream of documents into consecutive runs sharing the same source.
+
+    Args:
+        documents (Iterable[Document]): The documents, ordered so that documents of one source are adjacent.
+
+    Yields:
+        Tuple[str, List[Document]]: Each source with its documents.
+    """
+    for source, source_documents in groupby(documents, key=document_source):
+        yield source, list(source_documents)
+
+
+###################################
+#
+# Embed Nodes
+#
+###################################
+
+
+def embed_nodes(nodes: list):
+    """
+    Embeds a batch of nodes in place using the configured embedding model.
+
+    Args:
+        nodes (list[BaseNode]): The nodes to embed. Nodes that already carry an embedding are left untouched.
+
+    Returns:
+        int: The number of nodes that were embedded.
+    """
+    missing = [node for node in nodes if node.embedding is None]
+    if not missing:
+        return 0
+
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in missing]
+    embeddings = Settings.embed_model.get_text_embedding_batch(texts)
+    for node, embedding in zip(missing, embeddings):
+        node.embedding = embedding
+
+    return len(missing)
+
+
+###################################
+#
+# Streaming Ingestion
+#
+###################################
+
+
+def ingest_documents(
+    documents,
+    index,
+    manifest: IngestionManifest,
+    batch_size: int = 256,
+    progress=None,
+    node_parser=None,
+    deduplicator=None,
+):
+    """
+    Streams documents through node splitting, batched embedding and index insertion.
+
+    Args:
+        documents (Iterable[Document]): The documents to ingest. Generators are consumed lazily.
+        index (VectorStoreIndex): The index nodes are inserted into.
+        manifest (IngestionManifest): The ingestion manifest used to skip unchanged sources and record new ones.
+        batch_size (int, optional): Number of nodes buffered before they are embedded and inserted. Defaults to 256.
+        progress (Callable[[dict], None], optional): Called with the running counters after each stage.
+        node_parser (NodeParser, optional): Splits documents into nodes. Defaults to `Settings.node_parser`.
+        deduplicator (ChunkDeduplicator, optional): Drops chunks repeating an earlier chunk of this run before they
+            are embedded. Defaults to None (no deduplication).
+
+    Returns:
+        dict: Counters for `sources`, `documents`, `nodes`, `duplicates` (chunks dropped), `embedded`, `updated`
+            (sources re-indexed) and `removed` (sources deleted from the index).
+
+    Notes:
+        Only one batch of nodes (plus the documents of the source being split) is held in memory at a time. As the
+        upstream document generator is only advanced once the current batch is flushed, parsing is throttled to the
+        speed of embedding, keeping peak memory independent of the corpus size.
+
+        A source is recorded in the manifest only after all of its nodes have been inserted, so an interrupted
+        ingestion re-processes the source on the next run. Sources staged with `manifest.remove()` have their nodes
+        deleted once all documents are ingested.
+
+        Duplicates are detected among the chunks of one ingestion run, in order, so the first occurrence of a
+        repeated footer or license header is kept. A source whose chunk was dropped refers to the kept node in the
+        manifest, which only deletes a node once no source refers to it, so editing or removing the source of a kept
+        chunk does not take it away from the other sources. Chunks already in the index from earlier runs are not
+        compared against; the deduplicator starts empty on every run.
+    """
+    node_parser = node_parser or Settings.node_parser
+    stats = {"sources": 0, "documents": 0, "nodes": 0, "duplicates": 0, "embedded": 0, "updated": 0, "removed": 0}
+    batch_nodes = []
+    batch_sources = []
+
+    def report():
+        if progress is not None:
+            progress(dict(stats))
+
+    def flush():
+        if batch_nodes:
+            stats["embedded"] += embed_nodes(batch_nodes)
+            index.insert_nodes(batch_nodes)
+
+        for source, doc_ids, node_ids, content_hash in batch_sources:
+            manifest.record(source, doc_ids, node_ids, content_hash)
+            stats["updated"] += 1
+
+        batch_nodes.clear()
+        batch_sources.clear()
+        report()
+
+    for source, source_documents in iter_sources(documents):
+        stats["sources"] += 1
+        stats["documents"] += len(source_documents)
+
+        doc_ids = [document.doc_id for document in source_documents]
+        if manifest.doc_ids(source) == doc_ids:
+            continue  # Already ingested during this session
+
+        content_hash = None
+        if source not in manifest.pending:
+            # Documents that did not come from a hashed file (e.g. web pages) are hashed by content
+            content_hash = hash_text("".join(d.text for d in source_documents))
+            if not manifest.has_changed(source, content_hash):
+                continue
+
+        stale_node_ids = manifest.release(source)
+        if stale_node_ids:
+            index.delete_nodes(stale_node_ids, delete_from_docstore=True)
+
+        nodes = node_parser.get_nodes_from_documents(source_documents)
+        stats["nodes"] += len(nodes)
+        repeated = []
+        if deduplicator is not None:
+            kept, repeated = deduplicator.filter(nodes)
+            stats["duplicates"] += len(nodes) - len(kept)
+            nodes = kept
+        batch_nodes.extend(nodes)
+        node_ids = list(dict.fromkeys([node.node_id for node in nodes] + repeated))
+        batch_sources.append((source, doc_ids, node_ids, content_hash))
+        report()
+
+        if len(batch_nodes) >= batch_size:
+            flush()
+
+    flush()
+
+    # Sources may be staged for removal while the document generator runs, so they are removed last
+    for source in sorted(manifest.removed):
+        stale_node_ids = manifest.release(source)
+        if stale_node_ids:
+            index.delete_nodes(stale_node_ids, delete_from_docstore=True)
+        manifest.sources.pop(source, None)
+        stats["removed"] += 1
+    manifest.removed.clear()
+    report()
+
+    logs.log.info(
+        f"Ingested {stats['documents']:,} document(s) from {stats['sources']:,} source(s); "
+        f"embedded {stats['embedded']:,} of {stats['nodes'] - stats['duplicates']:,} node(s)"
+    )
+
+    if deduplicator is not None:
+        deduplicator.log_stats()
+
+    cache = getattr(Settings.embed_model, "cache", None)
+    if cache is not None:
+        cache_stats = cache.stats()
+        logs.log.info(
+            f"Embedding cache: {cache_stats['hits']:,} hit(s), {cache_stats['misses']:,} miss(es) "
+            f"({cache_stats['hit_rate']:.0%} hit rate, {cache_stats['entries']:,} entries)"
+        )
+
+    return stats
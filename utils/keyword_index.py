@@ -0,0 +1,240 @@
+import re
+import math
+import unicodedata
+
+from collections import Counter, namedtuple
+
+import numpy as np
+
+# Han, hiragana and katakana; Japanese and Chinese are written without spaces between words
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN = re.compile(
+    rf"[{_CJK}]+"  # A run of CJK characters
+    rf"|[^\W{_CJK}]+(?:[\-./:][^\W{_CJK}]+)*"  # A word, identifier (ERR-1042, v2.3.1, foo_bar) or number
+)
+_CJK_CHAR = re.compile(rf"[{_CJK}]")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+###################################
+#
+# Tokenization
+#
+###################################
+
+
+def tokenize(text: str):
+    """
+    Splits text into BM25 terms, with support for Japanese text without a morphological analyzer.
+
+    Text is NFKC-normalized (full-width letters and digits, half-width katakana) and lowercased. Runs of Han, hiragana
+    and katakana are indexed as overlapping character bigrams, as there are no spaces between words; other scripts
+    are split into words. Identifiers such as `ERR-1042` or `v2.3.1` are kept whole and also indexed by their parts.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        List[str]: The terms, in order of occurrence.
+    """
+    terms = []
+    for match in _TOKEN.finditer(unicodedata.normalize("NFKC", text).lower()):
+        token = match.group()
+        if _CJK_CHAR.match(token):
+            if len(token) == 1:
+                terms.append(token)
+            else:
+                terms.extend(token[i : i + 2] for i in range(len(token) - 1))
+            continue
+
+        terms.append(token)
+        parts = re.split(r"[\-./:]", token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part)
+    return terms
+
+
+###################################
+#
+# BM25 Inverted Index
+#
+###################################
+
+# The immutable posting lists of a `KeywordIndex`, replaced as a whole so that concurrent searches see one version
+Postings = namedtuple("Postings", ["vocab", "offsets", "rows", "tfs", "doc_lens"])
+
+
+def _empty_postings():
+    return Postings(
+        {},
+        np.zeros(1, dtype=np.int64),
+        np.zeros(0, dtype=np.int32),
+        np.zeros(0, dtype=np.int32),
+        np.zeros(0, dtype=np.int32),
+    )
+
+
+class KeywordIndex:
+    """
+    An inverted index ranking rows with BM25, aligned with the rows of a vector store.
+
+    The posting lists are stored in compressed sparse row form: the rows containing term `t`, and how often, are
+    `rows[offsets[t]:offsets[t + 1]]` and `tfs[offsets[t]:offsets[t + 1]]`. Added rows are buffered and merged into the
+    posting lists on the next search, so inserting in batches does not rebuild the lists for every batch.
+    """
+
+    def __init__(self, postings: Postings = None):
+        self._postings = postings or _empty_postings()
+        self._pending = []
+
+    @property
+    def size(self):
+        return len(self._postings.doc_lens) + len(self._pending)
+
+    def add(self, texts: list):
+        """
+        Appends one row per text.
+        """
+        self._pending.extend(Counter(tokenize(text)) for text in texts)
+
+    def ensure(self):
+        """
+        Merges the rows added since the last search into the posting lists.
+        """
+        if not self._pending:
+            return
+
+        postings = self._postings
+        vocab = dict(postings.vocab)
+        first_row = len(postings.doc_lens)
+        new_terms, new_rows, new_tfs = [], [], []
+        for row, counts in enumerate(self._pending, start=first_row):
+            for term, tf in counts.items():
+                new_terms.append(vocab.setdefault(term, len(vocab)))
+                new_rows.append(row)
+                new_tfs.append(tf)
+
+        old_terms = np.repeat(
+            np.arange(len(postings.offsets) - 1, dtype=np.int64), np.diff(postings.offsets)
+        )
+        terms = np.concatenate([old_terms, np.asarray(new_terms, dtype=np.int64)])
+        rows = np.concatenate([postings.rows, np.asarray(new_rows, dtype=np.int32)])
+        tfs = np.concatenate([postings.tfs, np.asarray(new_tfs, dtype=np.int32)])
+        doc_lens = np.concatenate(
+            [
+                postings.doc_lens,
+                np.asarray([sum(counts.values()) for counts in self._pending], dtype=np.int32),
+            ]
+        )
+
+        self._postings = self._build(vocab, terms, rows, tfs, doc_lens)
+        self._pending = []
+
+    @staticmethod
+    def _build(vocab: dict, terms: np.ndarray, rows: np.ndarray, tfs: np.ndarray, doc_lens: np.ndarray):
+        order = np.lexsort((rows, terms))
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocab)), out=offsets[1:])
+        return Postings(vocab, offsets, rows[order], tfs[order], doc_lens)
+
+    def compact(self, keep: np.ndarray):
+        """
+        Drops rows, renumbering the remaining ones like the vector store does.
+
+        Args:
+            keep (np.ndarray): A boolean mask over all rows.
+        """
+        self.ensure()
+        postings = self._postings
+        remap = np.cumsum(keep) - 1
+
+        terms = np.repeat(
+            np.arange(len(postings.offsets) - 1, dtype=np.int64), np.diff(postings.offsets)
+        )
+        live = keep[postings.rows]
+        terms = terms[live]
+        rows = remap[postings.rows[live]].astype(np.int32)
+        tfs = postings.tfs[live]
+
+        # Terms that no longer occur in any row are dropped from the vocabulary
+        used = np.unique(terms)
+        term_ids = np.full(len(postings.offsets) - 1, -1, dtype=np.int64)
+        term_ids[used] = np.arange(len(used))
+        vocab = {term: int(term_ids[i]) for term, i in postings.vocab.items() if term_ids[i] >= 0}
+
+        self._postings = self._build(vocab, term_ids[terms], rows, tfs, postings.doc_lens[keep])
+
+    def search(self, query: str, k: int, rows: np.ndarray = None):
+        """
+        Ranks rows by their BM25 score for the terms of `query`.
+
+        Args:
+            query (str): The query text.
+            k (int): Number of results.
+            rows (np.ndarray, optional): Only rank these rows. Defaults to all rows.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The best matching rows and their scores, best first. Rows without any
+            query term are never returned.
+        """
+        postings = self._postings
+        count = len(postings.doc_lens)
+        if count == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * postings.doc_lens / max(postings.doc_lens.mean(), 1e-9))
+        scores = np.zeros(count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = postings.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = postings.offsets[term_id], postings.offsets[term_id + 1]
+            term_rows = postings.rows[start:end]
+            tfs = postings.tfs[start:end]
+            idf = math.log(1 + (count - (end - start) + 0.5) / ((end - start) + 0.5))
+            scores[term_rows] += idf * tfs * (BM25_K1 + 1) / (tfs + norms[term_rows])
+
+        if rows is not None:
+            candidates = rows[scores[rows] > 0]
+        else:
+            candidates = np.flatnonzero(scores)
+        candidate_scores = scores[candidates]
+
+        if k < len(candidates):
+            top = np.argpartition(-candidate_scores, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-candidate_scores[top], kind="stable")]
+        return candidates[top], candidate_scores[top]
+
+    def save(self, file):
+        """
+        Writes the index to a `.npz` file (a path or a binary file object).
+        """
+        self.ensure()
+        postings = self._postings
+        terms = sorted(postings.vocab, key=postings.vocab.get)
+        np.savez(
+            file,
+            vocab=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+            offsets=postings.offsets,
+            rows=postings.rows,
+            tfs=postings.tfs,
+            doc_lens=postings.doc_lens,
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            text = data["vocab"].tobytes().decode("utf-8")
+            terms = text.split("\n") if text else []
+            return cls(
+                Postings(
+                    {term: i for i, term in enumerate(terms)},
+                    data["offsets"],
+                    data["rows"],
+                    data["tfs"],
+                    data["doc_lens"],
+                )
+            )
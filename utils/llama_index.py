@@ -1,11 +1,28 @@
 import os
+import time
+import queue
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
 
 import streamlit as st
 
 import utils.logs as logs
 
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-import fitz
+import utils.ingestion as ingestion
+
+from utils.ann import DEFAULT_PROBE_FRACTION
+from utils.dedup import DEFAULT_DEDUP_THRESHOLD, ChunkDeduplicator
+from utils.embedding_cache import CachedEmbedding, EmbeddingCache
+from utils.index_registry import index_registry
+from utils.query_cache import CachedRetriever
+from utils.reranker import create_reranker
+from utils.text_splitter import LanguageAwareSplitter
+from utils.vector_store import MmapVectorStore, load_vector_store
+
+from utils.manifest import IngestionManifest, hash_file
+
 from llama_index.core import Document
 # This is not used but required by llama-index and must be set FIRST
 os.environ["OPENAI_API_KEY"] = "sk-abc123"
@@ -17,7 +34,18 @@ from llama_index.core import (
     StorageContext,
     load_index_from_storage
 )
-from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.indices.vector_store.retrievers import VectorIndexRetriever
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.vector_stores.types import VectorStoreQueryMode
+
+# How chunks are retrieved: by embedding similarity, by BM25 keyword match, or both fused by rank
+RETRIEVAL_MODES = {
+    "dense": VectorStoreQueryMode.DEFAULT,
+    "hybrid": VectorStoreQueryMode.HYBRID,
+    "keyword": VectorStoreQueryMode.SPARSE,
+}
 
 ###################################
 #
@@ -27,17 +55,21 @@ from llama_index.core.vector_stores import SimpleVectorStore
 
 
 @st.cache_resource(show_spinner=False)
-def setup_embedding_model(
+def load_embedding_model(
     model: str,
+    use_cache: bool = True,
+    cache_size: int = 100_000,
 ):
     """
-    Sets up an embedding model using the Hugging Face library.
+    Loads an embedding model using the Hugging Face library, optionally wrapped in a persistent embedding cache.
 
     Args:
         model (str): The name of the embedding model to use.
+        use_cache (bool, optional): Serve previously computed chunk embeddings from the on-disk cache. Defaults to True.
+        cache_size (int, optional): Maximum number of cached embeddings before the least recently used are evicted. Defaults to 100,000.
 
     Returns:
-        An instance of the HuggingFaceEmbedding class, configured with the specified model and device.
+        An instance of the HuggingFaceEmbedding class (or a `CachedEmbedding` wrapping it), configured with the specified model and device.
 
     Raises:
         ValueError: If the specified model is not a valid embedding model.
@@ -53,15 +85,144 @@ def setup_embedding_model(
     finally:
         logs.log.info(f"Using {device} to generate embeddings")
 
+    # Imported here so that torch and transformers are only loaded once an embedding model is needed
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    embed_model = HuggingFaceEmbedding(
+        model_name=model,
+        device=device,
+    )
+
+    if use_cache:
+        embed_model = CachedEmbedding(
+            embed_model, EmbeddingCache(max_entries=cache_size)
+        )
+        logs.log.info(f"Embedding cache enabled (max {cache_size:,} entries)")
+
+    logs.log.info(f"Embedding model created successfully")
+
+    return embed_model
+
+
+# The embedding model loaded in each `ParallelEmbedding` worker process
+_worker_model = None
+
+
+def _init_embedding_worker(model: str, threads: int):
+    global _worker_model
+
     try:
-        Settings.embed_model = HuggingFaceEmbedding(
-            model_name=model,
-            device=device,
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    _worker_model = HuggingFaceEmbedding(model_name=model, device="cpu")
+
+
+def _embed_texts(texts: List[str]):
+    return _worker_model.get_text_embedding_batch(texts)
+
+
+def _embed_query(query: str):
+    return _worker_model.get_query_embedding(query)
+
+
+class ParallelEmbedding(BaseEmbedding):
+    """
+    Embeds batches of texts on a pool of worker processes, each holding its own copy of a HuggingFace model.
+
+    A batch is split into one slice per worker and the slices are embedded concurrently. The cores are divided
+    between the workers so that they do not compete for the same threads. Wrap it in a `CachedEmbedding` to serve
+    cached chunks without dispatching them to the workers.
+    """
+
+    _executor: ProcessPoolExecutor = PrivateAttr()
+    _workers: int = PrivateAttr()
+
+    def __init__(self, model_name: str, workers: int, embed_batch_size: int = 256, **kwargs):
+        super().__init__(model_name=model_name, embed_batch_size=embed_batch_size, **kwargs)
+        self._workers = workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_embedding_worker,
+            initargs=(model_name, max(1, (os.cpu_count() or 1) // workers)),
         )
 
-        logs.log.info(f"Embedding model created successfully")
-        
-        return
+    @classmethod
+    def class_name(cls) -> str:
+        return "ParallelEmbedding"
+
+    def _get_query_embedding(self, query: str):
+        return self._executor.submit(_embed_query, query).result()
+
+    async def _aget_query_embedding(self, query: str):
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str):
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]):
+        size = -(-len(texts) // self._workers)
+        slices = [texts[i : i + size] for i in range(0, len(texts), size)]
+        embeddings = []
+        for result in self._executor.map(_embed_texts, slices):
+            embeddings.extend(result)
+        return embeddings
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+EMBEDDING_MODELS = {
+    None: "BAAI/bge-large-en-v1.5",
+    "Default (bge-large-en-v1.5)": "BAAI/bge-large-en-v1.5",
+    "Large (Salesforce/SFR-Embedding-Mistral)": "Salesforce/SFR-Embedding-Mistral",
+    "paraphrase-multilingual-MiniLM-L12-v2": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+}
+
+
+def resolve_embedding_model(selection: str, other_model: str = None):
+    """
+    Maps the embedding model selected in Settings to a HuggingFace model name.
+
+    Args:
+        selection (str): The selected option, e.g. "Default (bge-large-en-v1.5)" or "Other".
+        other_model (str, optional): The HuggingFace model entered when "Other" is selected.
+
+    Returns:
+        str: The HuggingFace model name, or None if "Other" is selected without a model.
+    """
+    if selection == "Other":
+        return other_model
+    return EMBEDDING_MODELS.get(selection)
+
+
+def setup_embedding_model(
+    model: str,
+    use_cache: bool = True,
+    cache_size: int = 100_000,
+):
+    """
+    Sets the global Llama-Index embedding model.
+
+    Args:
+        model (str): The name of the embedding model to use.
+        use_cache (bool, optional): Serve previously computed chunk embeddings from the on-disk cache. Defaults to True.
+        cache_size (int, optional): Maximum number of cached embeddings. Defaults to 100,000.
+
+    Returns:
+        The embedding model now set on `Settings.embed_model`.
+
+    Notes:
+        Loading is cached per model and cache configuration by `load_embedding_model`, so switching back to a previously used model is instant.
+    """
+    try:
+        Settings.embed_model = load_embedding_model(model, use_cache, cache_size)
+        return Settings.embed_model
     except Exception as err:
         print(f"Failed to setup the embedding model: {err}")
 
@@ -73,70 +234,236 @@ def setup_embedding_model(
 ###################################
 
 
-def load_documents(data_dir: str):
+def parse_file(filepath: str):
     """
-    Loads documents from a directory of files, with Japanese PDF support.
+    Parses a single file into documents, with Japanese PDF support.
 
     Args:
-        data_dir (str): Directory containing files to load.
+        filepath (str): The path to the file.
 
     Returns:
-        List[Document]: Loaded documents.
+        List[Document]: The documents extracted from the file.
+
+    Notes:
+        This function is executed in worker processes when parsing in parallel, so it must not touch the Streamlit session state.
+    """
+    file_name = os.path.basename(filepath)
+    ext = os.path.splitext(filepath)[1].lower()
+    text = ""
+
+    if ext == ".pdf":
+        # Try using unstructured for better PDF + Japanese support
+        try:
+            from unstructured.partition.pdf import partition_pdf
+            elements = partition_pdf(
+                filename=filepath,
+                strategy="hi_res",
+                languages=["jpn"]
+            )
+            text = "\n\n".join(
+                el.text for el in elements if getattr(el, 'text', None)
+            )
+        except ImportError:
+            import fitz
+
+            doc = fitz.open(filepath)
+            text = "".join(page.get_text() for page in doc)
+    elif ext == ".pptx":
+        # Use unstructured for PPTX files
+        try:
+            from unstructured.partition.pptx import partition_pptx
+            elements = partition_pptx(
+                filename=filepath,
+                strategy="hi_res",
+                languages=["jpn"]
+            )
+            text = "\n\n".join(
+                el.text for el in elements if getattr(el, 'text', None)
+            )
+        except ImportError:
+            import fitz
+
+            doc = fitz.open(filepath)
+            text = "".join(page.get_text() for page in doc)
+    else:
+        files = SimpleDirectoryReader(input_files=[filepath])
+        documents = files.load_data()
+        for document in documents:
+            document.metadata["file_name"] = file_name
+        return documents
+
+    if text:
+        return [Document(text=text, metadata={"file_name": file_name})]
+
+    return []
+
+
+def iter_parsed_files(filepaths: list, workers: int = 1, timeout: int = None):
+    """
+    Parses files into documents, optionally fanning them out to a process pool.
+
+    Args:
+        filepaths (list[str]): The files to parse.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        timeout (int, optional): Seconds a file may spend parsing before it is given up on. Defaults to None (no limit).
+
+    Yields:
+        Tuple[str, List[Document]]: Each file path with its parsed documents (`None` if parsing failed), in the order of `filepaths`.
+
+    Notes:
+        Errors are isolated per file: a corrupt or hung file is logged and skipped without aborting the rest of the batch.
+
+        Without a timeout and with a single worker, files are parsed serially in the current process. A running parse
+        cannot be interrupted from within its process, so with a timeout files are always parsed in a pool, even by a
+        single worker. At most `workers` files are parsing at a time, so each file's timeout runs from when it started
+        parsing. When a file times out, the pool is terminated and replaced, and the other files that were parsing are
+        started again in the new pool.
+
+        At most `2 * workers` files are parsed ahead of the consumer, so parsed documents are only produced as fast as the consumer processes them.
+    """
+    if timeout is None and (workers <= 1 or len(filepaths) <= 1):
+        for filepath in filepaths:
+            try:
+                yield filepath, parse_file(filepath)
+            except Exception as err:
+                logs.log.error(f"Failed to parse '{filepath}': {err}")
+                yield filepath, None
+        return
+
+    workers = max(1, min(workers, len(filepaths)))
+    window = 2 * workers
+    finished = queue.Queue()
+    started = {}  # Index of each file being parsed -> when it started
+    results = {}
+    submitted = 0
+    generation = 0
+
+    def submit(pool, generation, i):
+        started[i] = time.monotonic()
+        pool.apply_async(
+            parse_file,
+            (filepaths[i],),
+            callback=lambda documents: finished.put((generation, i, documents, None)),
+            error_callback=lambda err: finished.put((generation, i, None, err)),
+        )
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        # Results are yielded in submission order so the output is deterministic
+        for i, filepath in enumerate(filepaths):
+            while i not in results:
+                while submitted < len(filepaths) and submitted < i + window and len(started) < workers:
+                    submit(pool, generation, submitted)
+                    submitted += 1
+
+                wait = None
+                if timeout is not None:
+                    wait = max(min(started.values()) + timeout - time.monotonic(), 0)
+                try:
+                    result_generation, index, documents, err = finished.get(timeout=wait)
+                except queue.Empty:
+                    now = time.monotonic()
+                    expired = [index for index, start in started.items() if now - start >= timeout]
+                    if not expired:
+                        continue
+                    for index in expired:
+                        logs.log.error(f"Timed out after {timeout}s parsing '{filepaths[index]}'")
+                        del started[index]
+                        results[index] = None
+
+                    # A hung worker never returns, so the pool is replaced rather than waited on
+                    pool.terminate()
+                    pool.join()
+                    pool = multiprocessing.Pool(workers)
+                    generation += 1
+                    for index in list(started):
+                        submit(pool, generation, index)
+                    continue
+
+                if result_generation != generation:
+                    continue  # Finished in a pool that has been replaced, and parsed again since
+                del started[index]
+                if err is not None:
+                    logs.log.error(f"Failed to parse '{filepaths[index]}': {err}")
+                results[index] = documents
+
+            # Release the result once it has been handed over
+            yield filepath, results.pop(i)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def parse_files(filepaths: list, workers: int = 1, timeout: int = None):
+    """
+    Parses files into documents, optionally fanning them out to a process pool.
+
+    Args:
+        filepaths (list[str]): The files to parse.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        timeout (int, optional): Per-file parsing timeout in seconds. Defaults to None.
+
+    Returns:
+        Tuple[List[Document], List[str]]: The parsed documents, in the order of `filepaths`, and the files that failed to parse.
     """
     documents = []
+    failed = []
+    for filepath, file_documents in iter_parsed_files(filepaths, workers, timeout):
+        if file_documents is None:
+            failed.append(filepath)
+        else:
+            documents.extend(file_documents)
+    return documents, failed
+
+
+def iter_documents(
+    data_dir: str,
+    manifest: IngestionManifest = None,
+    workers: int = 1,
+    timeout: int = None,
+):
+    """
+    Lazily loads documents from a directory of files, with Japanese PDF support.
+
+    Args:
+        data_dir (str): Directory containing files to load.
+        manifest (IngestionManifest, optional): When provided, files whose content hash is unchanged since the last ingestion are skipped.
+        workers (int, optional): Number of processes used to parse files in parallel. Defaults to 1.
+        timeout (int, optional): Per-file parsing timeout in seconds. Defaults to None.
+
+    Yields:
+        Document: Loaded documents, file by file.
 
+    Notes:
+        Files are removed from `data_dir` once the generator is exhausted or closed.
+    """
     try:
-        for entry in os.scandir(data_dir):
-            if not entry.is_file():
+        filepaths = []
+        for entry in sorted(os.scandir(data_dir), key=lambda entry: entry.name):
+            if not entry.is_file() or entry.name.startswith(".gitkeep"):
                 continue
-            filepath = entry.path
-            ext = os.path.splitext(filepath)[1].lower()
-            text = ""
 
-            if ext == ".pdf":
-                # Try using unstructured for better PDF + Japanese support
-                try:
-                    from unstructured.partition.pdf import partition_pdf
-                    elements = partition_pdf(
-                        filename=filepath,
-                        strategy="hi_res",
-                        languages=["jpn"]
-                    )
-                    text = "\n\n".join(
-                        el.text for el in elements if getattr(el, 'text', None)
-                    )
-                except ImportError:
-                    doc = fitz.open(filepath)
-                    text = "".join(page.get_text() for page in doc)
-            elif ext == ".pptx":
-                # Use unstructured for PPTX files
-                try:
-                    from unstructured.partition.pptx import partition_pptx
-                    elements = partition_pptx(
-                        filename=filepath,
-                        strategy="hi_res",
-                        languages=["jpn"]
-                    )
-                    text = "\n\n".join(
-                        el.text for el in elements if getattr(el, 'text', None)
-                    )
-                except ImportError:
-                    doc = fitz.open(filepath)
-                    text = "".join(page.get_text() for page in doc)
-            else:
-                files = SimpleDirectoryReader(input_dir=data_dir, recursive=True)
-                documents = files.load_data(files)
-                logs.log.info(f"Loaded {len(documents):,} documents from files")
-                return documents
-
-            if text:
-                documents.append(Document(
-                    text=text,
-                    metadata={"file_name": os.path.basename(filepath)}
-                ))
-
-        logs.log.info(f"Loaded {len(documents):,} documents from '{data_dir}'")
-        return documents
+            if manifest is not None and not manifest.has_changed(
+                entry.name, hash_file(entry.path)
+            ):
+                logs.log.info(f"Skipping unchanged file '{entry.name}'")
+                continue
+
+            filepaths.append(entry.path)
+
+        loaded = 0
+        failed = 0
+        for _, documents in iter_parsed_files(filepaths, workers, timeout):
+            if documents is None:
+                failed += 1
+                continue
+            loaded += len(documents)
+            yield from documents
+
+        if failed:
+            logs.log.warning(f"{failed:,} file(s) could not be parsed and were skipped")
+
+        logs.log.info(f"Loaded {loaded:,} documents from '{data_dir}'")
 
     except Exception as err:
         logs.log.error(f"Error loading documents: {err}")
@@ -153,6 +480,27 @@ def load_documents(data_dir: str):
         logs.log.info("Document loading complete; removed local file(s)")
 
 
+def load_documents(
+    data_dir: str,
+    manifest: IngestionManifest = None,
+    workers: int = 1,
+    timeout: int = None,
+):
+    """
+    Loads documents from a directory of files, with Japanese PDF support.
+
+    Args:
+        data_dir (str): Directory containing files to load.
+        manifest (IngestionManifest, optional): When provided, files whose content hash is unchanged since the last ingestion are skipped.
+        workers (int, optional): Number of processes used to parse files in parallel. Defaults to 1.
+        timeout (int, optional): Per-file parsing timeout in seconds. Defaults to None.
+
+    Returns:
+        List[Document]: Loaded documents.
+    """
+    return list(iter_documents(data_dir, manifest, workers, timeout))
+
+
 ###################################
 #
 # Create Document Index
@@ -160,13 +508,66 @@ def load_documents(data_dir: str):
 ###################################
 
 
-@st.cache_resource(show_spinner=False)
-def create_index(_documents):
+def open_index(persist_dir: str, fresh: bool = False):
     """
-    Creates an index from the provided documents and service context.
+    Opens the index persisted in `persist_dir`, or creates an empty one.
 
     Args:
-        documents (list[str]): A list of strings representing the content of the documents to be indexed.
+        persist_dir (str): The vector store directory.
+        fresh (bool, optional): Ignore any persisted index and start from scratch. Defaults to False.
+
+    Returns:
+        An instance of `VectorStoreIndex`.
+
+    Notes:
+        Vectors are kept in a memory-mapped `MmapVectorStore`. Directories still holding a JSON `default__vector_store.json` are loaded and written back in the binary format on the next update.
+    """
+    if not fresh and os.path.exists(os.path.join(persist_dir, "index_store.json")):
+        storage_context = StorageContext.from_defaults(
+            persist_dir=persist_dir,
+            vector_store=load_vector_store(persist_dir),
+        )
+        logs.log.info(f"Loaded persisted index from '{persist_dir}'")
+        return load_index_from_storage(storage_context)
+
+    return VectorStoreIndex(
+        nodes=[],
+        storage_context=StorageContext.from_defaults(vector_store=MmapVectorStore()),
+    )
+
+
+def create_index(
+    documents,
+    persist_dir: str,
+    manifest: IngestionManifest,
+    index=None,
+    batch_size: int = 256,
+    progress=None,
+    search_index: str = "exact",
+    ivf_nlist: int = 0,
+    vector_precision: str = "float32",
+    rescore: bool = True,
+    chunk_size: int = 1024,
+    chunk_overlap: int = 200,
+    dedup_threshold: float = None,
+):
+    """
+    Incrementally updates the persisted index with the provided documents.
+
+    Args:
+        documents (Iterable[Document]): The documents to be indexed. May be a generator, which is consumed lazily.
+        persist_dir (str): The vector store directory the index is persisted to.
+        manifest (IngestionManifest): The ingestion manifest of the persisted index.
+        index (VectorStoreIndex, optional): An already opened index to update. Defaults to loading it from `persist_dir`.
+        batch_size (int, optional): Number of nodes embedded and inserted at a time. Defaults to 256.
+        progress (Callable[[dict], None], optional): Called with the ingestion counters after each stage.
+        search_index (str, optional): `"exact"`, or `"ivf"` to build an approximate search index when persisting. Defaults to "exact".
+        ivf_nlist (int, optional): Number of IVF lists; `0` picks one based on the corpus size. Defaults to 0.
+        vector_precision (str, optional): Precision of the persisted search matrix: `"float32"`, `"float16"` or `"int8"`. Defaults to "float32".
+        rescore (bool, optional): Re-rank quantized search candidates with the float32 vectors. Defaults to True.
+        chunk_size (int, optional): Maximum number of tokens per chunk. Defaults to 1024.
+        chunk_overlap (int, optional): Number of tokens repeated between consecutive chunks. Defaults to 200.
+        dedup_threshold (float, optional): Drop chunks at least this similar to an earlier chunk before embedding; `1.0` only drops exact duplicates. Defaults to None (no deduplication).
 
     Returns:
         An instance of `VectorStoreIndex`, containing the indexed data.
@@ -175,18 +576,43 @@ def create_index(_documents):
         Exception: If there is an error creating the index.
 
     Notes:
-        The `documents` parameter should be a list of strings representing the content of the documents to be indexed.
+        Documents flow through `utils.ingestion.ingest_documents` in bounded batches. Sources that are unchanged
+        according to the manifest are skipped; changed sources have their previous nodes deleted before the new
+        nodes are embedded and inserted. Only this delta is embedded, then the index and manifest are persisted.
+
+        Documents are split into chunks by a `LanguageAwareSplitter`, which cuts at sentence boundaries including
+        Japanese ones. With `dedup_threshold` set, repeated chunks such as footers and license headers are
+        dropped by a `ChunkDeduplicator` before they are embedded.
     """
 
     try:
-        # vector_store = SimpleVectorStore()
-        # storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-        index = VectorStoreIndex.from_documents(
-            documents=_documents, show_progress=True,
+        node_parser = LanguageAwareSplitter(chunk_size, chunk_overlap)
+        deduplicator = ChunkDeduplicator(dedup_threshold) if dedup_threshold is not None else None
+        if index is None or manifest.rebuild:
+            index = open_index(persist_dir, fresh=manifest.rebuild)
+        index.vector_store.configure_ann(search_index, ivf_nlist)
+        index.vector_store.configure_precision(vector_precision, rescore)
+
+        stats = ingestion.ingest_documents(
+            documents,
+            index,
+            manifest,
+            batch_size=batch_size,
+            progress=progress,
+            node_parser=node_parser,
+            deduplicator=deduplicator,
         )
-        logs.log.info("Index created from loaded documents successfully")
-        # logs.log.info("Index created and saved successfully")
+
+        if stats["updated"] > 0 or stats["removed"] > 0 or manifest.rebuild:
+            index.storage_context.persist(persist_dir=persist_dir)
+            manifest.rebuild = False
+            manifest.save()
+            logs.log.info(
+                f"Index updated with {stats['updated']:,} new or changed source(s); "
+                f"{stats['removed']:,} removed"
+            )
+        else:
+            logs.log.info("Index is up to date; nothing to embed")
 
         return index
     except Exception as err:
@@ -201,13 +627,97 @@ def create_index(_documents):
 ###################################
 
 
+def ensure_keyword_index(index):
+    """
+    Builds the keyword index of a vector store persisted without one, from the chunk text in the docstore.
+    """
+    vector_store = index.vector_store
+    if vector_store.has_keywords:
+        return
+    logs.log.info("The index has no keyword index yet; building it from the docstore")
+    vector_store.build_keywords(
+        lambda node_ids: [node.get_content() for node in index.docstore.get_nodes(node_ids)]
+    )
+
+
+def build_query_engine(
+    index,
+    similarity_top_k: int,
+    chat_mode: str,
+    vector_store_kwargs: dict = None,
+    llm=None,
+    retrieval_mode: str = "dense",
+    reranker=None,
+    rerank_candidates: int = 20,
+):
+    """
+    Creates a streaming query engine over an opened index.
+
+    Args:
+        index (VectorStoreIndex): The index to query.
+        similarity_top_k (int): Number of chunks retrieved per question.
+        chat_mode (str): The response mode, e.g. "compact".
+        vector_store_kwargs (dict, optional): Passed to the vector store on every query, e.g. `{"probe_fraction": 0.4}`.
+        llm (LLM, optional): The language model. Defaults to `Settings.llm`.
+        retrieval_mode (str, optional): `"dense"`, `"hybrid"` or `"keyword"` (see `RETRIEVAL_MODES`). Defaults to "dense".
+        reranker (CrossEncoderReranker, optional): Reranks `rerank_candidates` retrieved chunks and passes its `top_n` best to the LLM instead of the `similarity_top_k` retrieved ones.
+        rerank_candidates (int, optional): Number of chunks retrieved for the reranker. Defaults to 20.
+
+    Returns:
+        An instance of `RetrieverQueryEngine`.
+
+    Notes:
+        Engines are cheap to create and keep no state of their own, so one can be created per session or request
+        over a shared index. Retrieval goes through a `CachedRetriever`.
+
+        Hybrid retrieval fuses the embedding ranking with a BM25 ranking of the chunk text, which finds exact terms
+        such as error codes, product names and identifiers that embeddings tend to miss.
+    """
+    vector_store_kwargs = vector_store_kwargs or {}
+    node_postprocessors = []
+    if reranker is not None:
+        similarity_top_k = max(rerank_candidates, reranker.top_n)
+        node_postprocessors.append(reranker)
+
+    query_mode = RETRIEVAL_MODES[retrieval_mode]
+    if query_mode != VectorStoreQueryMode.DEFAULT:
+        ensure_keyword_index(index)
+
+    # Unlike `index.as_retriever()`, which restricts queries to a list of every node of the index, no `node_ids`
+    # lets the vector store score all of its rows at once
+    retriever = CachedRetriever(
+        VectorIndexRetriever(
+            index,
+            node_ids=None,
+            similarity_top_k=similarity_top_k,
+            vector_store_query_mode=query_mode,
+            vector_store_kwargs=vector_store_kwargs,
+        ),
+        index.vector_store,
+        similarity_top_k=similarity_top_k,
+        vector_store_kwargs=vector_store_kwargs,
+        query_mode=query_mode,
+    )
+    return RetrieverQueryEngine.from_args(
+        retriever,
+        llm=llm,
+        node_postprocessors=node_postprocessors,
+        response_mode=chat_mode,
+        streaming=True,
+    )
+
+
 # @st.cache_resource(show_spinner=False)
-def create_query_engine(_documents):
+def create_query_engine(
+    _documents, manifest: IngestionManifest = None, progress=None
+):
     """
     Creates a query engine from the provided documents and service context.
 
     Args:
         documents (list[str]): A list of strings representing the content of the documents to be indexed.
+        manifest (IngestionManifest, optional): The ingestion manifest of the persisted index. Defaults to the one stored in the vector store directory.
+        progress (Callable[[dict], None], optional): Receives ingestion progress counters while documents are indexed.
 
     Returns:
         An instance of `QueryEngine`, containing the indexed data and allowing for querying of the data using a variety of parameters.
@@ -218,30 +728,135 @@ def create_query_engine(_documents):
     Notes:
         The `documents` parameter should be a list of strings representing the content of the documents to be indexed.
 
-        This function uses the `create_index` function to create an index from the provided documents and service context, and then creates a query engine from the resulting index. The `query_engine` parameter is used to specify the parameters of the query engine, including the number of top-ranked items to return (`similarity_top_k`) and the response mode (`response_mode`).
+        This function uses the `create_index` function to add the provided documents to the persisted index, and then creates a query engine from the resulting index. The `query_engine` parameter is used to specify the parameters of the query engine, including the number of top-ranked items to return (`similarity_top_k`) and the response mode (`response_mode`).
+
+        Retrieval goes through a `CachedRetriever`, so repeated questions reuse their query embedding and, until the index changes, their retrieved nodes.
+
+        The index itself is shared by all sessions through `index_registry`: it is loaded once per process, and each session only holds a lease on it and its own query engine. Documents are ingested into a private copy of the index, which replaces the shared one once it has been persisted.
     """
     try:
-        if _documents:
-            index = create_index(_documents)
+        vectordb_path = st.session_state.get("vectordb_path", "./vectordb")
+        search_index = st.session_state.get("search_index", "exact")
+        ivf_nlist = int(st.session_state.get("ivf_nlist", 0))
+        store_options = {
+            "search_index": search_index,
+            "ivf_nlist": ivf_nlist,
+            "vector_precision": st.session_state.get("vector_precision", "float32"),
+            "rescore": st.session_state.get("vector_rescore", True),
+        }
+        embed_model = resolve_embedding_model(
+            st.session_state.get("embedding_model"),
+            st.session_state.get("other_embedding_model"),
+        )
+
+        if _documents or manifest is not None:
+            if manifest is None:
+                manifest = IngestionManifest.load(vectordb_path)
+            index = create_index(
+                _documents or [],
+                vectordb_path,
+                manifest,
+                batch_size=int(st.session_state.get("ingest_batch_size", 256)),
+                progress=progress,
+                chunk_size=int(st.session_state.get("chunk_size", 1024)),
+                chunk_overlap=int(st.session_state.get("chunk_overlap", 200)),
+                dedup_threshold=(
+                    st.session_state.get("dedup_threshold", DEFAULT_DEDUP_THRESHOLD)
+                    if st.session_state.get("dedup_chunks", True)
+                    else None
+                ),
+                **store_options,
+            )
+            lease = index_registry.publish(vectordb_path, embed_model, store_options, index)
         else:
-            vectordb_path = st.session_state.get("vectordb_path", "./vectordb")
             if not os.path.exists(vectordb_path):
                 raise Exception(f"VectorDB folder '{vectordb_path}' does not exist.")
 
-            storage_context = StorageContext.from_defaults(persist_dir=vectordb_path)
-            index = load_index_from_storage(storage_context)
-
-        query_engine = index.as_query_engine(
-            similarity_top_k=st.session_state["top_k"],
-            response_mode=st.session_state["chat_mode"],
-            streaming=True,
+            def load():
+                index = open_index(vectordb_path)
+                index.vector_store.configure_ann(search_index, ivf_nlist)
+                index.vector_store.configure_precision(
+                    store_options["vector_precision"], store_options["rescore"]
+                )
+                return index
+
+            lease = index_registry.acquire(vectordb_path, embed_model, store_options, load)
+
+        previous_lease = st.session_state.get("index_lease")
+        if previous_lease is not None:
+            previous_lease.release()
+        st.session_state["index_lease"] = lease
+        st.session_state["index"] = index = lease.index
+
+        vector_store_kwargs = {}
+        if search_index == "ivf":
+            vector_store_kwargs["probe_fraction"] = st.session_state.get("ivf_probe_percent", DEFAULT_PROBE_FRACTION * 100) / 100
+
+        reranker = None
+        if st.session_state.get("rerank", False):
+            try:
+                reranker = create_reranker(
+                    st.session_state["rerank_model"],
+                    st.session_state["top_k"],
+                    float(st.session_state["rerank_budget_ms"]),
+                )
+            except Exception as err:
+                logs.log.warning(f"Reranking disabled: {err}")
+
+        query_engine = build_query_engine(
+            index,
+            st.session_state["top_k"],
+            st.session_state["chat_mode"],
+            vector_store_kwargs=vector_store_kwargs,
+            retrieval_mode=st.session_state.get("retrieval_mode", "dense"),
+            reranker=reranker,
+            rerank_candidates=int(st.session_state.get("rerank_candidates", 20)),
         )
 
         st.session_state["query_engine"] = query_engine
+        st.session_state["query_engine_settings"] = query_engine_settings()
 
         logs.log.info("Query Engine created successfully")
 
         return query_engine
     except Exception as e:
         logs.log.error(f"Error when creating Query Engine: {e}")
-        raise Exception(f"Error when creating Query Engine: {e}")
\ No newline at end of file
+        raise Exception(f"Error when creating Query Engine: {e}")
+
+
+def query_engine_settings():
+    """
+    Returns the session settings that apply to the next question, without processing the documents again.
+    """
+    return (
+        st.session_state.get("top_k"),
+        st.session_state.get("retrieval_mode", "dense"),
+        st.session_state.get("ivf_probe_percent"),
+        st.session_state.get("rerank", False),
+        st.session_state.get("rerank_model"),
+        st.session_state.get("rerank_candidates"),
+        st.session_state.get("rerank_budget_ms"),
+    )
+
+
+def session_query_engine():
+    """
+    Returns the query engine of the current session, re-created first if the shared index it queries was reloaded or updated by another session since, or its retrieval or rerank settings were changed.
+
+    Returns:
+        The session's `QueryEngine`, or None if it has none yet.
+    """
+    lease = st.session_state.get("index_lease")
+    if lease is not None and not index_registry.is_current(lease):
+        logs.log.info("The shared index changed; re-creating the query engine")
+        try:
+            create_query_engine([])
+        except Exception as err:
+            logs.log.warning(f"Keeping the previous query engine: {err}")
+    elif lease is not None and st.session_state.get("query_engine_settings") != query_engine_settings():
+        logs.log.info("Retrieval settings changed; re-creating the query engine")
+        try:
+            create_query_engine([])
+        except Exception as err:
+            logs.log.warning(f"Keeping the previous query engine: {err}")
+    return st.session_state["query_engine"]
@@ -0,0 +1,236 @@
+import os
+import json
+import hashlib
+
+from collections import Counter
+
+import utils.logs as logs
+
+MANIFEST_FNAME = "ingestion_manifest.json"
+
+
+###################################
+#
+# Hash File & Text Content
+#
+###################################
+
+
+def hash_file(file_path: str, block_size: int = 1 << 20):
+    """
+    Computes the SHA-256 hash of a file's content.
+
+    Args:
+        file_path (str): The path to the file.
+        block_size (int, optional): Number of bytes read per iteration. Defaults to 1 MiB.
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_text(text: str):
+    """
+    Computes the SHA-256 hash of a string.
+
+    Args:
+        text (str): The text to hash.
+
+    Returns:
+        str: The hex digest of the UTF-8 encoded text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+###################################
+#
+# Ingestion Manifest
+#
+###################################
+
+
+class IngestionManifest:
+    """
+    Tracks which sources (files, web pages, ...) have been ingested into a persisted index.
+
+    Each source is stored as `source -> {hash, doc_ids, node_ids}` alongside the settings the index was
+    built with (embedding model, chunk size and overlap). Sources whose hash is unchanged are skipped on
+    the next ingestion; changed sources have their previous documents deleted before being re-inserted.
+
+    A node can be listed by several sources: when chunk deduplication drops a chunk, its source refers to the node
+    of the chunk it repeats. Nodes are reference-counted, and `release()` only hands out a node for deletion once no
+    source refers to it any more.
+
+    The manifest is persisted as JSON inside the vector store directory so it travels with the index.
+    """
+
+    def __init__(self, persist_dir: str, settings: dict = None, sources: dict = None):
+        self.persist_dir = persist_dir
+        self.settings = settings
+        self.sources = sources or {}
+        self.pending = {}
+        self.removed = set()
+        self.rebuild = False
+        self._references = None
+
+    @property
+    def path(self):
+        return os.path.join(self.persist_dir, MANIFEST_FNAME)
+
+    @classmethod
+    def load(cls, persist_dir: str):
+        """
+        Loads the manifest stored in `persist_dir`, or returns an empty manifest if none exists.
+
+        Args:
+            persist_dir (str): The vector store directory.
+
+        Returns:
+            IngestionManifest: The loaded (or empty) manifest.
+        """
+        path = os.path.join(persist_dir, MANIFEST_FNAME)
+        if not os.path.exists(path):
+            return cls(persist_dir)
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(persist_dir, data.get("settings"), data.get("sources"))
+        except Exception as err:
+            logs.log.warning(f"Unable to read ingestion manifest, starting fresh: {err}")
+            return cls(persist_dir)
+
+    def is_compatible(self, settings: dict):
+        """
+        Checks whether the index was built with the given settings.
+
+        A manifest without recorded settings (e.g. a `vectordb` built before manifests existed) is
+        treated as compatible so that its content is kept and extended.
+
+        Args:
+            settings (dict): The current embedding model and chunk settings.
+
+        Returns:
+            bool: True if the persisted index can be updated incrementally.
+        """
+        return self.settings is None or self.settings == settings
+
+    def reset(self, settings: dict):
+        """
+        Forgets all ingested sources and records new index settings; the index must be rebuilt from scratch.
+
+        Args:
+            settings (dict): The settings the new index is built with.
+        """
+        self.settings = settings
+        self.sources = {}
+        self.pending = {}
+        self.removed = set()
+        self.rebuild = True
+        self._references = None
+
+    def has_changed(self, source: str, content_hash: str):
+        """
+        Checks whether a source needs to be (re-)ingested, remembering its hash for `record()`.
+
+        Args:
+            source (str): The source key (e.g. file name).
+            content_hash (str): The hash of the source's current content.
+
+        Returns:
+            bool: True if the source is new or its content changed since the last ingestion.
+        """
+        entry = self.sources.get(source)
+        if entry is not None and entry["hash"] == content_hash:
+            return False
+        self.pending[source] = content_hash
+        return True
+
+    def remove(self, source: str):
+        """
+        Stages a source that no longer exists (e.g. a file deleted from a repository) for removal from the index.
+
+        Its nodes are deleted and its entry forgotten by the next ingestion.
+        """
+        self.removed.add(source)
+
+    def doc_ids(self, source: str):
+        """
+        Returns the document IDs previously ingested for a source.
+        """
+        entry = self.sources.get(source)
+        return list(entry["doc_ids"]) if entry else []
+
+    def node_ids(self, source: str):
+        """
+        Returns the node IDs previously ingested for a source.
+        """
+        entry = self.sources.get(source)
+        return list(entry["node_ids"]) if entry else []
+
+    def references(self):
+        """
+        Returns the number of sources referring to each node, counted on first use.
+        """
+        if self._references is None:
+            self._references = Counter(
+                node_id for entry in self.sources.values() for node_id in set(entry["node_ids"])
+            )
+        return self._references
+
+    def release(self, source: str):
+        """
+        Detaches a source from its nodes, e.g. before it is re-ingested or removed.
+
+        Returns:
+            list[str]: IDs of the nodes no other source refers to, which can be deleted from the index.
+        """
+        entry = self.sources.get(source)
+        if not entry:
+            return []
+        references = self.references()
+        released = []
+        for node_id in dict.fromkeys(entry["node_ids"]):
+            references[node_id] -= 1
+            if references[node_id] <= 0:
+                del references[node_id]
+                released.append(node_id)
+        entry["node_ids"] = []
+        return released
+
+    def record(self, source: str, doc_ids: list, node_ids: list, content_hash: str = None):
+        """
+        Records the documents and nodes that were inserted for a source.
+
+        Args:
+            source (str): The source key.
+            doc_ids (list[str]): IDs of the inserted documents.
+            node_ids (list[str]): IDs of the inserted nodes, and of the nodes of other sources its duplicate chunks
+                repeat.
+            content_hash (str, optional): Hash of the source content. Defaults to the hash staged by `has_changed()`.
+        """
+        staged_hash = self.pending.pop(source, None)
+        content_hash = content_hash or staged_hash
+        self.release(source)
+        self.references().update(set(node_ids))
+        self.sources[source] = {
+            "hash": content_hash,
+            "doc_ids": doc_ids,
+            "node_ids": node_ids,
+        }
+
+    def save(self):
+        """
+        Writes the manifest to disk atomically.
+        """
+        os.makedirs(self.persist_dir, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": self.settings, "sources": self.sources}, f)
+        os.replace(tmp_path, self.path)
+        logs.log.info(f"Ingestion manifest saved with {len(self.sources):,} source(s)")
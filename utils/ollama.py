@@ -1,16 +1,27 @@
 import ollama
 import os
-
+import re
+import math
+import time
+import asyncio
+import threading
+import weakref
+
+import httpx
 import streamlit as st
 
 import utils.logs as logs
 
+from utils.answer_cache import answer_scope, load_answer_cache, stream_text
+from utils.query_cache import embed_query
+
 # This is not used but required by llama-index and must be imported FIRST
 os.environ["OPENAI_API_KEY"] = "sk-abc123"
 
 from llama_index.llms.ollama import Ollama
 from llama_index.core import Settings
 from llama_index.core.query_engine.retriever_query_engine import RetrieverQueryEngine
+from llama_index.core.schema import NodeWithScore
 
 ###################################
 #
@@ -19,12 +30,88 @@ from llama_index.core.query_engine.retriever_query_engine import RetrieverQueryE
 ###################################
 
 
-def create_client(host: str):
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_REQUEST_TIMEOUT = 1000.0
+KEEPALIVE_EXPIRY = 60.0
+# How long Ollama keeps a model loaded when requests do not set `keep_alive`
+DEFAULT_KEEP_ALIVE_S = 300.0
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+# Pooled clients are shared by all sessions; httpx clients are safe to use from several threads
+_clients = {}
+_clients_lock = threading.Lock()
+# Async clients are bound to the event loop they were created in
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def parse_keep_alive(value):
+    """
+    Converts the keep-alive setting to what the Ollama API expects: a duration string such as "30m", or a number of
+    seconds (`-1` keeps the model loaded indefinitely, `0` unloads it after the request).
+    """
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return str(value).strip()
+
+
+def keep_alive_seconds(value):
+    """
+    Returns how many seconds Ollama keeps a model loaded after a request with the given keep-alive setting.
+
+    Durations are parsed like Ollama does (e.g. "30m", "1h30m", "90s" or a number of seconds). A negative value keeps
+    the model loaded indefinitely (`math.inf`); no value or an unparseable one means Ollama's default of 5 minutes.
+    """
+    value = parse_keep_alive(value)
+    if isinstance(value, float):
+        return math.inf if value < 0 else value
+    if isinstance(value, str):
+        parts = re.findall(r"(-?\d+(?:\.\d+)?)(ms|s|m|h)", value)
+        if parts and "".join(number + unit for number, unit in parts) == value:
+            seconds = sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+            return math.inf if seconds < 0 else seconds
+    return DEFAULT_KEEP_ALIVE_S
+
+
+def _client_kwargs(max_connections: int, connect_timeout: float, request_timeout: float):
+    return {
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(request_timeout, connect=connect_timeout),
+    }
+
+
+def client_options():
+    """
+    Returns the connection pool settings of the current session as keyword arguments for `create_client()`.
+    """
+    return {
+        "max_connections": int(st.session_state.get("ollama_max_connections", DEFAULT_MAX_CONNECTIONS)),
+        "connect_timeout": float(st.session_state.get("ollama_connect_timeout", DEFAULT_CONNECT_TIMEOUT)),
+        "request_timeout": float(st.session_state.get("ollama_request_timeout", DEFAULT_REQUEST_TIMEOUT)),
+    }
+
+
+def create_client(
+    host: str,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+):
     """
-    Creates a client for interacting with the Ollama API.
+    Returns the shared, connection-pooled client for interacting with the Ollama API.
 
     Parameters:
         - host (str): The hostname or IP address of the Ollama server.
+        - max_connections (int, optional): Maximum number of (keep-alive) connections in the pool. Defaults to 10.
+        - connect_timeout (float, optional): Seconds to wait for a connection to be established. Defaults to 5.
+        - request_timeout (float, optional): Seconds to wait for a response. Defaults to 1000.
 
     Returns:
         - An instance of the Ollama client.
@@ -33,17 +120,60 @@ def create_client(host: str):
         - Exception: If there is an error creating the client.
 
     Notes:
-        This function creates a client for interacting with the Ollama API using the `ollama` library. It takes a single parameter, `host`, which should be the hostname or IP address of the Ollama server. The function returns an instance of the Ollama client, or raises an exception if there is an error creating the client.
+        One client is created per host and pool settings and reused by every caller in the process, so HTTP connections are kept alive between requests instead of paying TCP setup for each one. The function returns False if there is an error creating the client.
     """
+    key = (host, max_connections, connect_timeout, request_timeout)
     try:
-        client = ollama.Client(host=host)
-        logs.log.info("Ollama chat client created successfully")
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = ollama.Client(
+                    host=host,
+                    **_client_kwargs(max_connections, connect_timeout, request_timeout),
+                )
+                _clients[key] = client
+                logs.log.info(f"Ollama client created for '{host}'")
         return client
     except Exception as err:
         logs.log.error(f"Failed to create Ollama client: {err}")
         return False
 
 
+def create_async_client(
+    host: str,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+):
+    """
+    Returns the shared, connection-pooled async client for the running event loop, for issuing concurrent requests.
+
+    Parameters:
+        - host (str): The hostname or IP address of the Ollama server.
+        - max_connections (int, optional): Maximum number of concurrent connections. Defaults to 10.
+        - connect_timeout (float, optional): Seconds to wait for a connection to be established. Defaults to 5.
+        - request_timeout (float, optional): Seconds to wait for a response. Defaults to 1000.
+
+    Returns:
+        - An instance of `ollama.AsyncClient`.
+
+    Notes:
+        Must be called from within a running event loop. Connections of an async client cannot be shared between event loops, so one client is kept per loop and dropped with it.
+    """
+    loop = asyncio.get_running_loop()
+    key = (host, max_connections, connect_timeout, request_timeout)
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = ollama.AsyncClient(
+                host=host,
+                **_client_kwargs(max_connections, connect_timeout, request_timeout),
+            )
+            clients[key] = client
+    return client
+
+
 ###################################
 #
 # Get Models
@@ -51,10 +181,106 @@ def create_client(host: str):
 ###################################
 
 
-def get_models():
+MODEL_CATALOG_TTL = 60.0
+MODEL_CATALOG_WAIT = 2.0
+
+
+def fetch_models(host: str, options: dict):
+    """
+    Requests the names of the models available on an Ollama server.
+
+    Parameters:
+        - host (str): The Ollama endpoint.
+        - options (dict): Connection pool settings, see `client_options()`.
+
+    Returns:
+        - models (list[str]): The available model names.
+    """
+    data = create_client(host, **options).list()
+    return [model.model for model in data["models"]]
+
+
+class ModelCatalog:
+    """
+    A model list cache shared by all sessions, with a TTL and stale-while-revalidate semantics.
+
+    A list younger than `ttl` seconds is returned as is. An older list is still returned immediately while a background
+    thread fetches a new one. Only when no list is known yet does a caller wait for Ollama, and never longer than
+    `wait` seconds; if Ollama is slow or unreachable, the last known list (or an empty one) is returned. At most one
+    fetch per endpoint is in flight at a time.
+    """
+
+    def __init__(self, ttl: float = MODEL_CATALOG_TTL, wait: float = MODEL_CATALOG_WAIT):
+        self.ttl = ttl
+        self.wait = wait
+        self._entries = {}
+        self._refreshing = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self, host: str, options: dict):
+        """
+        Starts a background fetch unless one is already running, and returns an event set once it finishes.
+        """
+        with self._lock:
+            done = self._refreshing.get(host)
+            if done is not None:
+                return done
+            done = threading.Event()
+            self._refreshing[host] = done
+
+        def run():
+            try:
+                models = fetch_models(host, options)
+                with self._lock:
+                    self._entries[host] = (models, time.monotonic())
+                logs.log.info(f"Model catalog refreshed with {len(models)} model(s) from '{host}'")
+            except Exception as err:
+                logs.log.warning(f"Failed to refresh Ollama model list, keeping the last known one: {err}")
+            finally:
+                with self._lock:
+                    self._refreshing.pop(host, None)
+                done.set()
+
+        threading.Thread(target=run, name="model-catalog", daemon=True).start()
+        return done
+
+    def get(self, host: str, options: dict, refresh: bool = False):
+        """
+        Returns the model list of an endpoint.
+
+        Parameters:
+            - host (str): The Ollama endpoint.
+            - options (dict): Connection pool settings, see `client_options()`.
+            - refresh (bool, optional): Wait (up to `wait` seconds) for a new list even if the cached one is fresh. Defaults to False.
+
+        Returns:
+            - models (list[str]): The model names, possibly stale.
+        """
+        with self._lock:
+            entry = self._entries.get(host)
+
+        if entry is not None and not refresh:
+            models, fetched_at = entry
+            if time.monotonic() - fetched_at >= self.ttl:
+                self._refresh(host, options)
+            return list(models)
+
+        self._refresh(host, options).wait(self.wait)
+        with self._lock:
+            entry = self._entries.get(host)
+        return list(entry[0]) if entry is not None else []
+
+
+model_catalog = ModelCatalog()
+
+
+def get_models(refresh: bool = False):
     """
     Retrieves a list of available language models from the Ollama server.
 
+    Parameters:
+        - refresh (bool, optional): Bypass the cached model list, e.g. when the user clicks "Refresh". Defaults to False.
+
     Returns:
         - models (list[str]): A list of available language model names.
 
@@ -62,19 +288,17 @@ def get_models():
         - Exception: If there is an error retrieving the list of models.
 
     Notes:
-        This function retrieves a list of available language models from the Ollama server using the `ollama` library. It takes no parameters and returns a list of available language model names.
+        This function retrieves a list of available language models from the Ollama server using the `ollama` library. It returns a list of available language model names.
 
-        The function raises an exception if there is an error retrieving the list of models.
+        The list comes from the shared `model_catalog`, so a new session does not block on Ollama when the list is already known: a stale list is returned immediately and refreshed in the background.
 
     Side Effects:
         - st.session_state["ollama_models"] is set to the list of available language models.
     """
     try:
-        chat_client = create_client(st.session_state["ollama_endpoint"])
-        data = chat_client.list()
-        models = []
-        for model in data["models"]:
-            models.append(model.model)
+        models = model_catalog.get(
+            st.session_state["ollama_endpoint"], client_options(), refresh=refresh
+        )
 
         st.session_state["ollama_models"] = models
 
@@ -98,23 +322,56 @@ def get_models():
 ###################################
 
 
-@st.cache_data(show_spinner=False)
-def create_ollama_llm(model: str, base_url: str, system_prompt: str = None, request_timeout: int = 1000) -> Ollama:
+@st.cache_resource(show_spinner=False)
+def load_ollama_llm(
+    model: str,
+    base_url: str,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    keep_alive=None,
+) -> Ollama:
+    """
+    Loads the Ollama language model shared by all sessions, backed by the pooled client of `create_client()`.
+    """
+    client = create_client(base_url, max_connections, connect_timeout, request_timeout)
+    llm = Ollama(
+        model=model,
+        base_url=base_url,
+        request_timeout=request_timeout,
+        client=client or None,
+        keep_alive=keep_alive,
+    )
+    logs.log.info("Ollama LLM instance created successfully")
+    return llm
+
+
+def create_ollama_llm(model: str, base_url: str, system_prompt: str = None, request_timeout: int = None) -> Ollama:
     """
     Create an instance of the Ollama language model.
 
     Parameters:
         - model (str): The name of the model to use for language processing.
         - base_url (str): The base URL for making API requests.
-        - request_timeout (int, optional): The timeout for API requests in seconds. Defaults to 60.
+        - request_timeout (int, optional): The timeout for API requests in seconds. Defaults to the session's `ollama_request_timeout`.
 
     Returns:
         - llm: An instance of the Ollama language model with the specified configuration.
+
+    Notes:
+        The instance (and its HTTP connections) is reused across calls and sessions; it is also set as `Settings.llm`. Every request sends the session's `ollama_keep_alive`, so the model stays loaded in Ollama while it is being used.
     """
     try:
+        options = client_options()
+        if request_timeout is not None:
+            options["request_timeout"] = float(request_timeout)
         # Settings.llm = Ollama(model=model, base_url=base_url, system_prompt=system_prompt, request_timeout=request_timeout)
-        Settings.llm = Ollama(model=model, base_url=base_url, request_timeout=request_timeout)
-        logs.log.info("Ollama LLM instance created successfully")
+        Settings.llm = load_ollama_llm(
+            model,
+            base_url,
+            keep_alive=parse_keep_alive(st.session_state.get("ollama_keep_alive")),
+            **options,
+        )
         return Settings.llm
     except Exception as e:
         logs.log.error(f"Error creating Ollama language model: {e}")
@@ -159,13 +416,45 @@ def chat(prompt: str):
 ###################################
 
 
-def context_chat(prompt: str, query_engine: RetrieverQueryEngine):
+def cached_answer(prompt: str, scope: str, index):
+    """
+    Looks up a previously generated answer to a sufficiently similar question.
+
+    Parameters:
+        - prompt (str): The question.
+        - scope (str): The answer cache scope of the current index, model and chat mode.
+        - index (VectorStoreIndex): The index the cached source nodes are read from.
+
+    Returns:
+        - Tuple[Iterable[str], list[NodeWithScore]] | None: The replayed answer stream and its source nodes, or None on a miss.
+    """
+    cache = load_answer_cache(int(st.session_state["answer_cache_size"]))
+    hit = cache.lookup(
+        scope, embed_query(prompt), float(st.session_state["answer_cache_threshold"])
+    )
+    if hit is None:
+        logs.log.info(f"Answer cache miss ({cache.hit_rate():.0%} hit rate)")
+        return None
+
+    source_nodes = []
+    for node_id, score in zip(hit["node_ids"], hit["scores"]):
+        node = index.docstore.get_node(node_id, raise_error=False)
+        if node is not None:
+            source_nodes.append(NodeWithScore(node=node, score=score))
+    logs.log.info(
+        f"Answer cache hit with similarity {hit['similarity']:.3f} ({cache.hit_rate():.0%} hit rate)"
+    )
+    return stream_text(hit["answer"]), source_nodes
+
+
+def context_chat(prompt: str, query_engine: RetrieverQueryEngine, use_answer_cache: bool = True):
     """
     Initiates a chat with context using the Llama-Index query_engine.
 
     Parameters:
         - prompt (str): The starting prompt for the conversation.
         - query_engine (RetrieverQueryEngine): The Llama-Index query engine to use for retrieving answers.
+        - use_answer_cache (bool, optional): Set to False to bypass the answer cache for this message. Defaults to True.
 
     Yields:
         - str: Successive chunks of conversation from the Llama-Index model with context.
@@ -182,11 +471,27 @@ def context_chat(prompt: str, query_engine: RetrieverQueryEngine):
 
         If there is an error retrieving answers from the Llama-Index instance, the function raises an exception.
 
+        When the answer cache is enabled, an answer previously generated for a question whose embedding is at least `answer_cache_threshold` similar (with the same index content, model, chat mode and retrieval settings) is replayed instead of querying the model. Live answers are stored once their stream has been fully consumed.
+
     Side Effects:
         - The chat conversation is generated and returned as successive chunks of text.
     """
 
     try:
+        index = st.session_state.get("index")
+        scope = None
+        if st.session_state["answer_cache"] and index is not None:
+            scope = answer_scope(
+                index.vector_store.revision,
+                st.session_state["selected_model"],
+                st.session_state["chat_mode"],
+                st.session_state.get("query_engine_settings") or (),
+            )
+            if use_answer_cache:
+                cached = cached_answer(prompt, scope, index)
+                if cached is not None:
+                    return cached
+
         stream = query_engine.query(prompt)
 
         # In nguồn tài liệu được dùng
@@ -199,6 +504,14 @@ def context_chat(prompt: str, query_engine: RetrieverQueryEngine):
         # for text in stream.response_gen:
         #     # print(str(text), end="", flush=True)
         #     yield str(text)
+        if scope is not None:
+            cache = load_answer_cache(int(st.session_state["answer_cache_size"]))
+            return (
+                cache.recording(
+                    stream.response_gen, scope, embed_query(prompt), stream.source_nodes
+                ),
+                stream.source_nodes,
+            )
         return stream.response_gen, stream.source_nodes
     except Exception as err:
         logs.log.error(f"Ollama chat stream error: {err}")
@@ -0,0 +1,176 @@
+import math
+import time
+import threading
+
+import streamlit as st
+
+import utils.logs as logs
+import utils.ollama as ollama
+import utils.llama_index as llama_index
+
+# Models that are loaded (or being loaded) in this process, with their warm-up timings and, for Ollama models, the
+# `time.monotonic()` at which Ollama unloads them unless they are used in the meantime (`expires_at`)
+warm_models = {}
+_warm_lock = threading.Lock()
+
+
+def _claim(key):
+    """
+    Returns True if `key` has not been pre-warmed (or claimed by another thread) yet, or its warm-up has expired.
+    """
+    with _warm_lock:
+        if key in warm_models:
+            timings = warm_models[key]
+            if timings is None or timings.get("expires_at", math.inf) > time.monotonic():
+                return False
+        warm_models[key] = None
+        return True
+
+
+def _release(key, timings: dict = None, keep_alive_s: float = math.inf):
+    with _warm_lock:
+        if timings is None:
+            warm_models.pop(key, None)  # Failed; allow a later retry
+        else:
+            warm_models[key] = {**timings, "expires_at": time.monotonic() + keep_alive_s}
+
+
+###################################
+#
+# Pre-warm Chat Model
+#
+###################################
+
+
+def prewarm_chat_model(host: str, model: str, keep_alive=None, options: dict = None):
+    """
+    Loads a chat model into Ollama in the background and issues a one-token warm-up request.
+
+    Parameters:
+        - host (str): The Ollama endpoint.
+        - model (str): The model to load.
+        - keep_alive (str | float, optional): How long Ollama keeps the model loaded after the last request.
+        - options (dict, optional): Connection pool settings, see `ollama.client_options()`.
+
+    Returns:
+        - threading.Thread | None: The warm-up thread, or None if the model was already pre-warmed and is still loaded.
+
+    Notes:
+        A request with an empty prompt makes Ollama load the model without generating; the following one-token
+        generation then runs through the loaded model once. Both requests carry `keep_alive`.
+
+        Ollama unloads the model once `keep_alive` has passed without requests, so a model is warmed again when it
+        is selected after that time. If chat requests kept it loaded in the meantime, the warm-up is cheap.
+    """
+    key = ("chat", host, model)
+    if not model or not _claim(key):
+        return None
+
+    def run():
+        try:
+            client = ollama.create_client(host, **(options or {}))
+            start = time.perf_counter()
+            loaded = client.generate(model=model, prompt="", keep_alive=keep_alive)
+            load_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            client.generate(
+                model=model,
+                prompt="Hi",
+                options={"num_predict": 1},
+                keep_alive=keep_alive,
+            )
+            warmup_s = time.perf_counter() - start
+
+            timings = {
+                "load_s": load_s,
+                "ollama_load_s": (getattr(loaded, "load_duration", None) or 0) / 1e9,
+                "first_response_s": warmup_s,
+            }
+            _release(key, timings, ollama.keep_alive_seconds(keep_alive))
+            logs.log.info(
+                f"Pre-warmed '{model}': loaded in {load_s:.2f}s, warm first response in {warmup_s:.2f}s"
+            )
+        except Exception as err:
+            _release(key)
+            logs.log.warning(f"Failed to pre-warm '{model}': {err}")
+
+    thread = threading.Thread(target=run, name=f"prewarm-{model}", daemon=True)
+    thread.start()
+    return thread
+
+
+###################################
+#
+# Pre-warm Embedding Model
+#
+###################################
+
+
+def prewarm_embedding_model(model: str, use_cache: bool = True, cache_size: int = 100_000):
+    """
+    Loads an embedding model in the background and embeds a short query once.
+
+    Parameters:
+        - model (str): The HuggingFace model name.
+        - use_cache (bool, optional): Must match the embedding cache setting so that the same cached instance is loaded.
+        - cache_size (int, optional): Must match the embedding cache size setting.
+
+    Returns:
+        - threading.Thread | None: The warm-up thread, or None if the model was already pre-warmed.
+
+    Notes:
+        The model is loaded through `llama_index.load_embedding_model`, whose resource cache is shared with
+        `setup_embedding_model`, so the first upload or question reuses the warmed instance (and the torch kernels
+        initialized by the warm-up embedding).
+    """
+    key = ("embedding", model, use_cache, cache_size)
+    if not model or not _claim(key):
+        return None
+
+    def run():
+        try:
+            start = time.perf_counter()
+            embed_model = llama_index.load_embedding_model(model, use_cache, cache_size)
+            load_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            embed_model.get_query_embedding("warm up")
+            warmup_s = time.perf_counter() - start
+
+            _release(key, {"load_s": load_s, "first_response_s": warmup_s})
+            logs.log.info(
+                f"Pre-warmed embedding model '{model}': loaded in {load_s:.2f}s, first embedding in {warmup_s:.2f}s"
+            )
+        except Exception as err:
+            _release(key)
+            logs.log.warning(f"Failed to pre-warm embedding model '{model}': {err}")
+
+    thread = threading.Thread(target=run, name="prewarm-embedding", daemon=True)
+    thread.start()
+    return thread
+
+
+def prewarm_selected_models():
+    """
+    Pre-warms the chat and embedding models selected in the current session, if pre-warming is enabled.
+
+    Used at app start and as `on_change` callback of the model selections in Settings.
+    """
+    if not st.session_state.get("prewarm_models", True):
+        return
+
+    prewarm_chat_model(
+        st.session_state["ollama_endpoint"],
+        st.session_state.get("selected_model"),
+        keep_alive=ollama.parse_keep_alive(st.session_state.get("ollama_keep_alive")),
+        options=ollama.client_options(),
+    )
+    prewarm_embedding_model(
+        llama_index.resolve_embedding_model(
+            st.session_state.get("embedding_model"),
+            st.session_state.get("other_embedding_model"),
+        ),
+        use_cache=st.session_state.get("embedding_cache", True),
+        cache_size=int(st.session_state.get("embedding_cache_size", 100_000)),
+    )
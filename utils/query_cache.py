@@ -0,0 +1,142 @@
+import threading
+
+from collections import OrderedDict
+from typing import List
+
+import utils.logs as logs
+
+from llama_index.core import Settings
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import VectorStoreQueryMode
+
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+RETRIEVAL_CACHE_SIZE = 256
+
+
+###################################
+#
+# Thread-Safe LRU Cache
+#
+###################################
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe least-recently-used cache that counts its hits and misses.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached value for `key` (marking it as recently used), or None on a miss.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+# Shared by every session of the app, so a question asked by one user is served from cache for the next
+query_embeddings = LRUCache(QUERY_EMBEDDING_CACHE_SIZE)
+retrievals = LRUCache(RETRIEVAL_CACHE_SIZE)
+
+
+def embed_query(*queries: str):
+    """
+    Embeds a query with the configured embedding model, using the shared query-embedding cache.
+
+    Args:
+        *queries (str): The query strings; several are aggregated into one embedding.
+
+    Returns:
+        list[float]: The query embedding.
+    """
+    embed_model = Settings.embed_model
+    key = (embed_model.model_name, queries)
+    embedding = query_embeddings.get(key)
+    if embedding is None:
+        embedding = embed_model.get_agg_embedding_from_queries(list(queries))
+        query_embeddings.put(key, embedding)
+    return embedding
+
+
+###################################
+#
+# Cached Retriever
+#
+###################################
+
+
+class CachedRetriever(BaseRetriever):
+    """
+    Wraps a vector index retriever with a query-embedding cache and a retrieval-result cache.
+
+    Query embeddings are keyed by `(embedding model, query text)`. Retrieval results are keyed by
+    `(query text, top_k, query mode, vector store kwargs, vector store version)`; as the vector store gets a new
+    version whenever nodes are inserted or deleted, or the store is rebuilt, results of an outdated index are never
+    served. Keyword-only (`SPARSE`) retrieval does not embed the query at all.
+    """
+
+    def __init__(
+        self,
+        retriever,
+        vector_store,
+        similarity_top_k: int,
+        vector_store_kwargs: dict = None,
+        query_mode: VectorStoreQueryMode = VectorStoreQueryMode.DEFAULT,
+    ):
+        super().__init__(callback_manager=retriever.callback_manager)
+        self._retriever = retriever
+        self._vector_store = vector_store
+        self._similarity_top_k = similarity_top_k
+        self._vector_store_kwargs = tuple(sorted((vector_store_kwargs or {}).items()))
+        self._query_mode = VectorStoreQueryMode(query_mode)
+
+    def _embed_query(self, query_bundle: QueryBundle):
+        if self._query_mode == VectorStoreQueryMode.SPARSE:
+            return
+        if query_bundle.embedding is None and query_bundle.embedding_strs:
+            query_bundle.embedding = embed_query(*query_bundle.embedding_strs)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        key = (
+            query_bundle.query_str,
+            self._similarity_top_k,
+            self._query_mode,
+            self._vector_store_kwargs,
+            self._vector_store.version,
+        )
+        nodes = retrievals.get(key)
+        if nodes is None:
+            self._embed_query(query_bundle)
+            nodes = self._retriever.retrieve(query_bundle)
+            retrievals.put(key, nodes)
+
+        logs.log.info(
+            f"Query cache hit rates: retrieval {retrievals.hit_rate():.0%}, "
+            f"query embedding {query_embeddings.hit_rate():.0%}"
+        )
+
+        # Postprocessors may modify scores in place, so callers get their own wrappers
+        return [NodeWithScore(node=node.node, score=node.score) for node in nodes]
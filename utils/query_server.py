@@ -0,0 +1,460 @@
+import json
+import time
+import argparse
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import utils.logs as logs
+import utils.ollama as ollama
+import utils.llama_index as llama_index
+
+from utils.ann import DEFAULT_PROBE_FRACTION
+from utils.reranker import create_reranker, load_rerank_model
+from utils.stream_metrics import StreamMetrics
+from utils.translation import TRANSLATION_BACKENDS, TranslationStage, create_backend
+
+from llama_index.core import Settings
+
+CHAT_MODES = (
+    "compact",
+    "refine",
+    "tree_summarize",
+    "simple_summarize",
+    "accumulate",
+    "compact_accumulate",
+)
+MAX_TOP_K = 100
+MAX_BODY_BYTES = 1 << 20
+
+###################################
+#
+# Query Service
+#
+###################################
+
+
+class QueryService:
+    """
+    Answers questions over one index shared by all requests.
+
+    The index, embedding model and LLM are loaded once; every request gets its own lightweight query engine, so
+    `top_k`, `chat_mode` and `retrieval_mode` can be chosen per request. At most `max_concurrency` answers are generated at a time;
+    further requests wait for a free slot for up to `queue_timeout` seconds.
+
+    With a `rerank_model`, `rerank_candidates` chunks are retrieved per question and reranked within
+    `rerank_budget_ms`, and only the best `top_k` are passed to the LLM.
+    """
+
+    def __init__(
+        self,
+        index,
+        llm,
+        top_k: int = 3,
+        chat_mode: str = "compact",
+        retrieval_mode: str = "dense",
+        vector_store_kwargs: dict = None,
+        translation: TranslationStage = None,
+        rerank_model: str = None,
+        rerank_candidates: int = 20,
+        rerank_budget_ms: float = 1000.0,
+        max_concurrency: int = 32,
+        queue_timeout: float = 30.0,
+    ):
+        self.index = index
+        self.llm = llm
+        self.top_k = top_k
+        self.chat_mode = chat_mode
+        self.retrieval_mode = retrieval_mode
+        self.vector_store_kwargs = vector_store_kwargs or {}
+        self.translation = translation
+        self.rerank_model = rerank_model
+        self.rerank_candidates = rerank_candidates
+        self.rerank_budget_ms = rerank_budget_ms
+        self.queue_timeout = queue_timeout
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+
+    def query(self, prompt: str, top_k: int = None, chat_mode: str = None, retrieval_mode: str = None):
+        """
+        Retrieves context for a question and starts generating the answer.
+
+        Args:
+            prompt (str): The question.
+            top_k (int, optional): Number of chunks to retrieve. Defaults to the service's `top_k`.
+            chat_mode (str, optional): The response mode. Defaults to the service's `chat_mode`.
+            retrieval_mode (str, optional): `"dense"`, `"hybrid"` or `"keyword"`. Defaults to the service's `retrieval_mode`.
+
+        Returns:
+            StreamingResponse: The response, whose `response_gen` yields the answer token by token.
+        """
+        if self.translation is not None:
+            prompt = self.translation.translate(prompt)
+
+        top_k = top_k or self.top_k
+        reranker = None
+        if self.rerank_model:
+            reranker = create_reranker(self.rerank_model, top_k, self.rerank_budget_ms)
+
+        query_engine = llama_index.build_query_engine(
+            self.index,
+            top_k,
+            chat_mode or self.chat_mode,
+            vector_store_kwargs=self.vector_store_kwargs,
+            llm=self.llm,
+            retrieval_mode=retrieval_mode or self.retrieval_mode,
+            reranker=reranker,
+            rerank_candidates=self.rerank_candidates,
+        )
+        return query_engine.query(prompt)
+
+
+def load_query_service(
+    persist_dir: str,
+    embedding_model: str,
+    model: str,
+    host: str,
+    use_cache: bool = True,
+    search_index: str = "exact",
+    ivf_nlist: int = 0,
+    ivf_probe_percent: float = DEFAULT_PROBE_FRACTION * 100,
+    vector_precision: str = "float32",
+    rescore: bool = True,
+    max_connections: int = 32,
+    request_timeout: float = ollama.DEFAULT_REQUEST_TIMEOUT,
+    keep_alive=None,
+    translation_backend: str = "none",
+    translation_target: str = "ja",
+    **kwargs,
+):
+    """
+    Loads the index in `persist_dir` and the models, the same way `create_query_engine` does for the app.
+
+    Args:
+        persist_dir (str): The vector store directory.
+        embedding_model (str): The HuggingFace embedding model the index was built with.
+        model (str): The Ollama chat model.
+        host (str): The Ollama endpoint.
+        max_connections (int, optional): Size of the Ollama connection pool; should be at least `max_concurrency`.
+        **kwargs: Passed to `QueryService` (`top_k`, `chat_mode`, `retrieval_mode`, `rerank_model`, `rerank_candidates`, `rerank_budget_ms`, `max_concurrency`, `queue_timeout`).
+
+        The other arguments mirror the app's settings of the same name.
+
+    Returns:
+        QueryService: The service.
+    """
+    Settings.embed_model = llama_index.load_embedding_model(embedding_model, use_cache)
+    llm = ollama.load_ollama_llm(
+        model,
+        host,
+        max_connections=max_connections,
+        request_timeout=request_timeout,
+        keep_alive=keep_alive,
+    )
+    Settings.llm = llm
+    if kwargs.get("rerank_model"):
+        # Loaded before serving, rather than by the first request
+        load_rerank_model(kwargs["rerank_model"])
+
+    index = llama_index.open_index(persist_dir)
+    index.vector_store.configure_ann(search_index, ivf_nlist)
+    index.vector_store.configure_precision(vector_precision, rescore)
+    # Built before serving, rather than by the first hybrid or keyword request
+    llama_index.ensure_keyword_index(index)
+
+    vector_store_kwargs = {}
+    if search_index == "ivf":
+        vector_store_kwargs["probe_fraction"] = ivf_probe_percent / 100
+
+    translation = None
+    if translation_backend != "none":
+        translation = TranslationStage(
+            create_backend(translation_backend, model, host), translation_target
+        )
+
+    return QueryService(
+        index,
+        llm,
+        vector_store_kwargs=vector_store_kwargs,
+        translation=translation,
+        **kwargs,
+    )
+
+
+def source_summary(source_node):
+    """
+    Returns the JSON representation of a retrieved chunk.
+    """
+    return {
+        "file_name": source_node.node.metadata.get("file_name"),
+        "score": source_node.score,
+        "text": source_node.node.get_content(),
+    }
+
+
+###################################
+#
+# HTTP Server
+#
+###################################
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves `GET /health` and `POST /query`.
+
+    `/query` takes a JSON body `{"query": str, "top_k": int, "chat_mode": str, "retrieval_mode": str, "stream": bool}`. Streamed answers
+    (the default) are sent as server-sent events over a chunked response: one `token` event per token, then a `done`
+    event with the sources and latency metrics (or an `error` event). With `"stream": false`, the complete answer is
+    returned as one JSON object.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "LocalRAG"
+
+    def log_message(self, format, *args):
+        logs.log.debug(f"{self.address_string()} {format % args}")
+
+    def send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def write_event(self, event: str, body: dict):
+        data = json.dumps(body, ensure_ascii=False)
+        self.write_chunk(f"event: {event}\ndata: {data}\n\n".encode("utf-8"))
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_json(404, {"error": "Not found"})
+            return
+
+        service = self.server.service
+        self.send_json(200, {"status": "ok", "vectors": len(service.index.vector_store)})
+
+    def parse_request_body(self):
+        """
+        Reads and validates the `/query` body; returns the parsed request or sends a 4xx response and returns None.
+        """
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length <= 0 or length > MAX_BODY_BYTES:
+            self.send_json(400, {"error": "A JSON body of at most 1 MiB is required"})
+            return None
+
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_json(400, {"error": "Invalid JSON"})
+            return None
+
+        if not isinstance(body, dict):
+            self.send_json(400, {"error": "The body must be a JSON object"})
+            return None
+        if not isinstance(body.get("query"), str) or not body["query"].strip():
+            self.send_json(400, {"error": "'query' must be a non-empty string"})
+            return None
+
+        top_k = body.get("top_k")
+        if top_k is not None and (
+            not isinstance(top_k, int) or isinstance(top_k, bool) or not 1 <= top_k <= MAX_TOP_K
+        ):
+            self.send_json(400, {"error": f"'top_k' must be an integer from 1 to {MAX_TOP_K}"})
+            return None
+
+        chat_mode = body.get("chat_mode")
+        if chat_mode is not None and chat_mode not in CHAT_MODES:
+            self.send_json(400, {"error": f"'chat_mode' must be one of {', '.join(CHAT_MODES)}"})
+            return None
+
+        retrieval_mode = body.get("retrieval_mode")
+        if retrieval_mode is not None and retrieval_mode not in llama_index.RETRIEVAL_MODES:
+            self.send_json(
+                400,
+                {"error": f"'retrieval_mode' must be one of {', '.join(llama_index.RETRIEVAL_MODES)}"},
+            )
+            return None
+
+        return body
+
+    def do_POST(self):
+        if self.path != "/query":
+            self.send_json(404, {"error": "Not found"})
+            return
+
+        body = self.parse_request_body()
+        if body is None:
+            return
+
+        service = self.server.service
+        if not service.slots.acquire(timeout=service.queue_timeout):
+            self.send_json(503, {"error": "Server busy"}, headers={"Retry-After": "1"})
+            return
+
+        try:
+            metrics = StreamMetrics()
+            try:
+                response = service.query(
+                    body["query"],
+                    body.get("top_k"),
+                    body.get("chat_mode"),
+                    body.get("retrieval_mode"),
+                )
+            except Exception as err:
+                logs.log.error(f"Query failed: {err}")
+                self.send_json(502, {"error": f"Query failed: {err}"})
+                return
+
+            if body.get("stream", True):
+                self.stream_response(response, metrics)
+            else:
+                try:
+                    answer = "".join(metrics.track(response.response_gen))
+                except Exception as err:
+                    logs.log.error(f"Generation failed: {err}")
+                    self.send_json(502, {"error": f"Generation failed: {err}"})
+                    return
+                self.send_json(
+                    200,
+                    {
+                        "answer": answer,
+                        "sources": [source_summary(node) for node in response.source_nodes],
+                        "metrics": metrics.as_dict(),
+                    },
+                )
+            metrics.log()
+        finally:
+            service.slots.release()
+
+    def stream_response(self, response, metrics: StreamMetrics):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        tokens = response.response_gen
+        try:
+            try:
+                for token in metrics.track(tokens):
+                    # Ollama ends the stream with an empty chunk; there is nothing to send for it
+                    if token:
+                        self.write_event("token", {"text": token})
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except Exception as err:
+                logs.log.error(f"Generation failed: {err}")
+                self.write_event("error", {"error": f"Generation failed: {err}"})
+            else:
+                self.write_event(
+                    "done",
+                    {
+                        "sources": [source_summary(node) for node in response.source_nodes],
+                        "metrics": metrics.as_dict(),
+                    },
+                )
+            self.write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; stop generating so the Ollama request is released
+            logs.log.info("Client disconnected; generation cancelled")
+            self.close_connection = True
+        finally:
+            if hasattr(tokens, "close"):
+                tokens.close()
+
+
+class QueryServer(ThreadingHTTPServer):
+    """
+    A threaded HTTP server around a `QueryService`: each connection is served on its own thread, so a slow
+    generation never blocks other clients.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, service: QueryService):
+        super().__init__(address, QueryRequestHandler)
+        self.service = service
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve questions over a persisted index through an HTTP API, without the Streamlit app."
+    )
+    parser.add_argument("--persist-dir", default="./vectordb")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ollama-endpoint", default="http://localhost:11434")
+    parser.add_argument("--model", required=True, help="The Ollama chat model")
+    parser.add_argument("--embedding-model", default=llama_index.EMBEDDING_MODELS[None])
+    parser.add_argument("--no-embedding-cache", action="store_true")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--chat-mode", choices=CHAT_MODES, default="compact")
+    parser.add_argument("--retrieval-mode", choices=tuple(llama_index.RETRIEVAL_MODES), default="dense")
+    parser.add_argument("--rerank-model", help="Rerank retrieved chunks with this cross-encoder")
+    parser.add_argument("--rerank-candidates", type=int, default=20)
+    parser.add_argument("--rerank-budget-ms", type=float, default=1000.0)
+    parser.add_argument("--search-index", choices=("exact", "ivf"), default="exact")
+    parser.add_argument("--ivf-nlist", type=int, default=0)
+    parser.add_argument("--ivf-probe-percent", type=float, default=DEFAULT_PROBE_FRACTION * 100)
+    parser.add_argument(
+        "--vector-precision", choices=("float32", "float16", "int8"), default="float32"
+    )
+    parser.add_argument("--no-rescore", action="store_true")
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--queue-timeout", type=float, default=30.0)
+    parser.add_argument("--keep-alive", default="30m")
+    parser.add_argument("--translation-backend", choices=TRANSLATION_BACKENDS, default="none")
+    parser.add_argument("--translation-target", default="ja")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    service = load_query_service(
+        args.persist_dir,
+        args.embedding_model,
+        args.model,
+        args.ollama_endpoint,
+        use_cache=not args.no_embedding_cache,
+        search_index=args.search_index,
+        ivf_nlist=args.ivf_nlist,
+        ivf_probe_percent=args.ivf_probe_percent,
+        vector_precision=args.vector_precision,
+        rescore=not args.no_rescore,
+        max_connections=args.max_concurrency,
+        keep_alive=ollama.parse_keep_alive(args.keep_alive),
+        translation_backend=args.translation_backend,
+        translation_target=args.translation_target,
+        top_k=args.top_k,
+        chat_mode=args.chat_mode,
+        retrieval_mode=args.retrieval_mode,
+        rerank_model=args.rerank_model,
+        rerank_candidates=args.rerank_candidates,
+        rerank_budget_ms=args.rerank_budget_ms,
+        max_concurrency=args.max_concurrency,
+        queue_timeout=args.queue_timeout,
+    )
+    server = QueryServer((args.host, args.port), service)
+    logs.log.info(
+        f"Serving '{args.persist_dir}' ({len(service.index.vector_store):,} vectors) on "
+        f"http://{args.host}:{args.port} after {time.perf_counter() - start:.1f}s"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
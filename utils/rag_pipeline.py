@@ -6,18 +6,23 @@ import inspect
 import streamlit as st
 
 import utils.helpers as func
+import utils.git_repo as git_repo
 import utils.ollama as ollama
 import utils.llama_index as llama_index
 import utils.logs as logs
 
+from utils.manifest import IngestionManifest
 
-def rag_pipeline(uploaded_files: list = None):
+
+def rag_pipeline(uploaded_files: list = None, github_repo: str = None):
     """
     RAG pipeline for Llama-based chatbots.
 
     Parameters:
         - uploaded_files (list, optional): List of files to be processed.
             If none are provided, the function will load files from the current working directory.
+        - github_repo (str, optional): A repository (`owner/name` on GitHub.com, or a git URL) to sync and index.
+            Only the files changed since the repository was last indexed are processed.
 
     Yields:
         - str: Successive chunks of conversation from the Ollama model with context.
@@ -38,11 +43,26 @@ def rag_pipeline(uploaded_files: list = None):
     """
     error = None
 
+    # Streamlit re-runs this pipeline on every interaction while files remain in the uploader
+    uploads_key = None
+    if uploaded_files:
+        uploads_key = {
+            "files": [(f.name, f.size) for f in uploaded_files],
+            "settings": [
+                st.session_state[key]
+                for key in ("embedding_model", "other_embedding_model", "chunk_size", "chunk_overlap")
+            ],
+        }
+    already_ingested = (
+        uploads_key is not None
+        and st.session_state.get("ingested_uploads") == uploads_key
+    )
+
     #################################
     # (OPTIONAL) Save Files to Disk #
     #################################
 
-    if uploaded_files is not None:
+    if uploaded_files is not None and not already_ingested:
         for uploaded_file in uploaded_files:
             with st.spinner(f"Processing {uploaded_file.name}..."):
                 save_dir = os.getcwd() + "/data"
@@ -76,27 +96,16 @@ def rag_pipeline(uploaded_files: list = None):
     # Determine embedding model to use #
     ####################################
 
-    embedding_model = st.session_state["embedding_model"]
-    hf_embedding_model = None
-
-    if embedding_model == None:
-        hf_embedding_model = "BAAI/bge-large-en-v1.5"
-
-    if embedding_model == "Default (bge-large-en-v1.5)":
-        hf_embedding_model = "BAAI/bge-large-en-v1.5"
-
-    if embedding_model == "Large (Salesforce/SFR-Embedding-Mistral)":
-        hf_embedding_model = "Salesforce/SFR-Embedding-Mistral"
-
-    if embedding_model == "paraphrase-multilingual-MiniLM-L12-v2":
-        hf_embedding_model = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-    
-    if embedding_model == "Other":
-        hf_embedding_model = st.session_state["other_embedding_model"]
+    hf_embedding_model = llama_index.resolve_embedding_model(
+        st.session_state["embedding_model"],
+        st.session_state["other_embedding_model"],
+    )
 
     try:
         llama_index.setup_embedding_model(
             hf_embedding_model,
+            use_cache=st.session_state["embedding_cache"],
+            cache_size=int(st.session_state["embedding_cache_size"]),
         )
         st.caption("✔️ Embedding Model Created")
     except Exception as err:
@@ -105,38 +114,97 @@ def rag_pipeline(uploaded_files: list = None):
         st.exception(error)
         st.stop()
 
+    #################################
+    # Load persisted index manifest #
+    #################################
+
+    manifest = None
+
+    # Without new documents, the shared index is used as it is
+    if (uploaded_files and not already_ingested) or github_repo:
+        manifest = IngestionManifest.load(
+            st.session_state.get("vectordb_path", "./vectordb")
+        )
+        index_settings = {
+            "embed_model": hf_embedding_model,
+            "chunk_size": int(st.session_state["chunk_size"]),
+            "chunk_overlap": int(st.session_state["chunk_overlap"]),
+        }
+        if not manifest.is_compatible(index_settings):
+            logs.log.warning(
+                "Embedding or chunk settings changed; the index will be rebuilt"
+            )
+            manifest.reset(index_settings)
+        elif manifest.settings is None:
+            manifest.settings = index_settings
+
     #######################################
     # Load files from the data/ directory #
     #######################################
 
-    # if documents already exists in state
-    if uploaded_files:
-        if (
-            st.session_state["documents"] is not None
-            and len(st.session_state["documents"]) > 0
-        ):
-            logs.log.info("Documents are already available; skipping document loading")
+    documents = st.session_state["documents"]
+    repo_sync = None
+
+    if github_repo:
+        try:
+            repo_sync = git_repo.sync_repo(github_repo)
+            st.caption(f"✔️ Synced {repo_sync.repo} at {repo_sync.commit[:7]}")
+        except Exception as err:
+            logs.log.error(f"Failed to sync GitHub repo {github_repo}: {str(err)}")
+            error = err
+            st.exception(error)
+            st.stop()
+
+        documents = git_repo.iter_repo_documents(
+            repo_sync,
+            manifest,
+            {"files": 0, "skipped": 0, "failed": 0, "bytes": 0},
+            include=st.session_state["github_include"].split(),
+            exclude=st.session_state["github_exclude"].split(),
+            max_file_kb=int(st.session_state["github_max_file_kb"]),
+            workers=int(st.session_state["parse_workers"]),
+            timeout=int(st.session_state["parse_timeout"]),
+        )
+    elif uploaded_files:
+        if already_ingested:
+            logs.log.info("Uploaded files were already ingested; skipping document loading")
             st.caption("✔️ Processed File Data")
+            documents = []
         else:
-            try:
-                save_dir = os.getcwd() + "/data"
-                documents = llama_index.load_documents(save_dir)
-                st.session_state["documents"] = documents
-                st.caption("✔️ Data Processed")
-            except Exception as err:
-                logs.log.error(f"Document Load Error: {str(err)}")
-                error = err
-                st.exception(error)
-                st.stop()
+            # Documents are parsed lazily and streamed straight into the index
+            save_dir = os.getcwd() + "/data"
+            documents = llama_index.iter_documents(
+                save_dir,
+                manifest,
+                workers=int(st.session_state["parse_workers"]),
+                timeout=int(st.session_state["parse_timeout"]),
+            )
 
     ###########################################
     # Create an index from ingested documents #
     ###########################################
 
+    progress_caption = st.empty()
+
+    def report_progress(stats: dict):
+        progress_caption.caption(
+            f"⏳ {stats['sources']:,} source(s) parsed · {stats['nodes']:,} chunk(s) · "
+            f"{stats['duplicates']:,} duplicate(s) dropped · {stats['embedded']:,} embedded"
+        )
+
     try:
         llama_index.create_query_engine(
-            st.session_state["documents"],
+            documents,
+            manifest,
+            progress=report_progress,
         )
+        progress_caption.empty()
+        if uploaded_files and not already_ingested:
+            st.caption("✔️ Data Processed")
+            st.session_state["ingested_uploads"] = uploads_key
+        if repo_sync is not None:
+            git_repo.mark_indexed(repo_sync)
+            st.caption("✔️ Repo Processed")
         st.caption("✔️ Created File Index")
     except Exception as err:
         logs.log.error(f"Index Creation Error: {str(err)}")
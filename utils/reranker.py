@@ -0,0 +1,169 @@
+import time
+
+from typing import List, Optional
+
+import numpy as np
+import streamlit as st
+
+import utils.logs as logs
+
+from utils.query_cache import LRUCache
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+# Multilingual (including Japanese), and small enough to score a few dozen chunks per second on a CPU
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+RERANK_BATCH_SIZE = 16
+RERANK_CACHE_SIZE = 10_000
+
+# Shared by every session, so candidates already scored for a question are not scored again
+rerank_scores = LRUCache(RERANK_CACHE_SIZE)
+
+# Measured seconds per (query, chunk) pair of each model, used to plan batches within the latency budget
+_pair_seconds = {}
+
+###################################
+#
+# Load Cross-Encoder
+#
+###################################
+
+
+@st.cache_resource(show_spinner=False)
+def load_rerank_model(model: str):
+    """
+    Loads a cross-encoder with the sentence-transformers library, on the CPU.
+
+    Args:
+        model (str): The Hugging Face name of the cross-encoder.
+
+    Returns:
+        Callable[[List[Tuple[str, str]]], np.ndarray]: Scores `(query, text)` pairs; higher is more relevant.
+
+    Notes:
+        The reranker always runs on the CPU, so it never competes with Ollama for GPU memory.
+    """
+    # Imported here so that torch is only loaded once reranking is enabled
+    from sentence_transformers import CrossEncoder
+
+    start = time.perf_counter()
+    cross_encoder = CrossEncoder(model, device="cpu", max_length=512)
+    logs.log.info(f"Loaded rerank model '{model}' in {time.perf_counter() - start:.1f}s")
+
+    def score(pairs):
+        return np.asarray(
+            cross_encoder.predict(pairs, batch_size=len(pairs), show_progress_bar=False),
+            dtype=np.float32,
+        )
+
+    return score
+
+
+def create_reranker(model: str, top_n: int, budget_ms: float, batch_size: int = RERANK_BATCH_SIZE):
+    """
+    Creates a `CrossEncoderReranker` for `model`, loading the model on first use.
+    """
+    return CrossEncoderReranker(
+        load_rerank_model(model),
+        model,
+        top_n=top_n,
+        budget_ms=budget_ms,
+        batch_size=batch_size,
+    )
+
+
+###################################
+#
+# Cross-Encoder Reranker
+#
+###################################
+
+
+class CrossEncoderReranker(BaseNodePostprocessor):
+    """
+    Rescores retrieved chunks with a cross-encoder and keeps the best `top_n`.
+
+    A cross-encoder reads the question and a chunk together, so it ranks far more precisely than the similarity of
+    their embeddings, but it must run once per candidate. Candidates are therefore scored in batches of
+    `batch_size`, in their retrieval order, until the `budget_ms` latency budget is spent: a batch is only started
+    if the measured time per pair says it will finish in time (the first batch always runs). Candidates left
+    unscored are ranked after the scored ones, in their retrieval order. Scores are cached by model, question and
+    chunk content, so repeated questions are reranked without running the model.
+    """
+
+    model_name: str = Field(description="The cross-encoder model.")
+    top_n: int = Field(default=3, description="Number of chunks passed on to the LLM.")
+    budget_ms: float = Field(default=1000.0, description="Latency budget of one rerank, in milliseconds.")
+    batch_size: int = Field(default=RERANK_BATCH_SIZE, description="Number of pairs scored at a time.")
+
+    _score = PrivateAttr()
+
+    def __init__(self, score, model_name: str, **kwargs):
+        super().__init__(model_name=model_name, **kwargs)
+        self._score = score
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CrossEncoderReranker"
+
+    def _score_batch(self, query: str, nodes: List[NodeWithScore]):
+        start = time.perf_counter()
+        scores = self._score([(query, node.node.get_content()) for node in nodes])
+        seconds = (time.perf_counter() - start) / len(nodes)
+        previous = _pair_seconds.get(self.model_name)
+        _pair_seconds[self.model_name] = seconds if previous is None else 0.7 * previous + 0.3 * seconds
+        return scores
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if query_bundle is None or not nodes:
+            return nodes[: self.top_n]
+
+        start = time.perf_counter()
+        deadline = start + self.budget_ms / 1000
+        query = query_bundle.query_str
+
+        keys = [(self.model_name, query, node.node.hash) for node in nodes]
+        scores = [rerank_scores.get(key) for key in keys]
+        pending = [i for i, score in enumerate(scores) if score is None]
+        cached = len(nodes) - len(pending)
+
+        position = 0
+        while position < len(pending):
+            batch = pending[position : position + self.batch_size]
+            if position > 0:
+                remaining = deadline - time.perf_counter()
+                fit = int(remaining / max(_pair_seconds.get(self.model_name, 0.0), 1e-6))
+                if fit <= 0:
+                    break
+                batch = batch[:fit]
+            for i, score in zip(batch, self._score_batch(query, [nodes[i] for i in batch])):
+                scores[i] = float(score)
+                rerank_scores.put(keys[i], scores[i])
+            position += len(batch)
+
+        if position < len(pending):
+            logs.log.warning(
+                f"Rerank budget of {self.budget_ms:.0f} ms spent; "
+                f"{len(pending) - position} of {len(nodes)} candidates keep their retrieval rank"
+            )
+
+        scored = sorted(
+            (i for i, score in enumerate(scores) if score is not None),
+            key=lambda i: -scores[i],
+        )
+        unscored = [i for i, score in enumerate(scores) if score is None]
+        logs.log.info(
+            f"Reranked {len(scored)} of {len(nodes)} candidates ({cached} cached) "
+            f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+
+        return [
+            NodeWithScore(node=nodes[i].node, score=scores[i] if scores[i] is not None else nodes[i].score)
+            for i in (scored + unscored)[: self.top_n]
+        ]
@@ -0,0 +1,81 @@
+import time
+
+import utils.logs as logs
+
+
+###################################
+#
+# Streaming Response Metrics
+#
+###################################
+
+
+class StreamMetrics:
+    """
+    Measures the latency of a streamed response as it is consumed.
+
+    `start` is the moment the user submitted the message, so time-to-first-token includes translation, retrieval and
+    prompt processing, i.e. the wait the user actually perceives. Each chunk streamed by Ollama is one token.
+    """
+
+    def __init__(self, start: float = None):
+        self.start = start if start is not None else time.perf_counter()
+        self.first_token = None
+        self.end = None
+        self.tokens = 0
+
+    def track(self, stream):
+        """
+        Passes a token stream through, recording when the first and last tokens arrive.
+
+        Args:
+            stream (Iterable[str]): The token stream.
+
+        Yields:
+            str: The tokens of `stream`.
+        """
+        for token in stream:
+            if not token:
+                # Ollama closes the stream with an empty chunk, which is not a token
+                yield token
+                continue
+            if self.first_token is None:
+                self.first_token = time.perf_counter()
+            self.tokens += 1
+            yield token
+        self.end = time.perf_counter()
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token is None:
+            return None
+        return self.first_token - self.start
+
+    @property
+    def tokens_per_second(self):
+        if self.first_token is None or self.end is None or self.end <= self.first_token:
+            return None
+        # The first token marks the start of generation, so it is not counted
+        return (self.tokens - 1) / (self.end - self.first_token)
+
+    def as_dict(self):
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "tokens": self.tokens,
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+    def summary(self):
+        """
+        Returns a one-line, human readable summary, e.g. `0.84s to first token · 212 tokens · 38.5 tokens/s`.
+        """
+        parts = []
+        if self.time_to_first_token is not None:
+            parts.append(f"{self.time_to_first_token:.2f}s to first token")
+        parts.append(f"{self.tokens:,} tokens")
+        if self.tokens_per_second is not None:
+            parts.append(f"{self.tokens_per_second:.1f} tokens/s")
+        return " · ".join(parts)
+
+    def log(self):
+        logs.log.info(f"Response streamed: {self.summary()}")
@@ -0,0 +1,158 @@
+import re
+import math
+
+from typing import Callable, List, Optional
+
+import utils.logs as logs
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.node_parser.interface import MetadataAwareTextSplitter
+from llama_index.core.utils import get_tokenizer
+
+DEFAULT_CHUNK_SIZE = 1024
+DEFAULT_CHUNK_OVERLAP = 200
+MIN_CHUNK_TOKENS = 50
+
+# The end of a sentence: Japanese and Chinese full stops need no following space, a Latin full stop does.
+# Closing brackets and quotes stay with their sentence, and line breaks also end a unit (lists, headings, tables).
+# A full stop or semicolon only ends a sentence before a capital letter or CJK character, and not after a common
+# abbreviation, so that "e.g. this" and "Dr. Smith" stay in one sentence.
+_NOT_ABBREVIATION = r"(?<!\be\.g\.)(?<!\bi\.e\.)(?<!\bvs\.)(?<!\bcf\.)(?<!\bMr\.)(?<!\bMrs\.)(?<!\bMs\.)(?<!\bDr\.)(?<!\bSt\.)"
+_SENTENCE_START = r"[\"'“‘(\[]?[A-ZÀ-ÖØ-ÞΑ-ΩА-Я\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]"
+_SENTENCE_END = re.compile(
+    rf"(?:[。！？!?．]+[」』）】〕)\]\"'”’]*|[.;]{_NOT_ABBREVIATION}(?=\s+{_SENTENCE_START})|\n)\s*"
+)
+# Where an overly long sentence can be cut: after a comma or colon, or at whitespace
+_CLAUSE_END = re.compile(r"[、，,；:：]\s*|\s+")
+# Spaces between units are tokenized with the word after them (" word" is one token), so they are counted with the
+# next unit rather than the previous one. Line breaks are tokens of their own and stay with their unit.
+_SPACES = " \t\u00a0\u3000"
+
+###################################
+#
+# Language-Aware Text Splitter
+#
+###################################
+
+
+class LanguageAwareSplitter(MetadataAwareTextSplitter):
+    """
+    Splits text into chunks of at most `chunk_size` tokens at sentence boundaries, including Japanese ones.
+
+    The text is cut into sentences in a single regex pass and each sentence is tokenized exactly once, counting the
+    spaces before it rather than after it, so that the counts of a chunk's sentences add up to the count of the chunk
+    (give or take a token where words are cut). Sentences are then packed greedily into chunks, and a new chunk starts
+    with the last sentences of the previous one, up to `chunk_overlap` tokens. Only a sentence longer than a whole chunk is cut further, at commas or whitespace, and as
+    a last resort into equal parts. Chunks are exact slices of the source text.
+
+    Token counts use the same tokenizer as llama_index's default `SentenceSplitter`, so `chunk_size` and
+    `chunk_overlap` keep their meaning for existing indexes.
+    """
+
+    chunk_size: int = Field(default=DEFAULT_CHUNK_SIZE, gt=0, description="Maximum tokens per chunk.")
+    chunk_overlap: int = Field(
+        default=DEFAULT_CHUNK_OVERLAP, ge=0, description="Tokens repeated from the end of the previous chunk."
+    )
+
+    _tokenizer: Callable = PrivateAttr()
+
+    def __init__(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+        tokenizer: Optional[Callable] = None,
+        **kwargs,
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(
+                f"Chunk overlap ({chunk_overlap}) must be smaller than the chunk size ({chunk_size})"
+            )
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs)
+        self._tokenizer = tokenizer or get_tokenizer()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LanguageAwareSplitter"
+
+    def split_text_metadata_aware(self, text: str, metadata_str: str) -> List[str]:
+        # The metadata is embedded with every chunk, so it counts towards the chunk size
+        chunk_size = self.chunk_size - len(self._tokenizer(metadata_str))
+        floor = min(MIN_CHUNK_TOKENS, self.chunk_size)
+        if chunk_size < floor:
+            logs.log.warning(
+                f"Metadata leaves less than {floor} of {self.chunk_size} tokens per chunk; using {floor}"
+            )
+            chunk_size = floor
+        return self._split_text(text, chunk_size)
+
+    def split_text(self, text: str) -> List[str]:
+        return self._split_text(text, self.chunk_size)
+
+    def _units(self, text: str, chunk_size: int):
+        """
+        Yields `(start, end, tokens)` for each sentence of `text`, cutting sentences longer than `chunk_size`.
+        """
+        start = 0
+        for match in _SENTENCE_END.finditer(text):
+            if match.end() > start:
+                yield from self._measure(text, start, match.end(), chunk_size)
+                start = match.end()
+        if start < len(text):
+            yield from self._measure(text, start, len(text), chunk_size)
+
+    def _count(self, text: str, start: int, end: int):
+        """
+        Counts the tokens of `text[start:end]` as they add up in a chunk: with the spaces before it, without the ones
+        after it. Counting the spaces at the end of every unit would count them twice and halve the chunks.
+        """
+        while start > 0 and text[start - 1] in _SPACES:
+            start -= 1
+        return len(self._tokenizer(text[start:end].rstrip(_SPACES)))
+
+    def _measure(self, text: str, start: int, end: int, chunk_size: int):
+        tokens = self._count(text, start, end)
+        if tokens <= chunk_size:
+            yield start, end, tokens
+            return
+
+        # Cut at clause boundaries first; pieces that are still too long are cut into equal parts
+        cuts = [match.end() for match in _CLAUSE_END.finditer(text, start, end) if start < match.end() < end]
+        for piece_start, piece_end in zip([start] + cuts, cuts + [end]):
+            piece_tokens = self._count(text, piece_start, piece_end)
+            if piece_tokens <= chunk_size:
+                yield piece_start, piece_end, piece_tokens
+                continue
+            parts = math.ceil(piece_tokens / chunk_size)
+            bounds = [piece_start + (piece_end - piece_start) * i // parts for i in range(parts + 1)]
+            for part_start, part_end in zip(bounds, bounds[1:]):
+                yield part_start, part_end, math.ceil(piece_tokens / parts)
+
+    def _split_text(self, text: str, chunk_size: int) -> List[str]:
+        overlap = min(self.chunk_overlap, chunk_size // 2)
+        chunks = []
+        current = []
+        current_tokens = 0
+
+        def emit():
+            chunk = text[current[0][0] : current[-1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+
+        for unit in self._units(text, chunk_size):
+            if current and current_tokens + unit[2] > chunk_size:
+                emit()
+                # Start the next chunk with the last sentences of this one, as long as they fit the overlap
+                kept, kept_tokens = 0, 0
+                for _, _, tokens in reversed(current):
+                    if kept_tokens + tokens > overlap or kept_tokens + tokens + unit[2] > chunk_size:
+                        break
+                    kept += 1
+                    kept_tokens += tokens
+                current = current[len(current) - kept :]
+                current_tokens = kept_tokens
+            current.append(unit)
+            current_tokens += unit[2]
+
+        if current:
+            emit()
+        return chunks
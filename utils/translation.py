@@ -0,0 +1,266 @@
+import unicodedata
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import streamlit as st
+
+import utils.logs as logs
+
+from utils.query_cache import LRUCache
+
+TRANSLATION_BACKENDS = ("google", "ollama", "none")
+
+# Traditional forms of common Chinese words that modern Japanese writes differently (e.g. 対, 従, 譲, 没), but which
+# Shift_JIS can still encode
+_TRADITIONAL_CHINESE = set("們對從讓沒麼嗎誰")
+
+# Translations that exceed their timeout keep running in the background, so they get their own small pool
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="translation")
+
+
+###################################
+#
+# Language Detection
+#
+###################################
+
+
+def is_chinese_only(char: str):
+    """
+    Checks whether a Han character is written in Chinese but not in Japanese.
+
+    Characters that Shift_JIS cannot encode (e.g. simplified forms like 们, 这, 产) are not used in Japanese text.
+    """
+    if char in _TRADITIONAL_CHINESE:
+        return True
+    try:
+        char.encode("cp932")
+    except UnicodeEncodeError:
+        return True
+    return False
+
+
+def script_languages(text: str):
+    """
+    Narrows down the language of a text from the Unicode scripts of its letters, without any model or network access.
+
+    Any kana makes a text Japanese; otherwise the dominant script decides. Hangul is only used for Korean. Japanese
+    can be written in kanji alone, so text dominated by Han characters is only taken as Chinese if it contains
+    characters that Japanese does not use, and may otherwise be either. Latin and Cyrillic letters are shared by too
+    many languages (English, French, Vietnamese, ...; Russian, Ukrainian, ...) to tell them apart.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        Optional[Set[str]]: The ISO 639-1 codes of the languages the text may be in, an empty set if it contains no
+        letters, or None if its script does not narrow the language down.
+    """
+    counts = {}
+    chinese = False
+    for char in text:
+        if not char.isalpha():
+            continue
+        name = unicodedata.name(char, "")
+        if name.startswith(("HIRAGANA", "KATAKANA", "HALFWIDTH KATAKANA")):
+            return {"ja"}
+        for script in ("CJK", "HANGUL", "CYRILLIC", "LATIN"):
+            if name.startswith(script):
+                counts[script] = counts.get(script, 0) + 1
+                break
+        else:
+            counts[None] = counts.get(None, 0) + 1
+        if not chinese and name.startswith("CJK"):
+            chinese = is_chinese_only(char)
+
+    if not counts:
+        return set()
+    script = max(counts, key=counts.get)
+    if script == "CJK":
+        return {"zh"} if chinese else {"ja", "zh"}
+    if script == "HANGUL":
+        return {"ko"}
+    return None
+
+
+def script_language(text: str):
+    """
+    Returns the language of a text if its script identifies it unambiguously (see `script_languages`), else None.
+    """
+    languages = script_languages(text)
+    return next(iter(languages)) if languages and len(languages) == 1 else None
+
+
+###################################
+#
+# Translation Backends
+#
+###################################
+
+
+class NoopBackend:
+    """
+    Leaves prompts untranslated.
+    """
+
+    name = "none"
+
+    def translate(self, text: str, target: str):
+        return text
+
+
+class GoogleBackend:
+    """
+    Translates with Google Translate through `deep-translator` (requires network access).
+    """
+
+    name = "google"
+
+    def translate(self, text: str, target: str):
+        from deep_translator import GoogleTranslator
+
+        return GoogleTranslator(source="auto", target=target).translate(text)
+
+
+class OllamaBackend:
+    """
+    Translates with the local Ollama model, for deployments without internet access.
+    """
+
+    name = "ollama"
+
+    def __init__(self, model: str, host: str):
+        self.model = model
+        self.host = host
+
+    def translate(self, text: str, target: str):
+        import utils.ollama as ollama
+
+        client = ollama.create_client(self.host)
+        response = client.generate(
+            model=self.model,
+            prompt=(
+                f"Translate the following text to the language with ISO 639-1 code '{target}'. "
+                f"Reply with the translation only.\n\n{text}"
+            ),
+            options={"temperature": 0},
+        )
+        return response["response"].strip()
+
+
+def create_backend(name: str, model: str = None, host: str = None):
+    """
+    Creates a translation backend by name.
+
+    Args:
+        name (str): One of `TRANSLATION_BACKENDS`.
+        model (str, optional): The Ollama model used by the `ollama` backend.
+        host (str, optional): The Ollama endpoint used by the `ollama` backend.
+
+    Returns:
+        A backend object with a `translate(text, target)` method.
+    """
+    if name == "google":
+        return GoogleBackend()
+    if name == "ollama":
+        return OllamaBackend(model, host)
+    if name == "none":
+        return NoopBackend()
+    raise ValueError(f"Unknown translation backend: {name}")
+
+
+###################################
+#
+# Translation Stage
+#
+###################################
+
+
+class TranslationStage:
+    """
+    Translates prompts into the language of the indexed documents before retrieval.
+
+    Prompts that are already in the target language are passed through without calling the backend. Translations are
+    kept in an LRU cache, and a backend that fails or does not answer within `timeout` seconds falls back to the
+    original prompt, so translation can never block or break a chat message.
+
+    Any object with a `translate(text, target)` method can be used as backend, e.g. a local stand-in in tests.
+    """
+
+    def __init__(self, backend, target: str = "ja", timeout: float = 3.0, cache_size: int = 512):
+        self.backend = backend
+        self.target = target
+        self.timeout = timeout
+        self.cache = LRUCache(cache_size)
+
+    def translate(self, text: str):
+        """
+        Translates a prompt into the target language.
+
+        Args:
+            text (str): The prompt.
+
+        Returns:
+            str: The translated prompt, or `text` itself if it needs no translation or translation failed.
+        """
+        # Text is left as it is when it has no letters or its script says it may already be in the target language
+        # (e.g. kanji-only text for a Japanese target). Latin or Cyrillic text may be in any language, so the backend
+        # gets to decide.
+        languages = script_languages(text)
+        if languages is not None and (not languages or self.target in languages):
+            return text
+
+        key = (getattr(self.backend, "name", type(self.backend).__name__), self.target, text)
+        translated = self.cache.get(key)
+        if translated is not None:
+            return translated
+
+        future = _executor.submit(self.backend.translate, text, self.target)
+        try:
+            translated = future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            logs.log.warning(
+                f"Translation timed out after {self.timeout}s; using the original prompt"
+            )
+            return text
+        except Exception as err:
+            logs.log.warning(f"Translation failed, using the original prompt: {err}")
+            return text
+
+        if not translated:
+            return text
+
+        self.cache.put(key, translated)
+        return translated
+
+
+@st.cache_resource(show_spinner=False)
+def load_translation_stage(
+    backend: str, target: str, timeout: float, model: str = None, host: str = None
+):
+    """
+    Creates the translation stage shared by all sessions using the same settings.
+    """
+    logs.log.info(f"Prompt translation to '{target}' using the '{backend}' backend")
+    return TranslationStage(create_backend(backend, model, host), target, timeout)
+
+
+def translate_prompt(prompt: str):
+    """
+    Translates a chat prompt using the translation settings of the current session.
+    """
+    backend = st.session_state["translation_backend"]
+    model = host = None
+    if backend == "ollama":
+        model = st.session_state["selected_model"]
+        host = st.session_state["ollama_endpoint"]
+
+    stage = load_translation_stage(
+        backend,
+        st.session_state["translation_target"],
+        float(st.session_state["translation_timeout"]),
+        model=model,
+        host=host,
+    )
+    return stage.translate(prompt)
@@ -0,0 +1,922 @@
+import os
+import json
+import argparse
+import uuid
+import itertools
+import threading
+
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+import utils.logs as logs
+
+from utils.ann import IVFIndex
+from utils.keyword_index import KeywordIndex
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import (
+    build_metadata_filter_fn,
+    node_to_metadata_dict,
+)
+
+NAMESPACE_SEP = "__"
+DEFAULT_VECTOR_STORE = "default"
+VECTORS_FNAME = "vectors.npy"
+VECTOR_IDS_FNAME = "vector_ids.json"
+IVF_FNAME = "ivf.npz"
+QUANTIZED_FNAMES = {"float16": "vectors_float16.npy", "int8": "vectors_int8.npy"}
+SCALES_FNAME = "vector_scales.npy"
+KEYWORDS_FNAME = "keywords.npz"
+RESCORE_OVERSAMPLE = 4
+SCORE_BLOCK_ROWS = 256
+HYBRID_OVERSAMPLE = 4
+RRF_K = 60
+QUERY_MODES = (
+    VectorStoreQueryMode.DEFAULT,
+    VectorStoreQueryMode.SPARSE,
+    VectorStoreQueryMode.HYBRID,
+)
+
+# Added to the stored metadata of every node by `node_to_metadata_dict`
+_RESERVED_METADATA_KEYS = {"_node_type", "document_id", "doc_id", "ref_doc_id"}
+
+# Shared by all stores so that a rebuilt store never reuses the version of the store it replaces
+_versions = itertools.count(1)
+LEGACY_FNAME = "vector_store.json"
+
+
+def _namespaced_path(persist_dir: str, namespace: str, fname: str):
+    return os.path.join(persist_dir, f"{namespace}{NAMESPACE_SEP}{fname}")
+
+
+def _write_atomic(path: str, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+###################################
+#
+# Vectorized Similarity Helpers
+#
+###################################
+
+
+def normalize_rows(matrix: np.ndarray):
+    """
+    Scales each row to unit length so that cosine similarity becomes a plain dot product.
+
+    Args:
+        matrix (np.ndarray): An `(n, dim)` matrix, or a single `(dim,)` vector.
+
+    Returns:
+        np.ndarray: A float32 copy with unit-length rows. All-zero rows are left as zeros.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def top_k(similarities: np.ndarray, k: int):
+    """
+    Returns the indices of the `k` highest similarities, best first.
+
+    Uses `np.argpartition` to select the candidates in linear time, then only sorts those `k` entries.
+
+    Args:
+        similarities (np.ndarray): A 1-D array of scores.
+        k (int): Number of results.
+
+    Returns:
+        np.ndarray: Indices into `similarities`.
+    """
+    if k >= len(similarities):
+        return np.argsort(-similarities)
+
+    candidates = np.argpartition(-similarities, k - 1)[:k]
+    return candidates[np.argsort(-similarities[candidates])]
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int, rrf_k: int = RRF_K):
+    """
+    Merges several rankings of rows with Reciprocal Rank Fusion.
+
+    Each row scores `1 / (rrf_k + rank)` in every ranking it appears in, so the fusion only depends on ranks and
+    needs no calibration between e.g. cosine similarities and BM25 scores.
+
+    Args:
+        rankings (List[np.ndarray]): Arrays of rows, best first.
+        k (int): Number of results.
+        rrf_k (int, optional): Damps the weight of the first ranks. Defaults to 60.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The best rows and their fused scores, best first.
+    """
+    rows = np.concatenate([np.asarray(ranking, dtype=np.int64) for ranking in rankings])
+    contributions = np.concatenate(
+        [1.0 / (rrf_k + np.arange(1, len(ranking) + 1)) for ranking in rankings]
+    )
+    unique_rows, inverse = np.unique(rows, return_inverse=True)
+    scores = np.bincount(inverse, weights=contributions, minlength=len(unique_rows))
+    top = top_k(scores, k)
+    return unique_rows[top], scores[top].astype(np.float32)
+
+
+###################################
+#
+# Scalar Quantization
+#
+###################################
+
+
+def quantize(matrix: np.ndarray, precision: str):
+    """
+    Converts unit-normalized float32 rows to a compact representation.
+
+    Args:
+        matrix (np.ndarray): An `(n, dim)` float32 matrix; may be memory-mapped.
+        precision (str): `"float16"`, or `"int8"` for symmetric scalar quantization with one scale per row.
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray]]: The quantized matrix and, for int8, the float32 scale of each row.
+    """
+    if precision == "float16":
+        return np.asarray(matrix, dtype=np.float16), None
+
+    if precision != "int8":
+        raise ValueError(f"Unsupported vector precision: {precision}")
+
+    quantized = np.empty(matrix.shape, dtype=np.int8)
+    scales = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+        block = np.asarray(matrix[start : start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        block_scales = np.maximum(np.abs(block).max(axis=1), 1e-12) / 127.0
+        quantized[start : start + len(block)] = np.rint(block / block_scales[:, None])
+        scales[start : start + len(block)] = block_scales
+
+    return quantized, scales
+
+
+def quantized_similarities(
+    matrix: np.ndarray,
+    scales: Optional[np.ndarray],
+    query: np.ndarray,
+    rows: Optional[np.ndarray] = None,
+):
+    """
+    Scores a quantized matrix against a unit-normalized float32 query.
+
+    Rows are widened to float32 one small block at a time into a reused buffer that stays in the CPU cache, so the
+    BLAS matrix-vector product is still used without materializing a float32 copy of the matrix.
+
+    Args:
+        matrix (np.ndarray): The float16 or int8 matrix returned by `quantize()`.
+        scales (np.ndarray, optional): The row scales of an int8 matrix.
+        query (np.ndarray): The query vector.
+        rows (np.ndarray, optional): Only score these rows. Defaults to all rows.
+
+    Returns:
+        np.ndarray: The approximate cosine similarity of each scored row.
+    """
+    if rows is not None:
+        matrix = matrix[rows]
+        scales = scales[rows] if scales is not None else None
+
+    similarities = np.empty(len(matrix), dtype=np.float32)
+    buffer = np.empty((SCORE_BLOCK_ROWS, matrix.shape[1]), dtype=np.float32)
+    for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+        block = matrix[start : start + SCORE_BLOCK_ROWS]
+        widened = buffer[: len(block)]
+        np.copyto(widened, block, casting="unsafe")
+        similarities[start : start + len(block)] = widened @ query
+
+    if scales is not None:
+        similarities *= scales
+
+    return similarities
+
+
+###################################
+#
+# Memory-Mapped Vector Store
+#
+###################################
+
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """
+    A vector store persisted as a contiguous float32 matrix plus a small ID/metadata table.
+
+    Rows are stored pre-normalized to unit length, so a query is answered with a single matrix-vector product
+    followed by an `argpartition` top-k, without any per-node Python work.
+
+    On disk, a store in namespace `default` consists of:
+        - `default__vectors.npy`: an `(n, dim)` float32 matrix in NumPy's `.npy` format
+        - `default__vector_ids.json`: the node ID, ref doc ID and metadata of each row
+
+    Loading memory-maps the matrix instead of parsing it, so opening a large store takes milliseconds and pages are only
+    read from disk when they are scored. Rows added after loading are kept in memory until the next `persist()`;
+    deleted rows are masked out and dropped when the store is persisted.
+
+    Optionally, an `IVFIndex` (`default__ivf.npz`) is built when the store is persisted and used for approximate
+    search when a query passes `nprobe` or `probe_fraction` (see `configure_ann()`).
+
+    Every change to the content or search configuration assigns the store a new `version`, which callers use to
+    invalidate cached retrieval results. Content changes also assign a new `revision`, which is persisted with the
+    store and identifies its content across restarts.
+
+    Exhaustive search can also score a float16 or int8 copy of the matrix (`default__vectors_float16.npy`, or
+    `default__vectors_int8.npy` with `default__vector_scales.npy`), see `configure_precision()`. The float32 matrix
+    is still persisted and only read to rescore the best candidates, so its pages stay out of memory otherwise.
+
+    A store can be queried from several threads at once: changes and the lazy compaction, IVF and quantization
+    steps are serialized by a lock, while scoring runs concurrently.
+
+    The text of every row is also indexed in a BM25 `KeywordIndex` (`default__keywords.npz`), which serves keyword
+    (`VectorStoreQueryMode.SPARSE`) and hybrid (`VectorStoreQueryMode.HYBRID`) queries. Stores persisted before the
+    keyword index existed get one from `build_keywords()`.
+    """
+
+    stores_text: bool = False
+
+    _matrix: Optional[np.ndarray] = PrivateAttr(default=None)
+    _extra: List[np.ndarray] = PrivateAttr(default_factory=list)
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[str] = PrivateAttr(default_factory=list)
+    _metadata: List[dict] = PrivateAttr(default_factory=list)
+    _row_of: dict = PrivateAttr(default_factory=dict)
+    _deleted: set = PrivateAttr(default_factory=set)
+    _ann_kind: str = PrivateAttr(default="exact")
+    _ann_nlist: int = PrivateAttr(default=0)
+    _ann: Optional[IVFIndex] = PrivateAttr(default=None)
+    _precision: str = PrivateAttr(default="float32")
+    _rescore: bool = PrivateAttr(default=True)
+    _quantized: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scales: Optional[np.ndarray] = PrivateAttr(default=None)
+    _keywords: Optional[KeywordIndex] = PrivateAttr(default=None)
+    _version: int = PrivateAttr(default=0)
+    _revision: str = PrivateAttr(default="")
+    _lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
+
+    def __init__(
+        self,
+        matrix: Optional[np.ndarray] = None,
+        ids: Optional[List[str]] = None,
+        ref_doc_ids: Optional[List[str]] = None,
+        metadata: Optional[List[dict]] = None,
+        revision: Optional[str] = None,
+        keywords: Optional[KeywordIndex] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self._matrix = matrix
+        self._extra = []
+        self._ids = list(ids or [])
+        self._ref_doc_ids = list(ref_doc_ids or [])
+        self._metadata = list(metadata or [{} for _ in self._ids])
+        self._row_of = {node_id: row for row, node_id in enumerate(self._ids)}
+        self._deleted = set()
+        self._ann_kind = "exact"
+        self._ann_nlist = 0
+        self._ann = None
+        self._precision = "float32"
+        self._rescore = True
+        self._quantized = None
+        self._scales = None
+        # The keyword index of a store loaded without one is unknown until `build_keywords()`
+        self._keywords = keywords if keywords is not None or self._ids else KeywordIndex()
+        self._version = next(_versions)
+        self._revision = revision or uuid.uuid4().hex
+        self._lock = threading.RLock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    def __len__(self):
+        return len(self._ids) - len(self._deleted)
+
+    @property
+    def version(self):
+        """
+        A process-wide unique number identifying the current content and search configuration of the store.
+        """
+        return self._version
+
+    @property
+    def revision(self):
+        """
+        A random identifier of the current content of the store, persisted with it.
+        """
+        return self._revision
+
+    def _bump_version(self, content_changed: bool = False):
+        self._version = next(_versions)
+        if content_changed:
+            self._revision = uuid.uuid4().hex
+
+    def __bool__(self):
+        # `StorageContext.from_defaults()` tests `if vector_store:`; an empty store must not be replaced by the default
+        return True
+
+    def configure_ann(self, kind: str = "exact", nlist: int = 0):
+        """
+        Selects the search index used for queries that pass `nprobe` or `probe_fraction`.
+
+        Args:
+            kind (str, optional): `"exact"` for exhaustive search, or `"ivf"` for an inverted file index. Defaults to "exact".
+            nlist (int, optional): Number of IVF lists. `0` picks about `4 * sqrt(n)`. Defaults to 0.
+
+        Notes:
+            The IVF index is built when the store is next persisted (i.e. at ingestion time), or on the first query if
+            an existing store is switched to IVF without new documents.
+        """
+        if kind != self._ann_kind or nlist != self._ann_nlist:
+            if self._ann is not None and (kind != "ivf" or (nlist and nlist != self._ann.nlist)):
+                self._ann = None
+            self._ann_kind = kind
+            self._ann_nlist = nlist
+            self._bump_version()
+
+    def configure_precision(self, precision: str = "float32", rescore: bool = True):
+        """
+        Selects the precision of the matrix scored by exhaustive search.
+
+        Args:
+            precision (str, optional): `"float32"`, `"float16"` or `"int8"`. Defaults to "float32".
+            rescore (bool, optional): Re-rank the best `top_k * RESCORE_OVERSAMPLE` candidates with the float32 vectors. Defaults to True.
+        """
+        if precision != self._precision or rescore != self._rescore:
+            if precision != self._precision:
+                self._quantized = None
+                self._scales = None
+            self._precision = precision
+            self._rescore = rescore
+            self._bump_version()
+
+    def _ensure_quantized(self):
+        if self._precision == "float32" or self._quantized is not None:
+            return
+        self._compact()
+        if self._matrix is not None:
+            self._quantized, self._scales = quantize(self._matrix, self._precision)
+
+    @property
+    def has_keywords(self):
+        return self._keywords is not None
+
+    def build_keywords(self, get_texts):
+        """
+        Indexes the text of every row for keyword search, if the store was persisted without a keyword index.
+
+        Args:
+            get_texts (Callable[[List[str]], List[str]]): Returns the text of the given node IDs, e.g. from the docstore.
+        """
+        with self._lock:
+            if self._keywords is not None:
+                return
+            self._compact()
+            keywords = KeywordIndex()
+            keywords.add(get_texts(self._ids))
+            keywords.ensure()
+            self._keywords = keywords
+            self._bump_version()
+        logs.log.info(f"Built the keyword index of {len(self._ids):,} chunks")
+
+    def _ensure_ann(self):
+        if self._ann_kind != "ivf" or self._ann is not None:
+            return
+        self._compact()
+        if self._matrix is not None:
+            self._ann = IVFIndex.build(self._matrix, self._ann_nlist)
+
+    ###############
+    # Persistence #
+    ###############
+
+    @classmethod
+    def exists(cls, persist_dir: str, namespace: str = DEFAULT_VECTOR_STORE):
+        return os.path.exists(_namespaced_path(persist_dir, namespace, VECTORS_FNAME))
+
+    @classmethod
+    def from_persist_dir(
+        cls, persist_dir: str, namespace: str = DEFAULT_VECTOR_STORE
+    ) -> "MmapVectorStore":
+        """
+        Opens a persisted store, memory-mapping its vector matrix.
+
+        Args:
+            persist_dir (str): The vector store directory.
+            namespace (str, optional): The store namespace. Defaults to "default".
+
+        Returns:
+            MmapVectorStore: The opened store.
+        """
+        matrix = np.load(
+            _namespaced_path(persist_dir, namespace, VECTORS_FNAME), mmap_mode="r"
+        )
+        with open(
+            _namespaced_path(persist_dir, namespace, VECTOR_IDS_FNAME), "r", encoding="utf-8"
+        ) as f:
+            table = json.load(f)
+
+        if not table.get("normalized", False) and matrix.shape[0] > 0:
+            # Stores written before rows were normalized on insert are normalized in memory
+            matrix = normalize_rows(matrix)
+
+        store = cls(
+            matrix=matrix if matrix.shape[0] > 0 else None,
+            ids=table["ids"],
+            ref_doc_ids=table["ref_doc_ids"],
+            metadata=table.get("metadata"),
+            revision=table.get("revision"),
+        )
+
+        ivf_path = _namespaced_path(persist_dir, namespace, IVF_FNAME)
+        if os.path.exists(ivf_path):
+            ann = IVFIndex.load(ivf_path)
+            if ann.size == len(store._ids):
+                store._ann = ann
+                store._ann_kind = "ivf"
+
+        for precision, fname in QUANTIZED_FNAMES.items():
+            path = _namespaced_path(persist_dir, namespace, fname)
+            if not os.path.exists(path):
+                continue
+            quantized = np.load(path, mmap_mode="r")
+            scales = None
+            if precision == "int8":
+                scales = np.load(_namespaced_path(persist_dir, namespace, SCALES_FNAME), mmap_mode="r")
+            if len(quantized) == len(store._ids):
+                store._precision = precision
+                store._quantized = quantized
+                store._scales = scales
+
+        keywords_path = _namespaced_path(persist_dir, namespace, KEYWORDS_FNAME)
+        if os.path.exists(keywords_path):
+            keywords = KeywordIndex.load(keywords_path)
+            if keywords.size == len(store._ids):
+                store._keywords = keywords
+
+        return store
+
+    @classmethod
+    def from_simple_vector_store(cls, store: SimpleVectorStore) -> "MmapVectorStore":
+        """
+        Converts an in-memory `SimpleVectorStore` (e.g. loaded from `default__vector_store.json`).
+        """
+        data = store.data
+        ids = list(data.embedding_dict.keys())
+        matrix = None
+        if ids:
+            matrix = normalize_rows(
+                [data.embedding_dict[node_id] for node_id in ids]
+            )
+        metadata_dict = data.metadata_dict or {}
+        return cls(
+            matrix=matrix,
+            ids=ids,
+            ref_doc_ids=[data.text_id_to_ref_doc_id.get(node_id, "None") for node_id in ids],
+            metadata=[metadata_dict.get(node_id, {}) for node_id in ids],
+        )
+
+    def persist(self, persist_path: str, fs: Optional[Any] = None) -> None:
+        """
+        Persists the store next to `persist_path`, as called by `StorageContext.persist()`.
+
+        Args:
+            persist_path (str): The legacy JSON path (e.g. `vectordb/default__vector_store.json`); its directory and namespace are used.
+        """
+        persist_dir = os.path.dirname(persist_path) or "."
+        namespace = os.path.basename(persist_path).split(NAMESPACE_SEP)[0]
+        os.makedirs(persist_dir, exist_ok=True)
+
+        with self._lock:
+            self._compact()
+            matrix = self._matrix
+            if matrix is None:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+
+            vectors_path = _namespaced_path(persist_dir, namespace, VECTORS_FNAME)
+            _write_atomic(
+                vectors_path,
+                lambda f: np.save(f, np.ascontiguousarray(matrix, dtype=np.float32)),
+            )
+            table = {
+                "normalized": True,
+                "revision": self._revision,
+                "ids": self._ids,
+                "ref_doc_ids": self._ref_doc_ids,
+                "metadata": self._metadata,
+            }
+            _write_atomic(
+                _namespaced_path(persist_dir, namespace, VECTOR_IDS_FNAME),
+                lambda f: f.write(json.dumps(table).encode("utf-8")),
+            )
+
+            ivf_path = _namespaced_path(persist_dir, namespace, IVF_FNAME)
+            self._ensure_ann()
+            if self._ann is not None:
+                _write_atomic(ivf_path, self._ann.save)
+            elif os.path.exists(ivf_path):
+                os.remove(ivf_path)
+
+            self._ensure_quantized()
+            for precision, fname in QUANTIZED_FNAMES.items():
+                path = _namespaced_path(persist_dir, namespace, fname)
+                if precision == self._precision and self._quantized is not None:
+                    _write_atomic(path, lambda f: np.save(f, self._quantized))
+                    self._quantized = np.load(path, mmap_mode="r")
+                elif os.path.exists(path):
+                    os.remove(path)
+
+            scales_path = _namespaced_path(persist_dir, namespace, SCALES_FNAME)
+            if self._scales is not None:
+                _write_atomic(scales_path, lambda f: np.save(f, self._scales))
+                self._scales = np.load(scales_path, mmap_mode="r")
+            elif os.path.exists(scales_path):
+                os.remove(scales_path)
+
+            keywords_path = _namespaced_path(persist_dir, namespace, KEYWORDS_FNAME)
+            if self._keywords is not None:
+                _write_atomic(keywords_path, self._keywords.save)
+            elif os.path.exists(keywords_path):
+                os.remove(keywords_path)
+
+            if self._matrix is not None:
+                # Serve the freshly written matrix from the page cache instead of keeping a private copy in memory
+                self._matrix = np.load(vectors_path, mmap_mode="r")
+
+            # A leftover JSON store would no longer match the persisted docstore
+            legacy_path = _namespaced_path(persist_dir, namespace, LEGACY_FNAME)
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+
+        logs.log.info(f"Persisted {len(self._ids):,} vectors to '{persist_dir}'")
+
+    #################
+    # Store Content #
+    #################
+
+    def _compact(self):
+        """
+        Folds rows added since loading into the matrix and drops deleted rows.
+        """
+        if not self._extra and not self._deleted:
+            return
+
+        blocks = ([self._matrix] if self._matrix is not None else []) + self._extra
+        matrix = np.concatenate(blocks) if len(blocks) > 1 else np.array(blocks[0])
+
+        if self._deleted:
+            keep = np.ones(len(self._ids), dtype=bool)
+            keep[list(self._deleted)] = False
+            matrix = matrix[keep]
+            if self._keywords is not None:
+                self._keywords.compact(keep)
+            rows = np.flatnonzero(keep)
+            self._ids = [self._ids[row] for row in rows]
+            self._ref_doc_ids = [self._ref_doc_ids[row] for row in rows]
+            self._metadata = [self._metadata[row] for row in rows]
+            self._row_of = {node_id: row for row, node_id in enumerate(self._ids)}
+            self._deleted = set()
+
+        self._matrix = matrix if len(matrix) > 0 else None
+        self._extra = []
+        # Row numbers changed, so the IVF lists and the quantized matrix must be rebuilt
+        self._ann = None
+        self._quantized = None
+        self._scales = None
+
+    def get(self, text_id: str) -> List[float]:
+        with self._lock:
+            self._compact()
+            return self._matrix[self._row_of[text_id]].tolist()
+
+    def get_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+    ) -> List[BaseNode]:
+        """
+        Returns the stored nodes with the given IDs (all nodes by default) that pass `filters`.
+
+        The store does not keep the text of nodes (`stores_text` is False), which is held by the index's docstore, so
+        the nodes carry only their ID, metadata, source document and embedding. Embeddings are returned normalized to
+        unit length, as they are stored.
+        """
+        with self._lock:
+            self._compact()
+            filter_fn = build_metadata_filter_fn(
+                lambda node_id: self._metadata[self._row_of[node_id]], filters
+            )
+            candidates = node_ids if node_ids is not None else list(self._row_of)
+            rows = [
+                self._row_of[node_id]
+                for node_id in candidates
+                if node_id in self._row_of and filter_fn(node_id)
+            ]
+            nodes = []
+            for row in rows:
+                metadata = {
+                    key: value
+                    for key, value in self._metadata[row].items()
+                    if key not in _RESERVED_METADATA_KEYS
+                }
+                node = TextNode(id_=self._ids[row], metadata=metadata, embedding=self._matrix[row].tolist())
+                if self._ref_doc_ids[row] != "None":
+                    node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(
+                        node_id=self._ref_doc_ids[row]
+                    )
+                nodes.append(node)
+        return nodes
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+
+        embeddings = normalize_rows([node.get_embedding() for node in nodes])
+        with self._lock:
+            # Re-adding an existing node replaces it
+            self._delete_rows(
+                [self._row_of[node.node_id] for node in nodes if node.node_id in self._row_of]
+            )
+
+            self._extra.append(embeddings)
+            if self._keywords is not None:
+                self._keywords.add([node.get_content() for node in nodes])
+            for node in nodes:
+                metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=False)
+                metadata.pop("_node_content", None)
+                self._row_of[node.node_id] = len(self._ids)
+                self._ids.append(node.node_id)
+                self._ref_doc_ids.append(node.ref_doc_id or "None")
+                self._metadata.append(metadata)
+            self._bump_version(content_changed=True)
+
+        return [node.node_id for node in nodes]
+
+    def _delete_rows(self, rows: List[int]):
+        with self._lock:
+            for row in rows:
+                if row not in self._deleted:
+                    self._deleted.add(row)
+                    self._row_of.pop(self._ids[row], None)
+            if rows:
+                self._bump_version(content_changed=True)
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._delete_rows(
+            [
+                row
+                for row, ref_doc_id_ in enumerate(self._ref_doc_ids)
+                if ref_doc_id_ == ref_doc_id
+            ]
+        )
+
+    def delete_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+        **delete_kwargs: Any,
+    ) -> None:
+        filter_fn = build_metadata_filter_fn(
+            lambda node_id: self._metadata[self._row_of[node_id]], filters
+        )
+        candidates = node_ids if node_ids is not None else list(self._row_of)
+        self._delete_rows(
+            [
+                self._row_of[node_id]
+                for node_id in candidates
+                if node_id in self._row_of and filter_fn(node_id)
+            ]
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ann = None
+            self._quantized = None
+            self._scales = None
+            self._keywords = KeywordIndex()
+            self._matrix = None
+            self._extra = []
+            self._ids = []
+            self._ref_doc_ids = []
+            self._metadata = []
+            self._row_of = {}
+            self._deleted = set()
+            self._bump_version(content_changed=True)
+
+    #########
+    # Query #
+    #########
+
+    def _candidate_rows(self, query: VectorStoreQuery):
+        """
+        Returns the rows allowed by the query's node ID restriction and metadata filters, or None for all live rows.
+        """
+        if query.node_ids is None and query.filters is None and not self._deleted:
+            return None
+
+        node_ids = query.node_ids if query.node_ids is not None else list(self._row_of)
+        filter_fn = build_metadata_filter_fn(
+            lambda node_id: self._metadata[self._row_of[node_id]], query.filters
+        )
+        return np.asarray(
+            [
+                self._row_of[node_id]
+                for node_id in node_ids
+                if node_id in self._row_of and filter_fn(node_id)
+            ],
+            dtype=np.int64,
+        )
+
+    def _dense_search(self, snapshot: tuple, query_embedding: np.ndarray, k: int, rows, nprobe):
+        """
+        Returns the `k` rows most similar to `query_embedding` and their cosine similarities, best first.
+        """
+        matrix, ann, quantized, scales, rescore = snapshot
+
+        if nprobe:
+            return ann.search(matrix, query_embedding, k, nprobe)
+
+        if quantized is None:
+            candidates = matrix if rows is None else matrix[rows]
+            similarities = candidates @ query_embedding
+            top = top_k(similarities, k)
+            top_rows = top if rows is None else rows[top]
+        else:
+            similarities = quantized_similarities(quantized, scales, query_embedding, rows)
+            if rescore:
+                candidates = top_k(similarities, k * RESCORE_OVERSAMPLE)
+                candidate_rows = candidates if rows is None else rows[candidates]
+                # Sorted rows read the memory-mapped float32 matrix sequentially
+                order = np.argsort(candidate_rows)
+                candidate_rows = candidate_rows[order]
+                similarities = matrix[candidate_rows] @ query_embedding
+                top = top_k(similarities, k)
+                top_rows = candidate_rows[top]
+            else:
+                top = top_k(similarities, k)
+                top_rows = top if rows is None else rows[top]
+
+        return top_rows, similarities[top]
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """
+        Returns the `similarity_top_k` best matching nodes.
+
+        `VectorStoreQueryMode.DEFAULT` ranks rows by the cosine similarity of their vectors, `SPARSE` by the BM25
+        score of their text for `query_str`, and `HYBRID` fuses both rankings with Reciprocal Rank Fusion. A hybrid
+        query takes the best `similarity_top_k * HYBRID_OVERSAMPLE` rows of each ranking (`sparse_top_k` for the
+        keyword ranking, if set) and returns the best `hybrid_top_k` (default `similarity_top_k`) after fusion, scored
+        by their fused score.
+
+        Args:
+            query (VectorStoreQuery): The query.
+            nprobe (int, optional): When an IVF index is configured, the number of lists to scan. Omit for exact search.
+            probe_fraction (float, optional): When an IVF index is configured, the share of the lists to scan, instead of `nprobe`.
+        """
+        if query.mode not in QUERY_MODES:
+            raise ValueError(f"Invalid query mode: {query.mode}")
+
+        dense = query.mode != VectorStoreQueryMode.SPARSE
+        sparse = query.mode != VectorStoreQueryMode.DEFAULT
+
+        with self._lock:
+            self._compact()
+            if self._matrix is None or not query.similarity_top_k:
+                return VectorStoreQueryResult(similarities=[], ids=[])
+            if sparse:
+                if self._keywords is None:
+                    raise ValueError("The vector store has no keyword index; call build_keywords() first")
+                self._keywords.ensure()
+
+            rows = self._candidate_rows(query)
+            nprobe = kwargs.get("nprobe")
+            probe_fraction = kwargs.get("probe_fraction")
+            use_ann = dense and bool(nprobe or probe_fraction) and rows is None and self._ann_kind == "ivf"
+            if use_ann:
+                self._ensure_ann()
+                if probe_fraction:
+                    nprobe = self._ann.probes(probe_fraction)
+            elif dense:
+                self._ensure_quantized()
+
+            # Scoring runs outside the lock on a snapshot, so concurrent queries do not wait for each other
+            snapshot = (self._matrix, self._ann, self._quantized, self._scales, self._rescore)
+            ids, keywords = self._ids, self._keywords
+
+        if rows is not None and len(rows) == 0:
+            return VectorStoreQueryResult(similarities=[], ids=[])
+
+        k = query.similarity_top_k
+        nprobe = nprobe if use_ann else None
+        if query.mode == VectorStoreQueryMode.DEFAULT:
+            top_rows, scores = self._dense_search(
+                snapshot, normalize_rows(query.query_embedding), k, rows, nprobe
+            )
+        elif query.mode == VectorStoreQueryMode.SPARSE:
+            top_rows, scores = keywords.search(query.query_str or "", k, rows)
+        else:
+            depth = k * HYBRID_OVERSAMPLE
+            dense_rows, _ = self._dense_search(
+                snapshot, normalize_rows(query.query_embedding), depth, rows, nprobe
+            )
+            sparse_rows, _ = keywords.search(query.query_str or "", query.sparse_top_k or depth, rows)
+            top_rows, scores = reciprocal_rank_fusion(
+                [dense_rows, sparse_rows], query.hybrid_top_k or k
+            )
+
+        return VectorStoreQueryResult(
+            similarities=scores.tolist(),
+            ids=[ids[row] for row in top_rows],
+        )
+
+
+###################################
+#
+# Load & Convert Vector Stores
+#
+###################################
+
+
+def load_vector_store(persist_dir: str, namespace: str = DEFAULT_VECTOR_STORE):
+    """
+    Loads the vector store persisted in `persist_dir`, converting a legacy JSON store in memory if needed.
+
+    Args:
+        persist_dir (str): The vector store directory.
+        namespace (str, optional): The store namespace. Defaults to "default".
+
+    Returns:
+        MmapVectorStore: The loaded store. A legacy store is written in the binary format on its next persist.
+    """
+    if MmapVectorStore.exists(persist_dir, namespace):
+        return MmapVectorStore.from_persist_dir(persist_dir, namespace)
+
+    legacy_path = _namespaced_path(persist_dir, namespace, LEGACY_FNAME)
+    if os.path.exists(legacy_path):
+        logs.log.info(f"Loading legacy JSON vector store '{legacy_path}'")
+        return MmapVectorStore.from_simple_vector_store(
+            SimpleVectorStore.from_persist_path(legacy_path)
+        )
+
+    return MmapVectorStore()
+
+
+def convert_vectordb(persist_dir: str, keep_json: bool = False):
+    """
+    Converts the JSON vector store of an existing `vectordb/` directory to the binary format.
+
+    Args:
+        persist_dir (str): The vector store directory.
+        keep_json (bool, optional): Keep `default__vector_store.json` next to the converted files. Defaults to False.
+
+    Returns:
+        int: The number of converted vectors.
+    """
+    legacy_path = _namespaced_path(persist_dir, DEFAULT_VECTOR_STORE, LEGACY_FNAME)
+    if not os.path.exists(legacy_path):
+        raise FileNotFoundError(f"No JSON vector store found at '{legacy_path}'")
+
+    store = MmapVectorStore.from_simple_vector_store(
+        SimpleVectorStore.from_persist_path(legacy_path)
+    )
+
+    if keep_json:
+        backup_path = legacy_path + ".bak"
+        os.replace(legacy_path, backup_path)
+        store.persist(legacy_path)
+        os.replace(backup_path, legacy_path)
+    else:
+        store.persist(legacy_path)
+
+    return len(store)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a vectordb/ directory from the JSON vector store to the memory-mapped binary format."
+    )
+    parser.add_argument("persist_dir", nargs="?", default="./vectordb")
+    parser.add_argument("--keep-json", action="store_true", help="Keep the original JSON vector store")
+    args = parser.parse_args()
+
+    count = convert_vectordb(args.persist_dir, keep_json=args.keep_json)
+    print(f"Converted {count:,} vectors in '{args.persist_dir}'")
@@ -0,0 +1,386 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import streamlit as st
+
+import utils.logs as logs
+
+from llama_index.core import Document
+
+DEFAULT_HTTP_CACHE_PATH = os.path.join(os.getcwd(), ".cache", "http.sqlite3")
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PER_HOST = 4
+DEFAULT_RATE = 8.0
+DEFAULT_TIMEOUT = 20
+DEFAULT_MAX_PAGES = 100
+USER_AGENT = "local-rag/1.0 (+https://github.com/jonfairbanks/local-rag)"
+
+# Links to these are not followed: they are not web pages
+_SKIPPED_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".pdf", ".zip", ".gz", ".tar", ".mp3",
+    ".mp4", ".mov", ".avi", ".woff", ".woff2", ".ttf", ".exe", ".dmg", ".xml", ".rss",
+}
+
+###################################
+#
+# Parse HTML
+#
+###################################
+
+
+class _PageParser(HTMLParser):
+    """
+    Collects the title, the links and the visible text of an HTML page in a single pass.
+    """
+
+    _HIDDEN = {"script", "style", "noscript", "template", "svg", "head"}
+    _BLOCKS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "pre"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.links = []
+        self.parts = []
+        self._hidden = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+        elif tag == "title":
+            self._in_title = True
+        if tag in self._HIDDEN:
+            self._hidden += 1
+        elif tag in self._BLOCKS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        if tag in self._HIDDEN:
+            self._hidden = max(self._hidden - 1, 0)
+        elif tag in self._BLOCKS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._hidden:
+            self.parts.append(data)
+
+    def text(self):
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def parse_page(html: str, url: str):
+    """
+    Extracts the text, title and outgoing links of an HTML page.
+
+    The text is converted with `html2text`, like `SimpleWebPageReader(html_to_text=True)` did, if it is installed;
+    otherwise the visible text of the page is used.
+
+    Args:
+        html (str): The page source.
+        url (str): The URL of the page, which relative links are resolved against.
+
+    Returns:
+        Tuple[str, str, List[str]]: The text, the title, and the absolute `http(s)` links without fragments.
+    """
+    parser = _PageParser()
+    parser.feed(html)
+    parser.close()
+
+    try:
+        import html2text
+
+        text = html2text.html2text(html)
+    except ImportError:
+        text = parser.text()
+
+    links = []
+    for href in parser.links:
+        link = urldefrag(urljoin(url, href.strip()))[0]
+        parsed = urlparse(link)
+        if parsed.scheme in ("http", "https") and os.path.splitext(parsed.path)[1].lower() not in _SKIPPED_EXTENSIONS:
+            links.append(link)
+    return text, parser.title.strip(), list(dict.fromkeys(links))
+
+
+###################################
+#
+# Conditional GET Cache
+#
+###################################
+
+
+class HttpCache:
+    """
+    A size-bounded, persistent cache of fetched pages for conditional GET requests.
+
+    Each entry stores the `ETag` and `Last-Modified` validators a page was served with, and its extracted text, title
+    and links. A page is requested again with `If-None-Match` / `If-Modified-Since`; if the server answers
+    `304 Not Modified`, the cached entry is used and the page is not downloaded. Entries are evicted least recently
+    used first once the cache holds more than `max_entries` pages.
+    """
+
+    def __init__(self, path: str = DEFAULT_HTTP_CACHE_PATH, max_entries: int = 10_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, text TEXT NOT NULL, title TEXT NOT NULL, "
+            "links TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, url: str):
+        """
+        Returns the cached entry of a page (`etag`, `last_modified`, `text`, `title` and `links`), or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, text, title, links FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "text": row[2],
+            "title": row[3],
+            "links": json.loads(row[4]),
+        }
+
+    def put(self, url: str, etag: str, last_modified: str, text: str, title: str, links: list):
+        """
+        Stores a downloaded page, evicting the least recently used pages if the cache is full.
+
+        Pages served without a validator are not cached, as they could never be revalidated.
+        """
+        if not etag and not last_modified:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, text, title, links, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, text, title, json.dumps(links), time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM pages WHERE url IN "
+                "(SELECT url FROM pages ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def touch(self, url: str):
+        with self._lock:
+            self._conn.execute("UPDATE pages SET last_used = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+
+@st.cache_resource(show_spinner=False)
+def load_http_cache(max_entries: int = 10_000):
+    """
+    Opens the HTTP cache shared by all sessions of the app.
+    """
+    return HttpCache(max_entries=max_entries)
+
+
+###################################
+#
+# Per-Host Rate Limit
+#
+###################################
+
+
+class HostRateLimiter:
+    """
+    Spaces the requests to each host at least `1 / rate` seconds apart; requests to different hosts do not wait
+    for each other. A rate of `0` disables the limit.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next = {}
+
+    async def wait(self, host: str):
+        # The event loop runs one coroutine at a time, so reserving the slot needs no lock
+        now = time.monotonic()
+        start = max(now, self._next.get(host, now))
+        self._next[host] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+###################################
+#
+# Crawl Websites
+#
+###################################
+
+
+async def _fetch(session, url: str, cache: HttpCache, limiter: HostRateLimiter, stats: dict):
+    """
+    Fetches a page, revalidating its cached entry if there is one.
+
+    Returns:
+        Optional[dict]: `text`, `title` and `links` of the page, or None if it could not be fetched or is not HTML.
+    """
+    import aiohttp
+
+    entry = cache.get(url) if cache is not None else None
+    headers = {}
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    await limiter.wait(urlparse(url).netloc)
+    try:
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and entry is not None:
+                stats["not_modified"] += 1
+                cache.touch(url)
+                return entry
+            if response.status != 200:
+                logs.log.warning(f"Skipping '{url}': HTTP {response.status}")
+                stats["failed"] += 1
+                return None
+            if "html" not in response.headers.get("Content-Type", "text/html"):
+                stats["skipped"] += 1
+                return None
+            html = await response.text(errors="replace")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+        logs.log.warning(f"Failed to fetch '{url}': {err.__class__.__name__} {err}")
+        stats["failed"] += 1
+        return None
+
+    text, title, links = parse_page(html, str(response.url))
+    stats["downloaded"] += 1
+    stats["bytes"] += len(html)
+    if cache is not None:
+        cache.put(
+            url, response.headers.get("ETag"), response.headers.get("Last-Modified"), text, title, links
+        )
+    return {"text": text, "title": title, "links": links}
+
+
+async def crawl(
+    urls: list,
+    max_depth: int = 0,
+    max_pages: int = DEFAULT_MAX_PAGES,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    per_host: int = DEFAULT_PER_HOST,
+    rate: float = DEFAULT_RATE,
+    timeout: float = DEFAULT_TIMEOUT,
+    cache: HttpCache = None,
+):
+    """
+    Fetches web pages concurrently, following same-site links up to `max_depth`.
+
+    Args:
+        urls (list[str]): The pages to start from.
+        max_depth (int, optional): How many links away from a start page to follow; `0` only fetches `urls`. Defaults to 0.
+        max_pages (int, optional): Maximum number of pages to fetch in total. Defaults to 100.
+        concurrency (int, optional): Maximum number of requests in flight. Defaults to 8.
+        per_host (int, optional): Maximum number of connections to one host. Defaults to 4.
+        rate (float, optional): Maximum requests per second to one host; `0` for no limit. Defaults to 8.
+        timeout (float, optional): Seconds after which a request is abandoned. Defaults to 20.
+        cache (HttpCache, optional): Revalidate pages fetched before instead of downloading them again. Defaults to None.
+
+    Returns:
+        Tuple[List[Document], dict]: A document per page, in crawl order, and the counters `pages`, `downloaded`,
+        `not_modified` (served from the cache), `failed`, `skipped` (not HTML) and `bytes` downloaded.
+
+    Notes:
+        All requests share one `aiohttp` session, so connections are pooled and kept alive between pages of the
+        same host. Links are only followed to the hosts of the start pages.
+    """
+    import aiohttp
+
+    stats = {"pages": 0, "downloaded": 0, "not_modified": 0, "failed": 0, "skipped": 0, "bytes": 0}
+    hosts = {urlparse(url).netloc for url in urls}
+    limiter = HostRateLimiter(rate)
+    pages = {}
+    queue = asyncio.Queue()
+    seen = {}  # Queued URLs, in crawl order
+    for url in urls:
+        url = urldefrag(url)[0]
+        if url not in seen and len(seen) < max_pages:
+            seen[url] = None
+            queue.put_nowait((url, 0))
+
+    async def worker(session):
+        while True:
+            url, depth = await queue.get()
+            try:
+                page = await _fetch(session, url, cache, limiter, stats)
+                if page is None:
+                    continue
+                pages[url] = page
+                if depth >= max_depth:
+                    continue
+                for link in page["links"]:
+                    if len(seen) >= max_pages:
+                        break
+                    if link not in seen and urlparse(link).netloc in hosts:
+                        seen[link] = None
+                        queue.put_nowait((link, depth + 1))
+            except Exception as err:
+                logs.log.warning(f"Failed to process '{url}': {err}")
+                stats["failed"] += 1
+            finally:
+                queue.task_done()
+
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        headers={"User-Agent": USER_AGENT},
+    ) as session:
+        workers = [asyncio.create_task(worker(session)) for _ in range(concurrency)]
+        await queue.join()
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    documents = []
+    for url in seen:
+        page = pages.get(url)
+        if page is not None and page["text"].strip():
+            documents.append(Document(text=page["text"], metadata={"url": url, "title": page["title"]}))
+    stats["pages"] = len(documents)
+    return documents, stats
+
+
+def crawl_websites(urls: list, **kwargs):
+    """
+    Runs `crawl()` to completion from synchronous code, such as a Streamlit script.
+
+    Returns:
+        Tuple[List[Document], dict]: The documents and counters of `crawl()`.
+    """
+    start = time.perf_counter()
+    documents, stats = asyncio.run(crawl(urls, **kwargs))
+    logs.log.info(
+        f"Crawled {stats['pages']:,} page(s) in {time.perf_counter() - start:.1f}s: "
+        f"{stats['downloaded']:,} downloaded ({stats['bytes'] / 1e6:,.2f} MB), "
+        f"{stats['not_modified']:,} unchanged, {stats['failed']:,} failed"
+    )
+    return documents, stats